@@ -0,0 +1,81 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+REQUEST_RETRIES = 5
+
+
+class CoordinatorClient:
+    """JSON over HTTP to an orchestrator/coordinator.py server; retries while the coordinator can't be reached."""
+
+    def __init__(self, url, agent):
+        self.url = url.rstrip("/")
+        self.agent = agent
+
+    def get(self, path):
+        return self._request(urllib.request.Request(self.url + path))
+
+    def post(self, path, **fields):
+        body = json.dumps({"agent": self.agent, **fields}).encode()
+        request = urllib.request.Request(self.url + path, data=body, headers={"Content-Type": "application/json"})
+        return self._request(request)
+
+    def _request(self, request):
+        for attempt in range(REQUEST_RETRIES):
+            try:
+                with urllib.request.urlopen(request, timeout=60) as response:
+                    return json.loads(response.read() or b"{}")
+            except (urllib.error.URLError, ConnectionError, TimeoutError):
+                if attempt == REQUEST_RETRIES - 1:
+                    raise
+                time.sleep(2 ** attempt)
+
+
+class RemoteLeaseQueue:
+    """
+    LeaseQueue interface (acquire / complete / release) backed by a coordinator, so the Blender instances of a
+    render agent take their leases from a queue shared by every machine.
+
+    A background thread sends a heartbeat every `heartbeat_interval` seconds while the queue is open; a
+    coordinator that stops hearing from the agent gives its leases to other agents.
+    """
+
+    def __init__(self, client, heartbeat_interval=10.0):
+        self.client = client
+        self.total = None
+        self.completed = 0
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._heartbeat = threading.Thread(target=self._beat, args=(heartbeat_interval,), name="heartbeat",
+                                           daemon=True)
+        self._heartbeat.start()
+
+    def _beat(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.client.post("/heartbeat")
+            except (urllib.error.URLError, ConnectionError, TimeoutError) as e:
+                print(f"Heartbeat failed: {e}")
+
+    def acquire(self, wait=True):
+        while True:
+            answer = self.client.post("/lease", wait=wait)
+
+            if answer["lease"] is not None or answer["done"] or not wait:
+                return answer["lease"]
+
+    def complete(self, lease):
+        self.client.post("/complete", lease_id=lease["id"])
+        with self._lock:
+            self.completed += lease["size"]
+
+    def release(self, lease, done=0, skip=None):
+        self.client.post("/release", lease_id=lease["id"], done=done, skip=skip)
+        with self._lock:
+            self.completed += done
+
+    def close(self):
+        self._stop.set()
@@ -0,0 +1,134 @@
+import json
+import os
+
+import yaml
+
+from scripts.annotations import ANNOTATIONS_DIR
+
+STATE_FILE = "merged.json"
+METADATA_FILE = "metadata.jsonl"
+
+
+def metadata_row(record):
+    """
+    A Hugging Face imagefolder row of an annotation record: file name relative to images/<split>/, boxes as COCO
+    pixels (x, y, width, height) under objects.bbox and YOLO-normalised under objects.yolo.
+    """
+    objects = record["objects"]
+    row = {
+        "file_name": f"{record['index']}.jpg",
+        "width": record["width"],
+        "height": record["height"],
+        "objects": {
+            "bbox": [[x0, y0, round(x1 - x0, 2), round(y1 - y0, 2)] for x0, y0, x1, y1 in (o["bbox"] for o in objects)],
+            "yolo": [o["yolo"] for o in objects],
+            "category": [o["class_id"] for o in objects],
+            "class": [o["class"] for o in objects],
+        },
+    }
+
+    if "params" in record:
+        row["params"] = record["params"]
+
+    return row
+
+
+def merge_annotations(root, classes):
+    """
+    Merges the annotation segments of the workers (scripts/annotations.py) into images/<split>/metadata.jsonl
+    and data.yaml, in one pass over what was appended since the last merge: the byte offset reached in every
+    segment is kept in annotations/merged.json, images are never opened.
+
+    New rows are appended; of the existing rows only the file names are read, to find a sample that was rendered
+    again, whose row is then replaced (rewriting that split's file). Returns the number of merged records.
+    """
+    directory = os.path.join(root, ANNOTATIONS_DIR)
+    if not os.path.isdir(directory):
+        return 0
+
+    state_path = os.path.join(directory, STATE_FILE)
+    offsets = {}
+    if os.path.exists(state_path):
+        with open(state_path, "r", encoding="utf-8") as f:
+            offsets = json.load(f)["offsets"]
+
+    new_rows = {}
+    merged = 0
+
+    for entry in sorted(os.scandir(directory), key=lambda e: e.name):
+        if not (entry.name.startswith("worker-") and entry.name.endswith(".jsonl")):
+            continue
+
+        offset = offsets.get(entry.name, 0)
+        with open(entry.path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                # A line without its newline is still being written, it is merged next time
+                if not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+
+                new_rows.setdefault(record["bucket"], {})[record["index"]] = metadata_row(record)
+                merged += 1
+
+        offsets[entry.name] = offset
+
+    for split, rows in new_rows.items():
+        _merge_split(os.path.join(root, "images", split, METADATA_FILE), rows)
+
+    write_data_yaml(root, classes)
+
+    with open(state_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"offsets": offsets}, f)
+    os.replace(state_path + ".tmp", state_path)
+
+    return merged
+
+
+def _merge_split(path, rows):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            existing = [line for line in f if line.endswith("\n")]
+    else:
+        existing = []
+
+    # Rows are written with file_name first, the name is read without decoding the whole row
+    prefix = len('{"file_name":"')
+    names = {line[prefix:line.index('"', prefix)] for line in existing}
+    replaced = any(row["file_name"] in names for row in rows.values())
+
+    if not replaced:
+        with open(path, "a", encoding="utf-8") as f:
+            for row in rows.values():
+                f.write(json.dumps(row, separators=(",", ":")) + "\n")
+        return
+
+    replacements = {row["file_name"]: row for row in rows.values()}
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        for line in existing:
+            name = line[prefix:line.index('"', prefix)]
+            row = replacements.pop(name, None)
+            f.write(line if row is None else json.dumps(row, separators=(",", ":")) + "\n")
+        for row in replacements.values():
+            f.write(json.dumps(row, separators=(",", ":")) + "\n")
+    os.replace(path + ".tmp", path)
+
+
+def write_data_yaml(root, classes):
+    """The YOLO dataset file, listing every split that has a metadata.jsonl."""
+    images = os.path.join(root, "images")
+    splits = sorted(name for name in os.listdir(images) if os.path.exists(os.path.join(images, name, METADATA_FILE)))
+
+    data = {"path": os.path.abspath(root)}
+    data.update({split: f"images/{split}" for split in splits})
+    data["names"] = {class_id: name for name, class_id in sorted(classes.items(), key=lambda item: item[1])}
+
+    with open(os.path.join(root, "data.yaml"), "w", encoding="utf-8") as f:
+        yaml.safe_dump(data, f, sort_keys=False)
@@ -0,0 +1,157 @@
+import os
+import secrets
+import socket
+import threading
+from collections import deque
+
+from scripts.protocol import parse_line
+
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUPS = 3
+TAIL_BYTES = 64 * 1024
+# Bytes read from a worker's output at once
+COPY_CHUNK_BYTES = 64 * 1024
+
+
+class WorkerChannel:
+    """
+    Localhost socket a single worker process connects to (see scripts/protocol.py:open_channel).
+
+    The worker's first message must be HELLO with the channel's token, anything else connecting is dropped.
+    Messages are read as protocol lines, leases are sent back on the same connection.
+    """
+
+    def __init__(self):
+        self.token = secrets.token_hex(16)
+
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.bind(("127.0.0.1", 0))
+        self._server.listen(4)
+        self._server.settimeout(0.5)
+
+        self._connection = None
+        self._reader = None
+
+    @property
+    def info(self):
+        """What the worker needs to connect, passed in its JSON arguments."""
+        return {"port": self._server.getsockname()[1], "token": self.token}
+
+    def accept(self, process):
+        """Waits for the worker to connect; False when the process ended before it did."""
+        while process.poll() is None:
+            try:
+                connection, _ = self._server.accept()
+            except socket.timeout:
+                continue
+
+            connection.settimeout(None)
+            reader = connection.makefile("r", encoding="utf-8", newline="\n")
+            message = parse_line(reader.readline())
+
+            if message is not None and message[0] == "HELLO" and message[1].get("token") == self.token:
+                connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                self._connection, self._reader = connection, reader
+                return True
+
+            reader.close()
+            connection.close()
+
+        return False
+
+    def messages(self):
+        """(kind, value) of every protocol message until the worker closes the connection."""
+        for line in self._reader:
+            message = parse_line(line)
+            if message is not None:
+                yield message
+
+    def send(self, text):
+        try:
+            self._connection.sendall(text.encode("utf-8"))
+        except OSError:
+            pass
+
+    def close(self):
+        for closable in (self._reader, self._connection, self._server):
+            if closable is not None:
+                try:
+                    closable.close()
+                except OSError:
+                    pass
+
+
+class WorkerLog:
+    """
+    The log file of a worker process: a thread copies the process' stdout / stderr into it and rotates it
+    (path.1 ... path.<backups>) before a write would take it past max_bytes, so a long-lived chatty worker keeps
+    at most (backups + 1) * max_bytes on disk instead of growing its log until it is restarted. The live file is
+    never left empty by a rotation, so the crash report (see read_tail) has the latest output.
+    """
+
+    def __init__(self, path, max_bytes=LOG_MAX_BYTES, backups=LOG_BACKUPS):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._thread = None
+
+        if os.path.exists(path) and os.path.getsize(path) > max_bytes:
+            self._shift()
+        self._file = open(path, "ab", buffering=0)
+
+    def write(self, data):
+        written = self._file.tell()
+        if written and written + len(data) > self.max_bytes:
+            self._file.close()
+            self._shift()
+            self._file = open(self.path, "ab", buffering=0)
+        self._file.write(data)
+
+    def _shift(self):
+        for number in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{number}"):
+                os.replace(f"{self.path}.{number}", f"{self.path}.{number + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    def follow(self, stream):
+        """Copies `stream` (the process' stdout pipe) into the log on a thread until the process closes it."""
+        self._thread = threading.Thread(target=self._copy, args=(stream,), name=f"log-{os.path.basename(self.path)}",
+                                        daemon=True)
+        self._thread.start()
+
+    def _copy(self, stream):
+        with stream:
+            while True:
+                data = os.read(stream.fileno(), COPY_CHUNK_BYTES)
+                if not data:
+                    break
+                self.write(data)
+
+    def close(self, timeout=5.0):
+        """Waits for the output of an exited process to be copied, then closes the file."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                # Something else still holds the pipe open, the copy thread keeps the file
+                return
+        self._file.close()
+
+
+def read_tail(path, max_bytes=TAIL_BYTES, max_lines=200):
+    """The last lines of a worker log, reading at most max_bytes of it."""
+    if not os.path.exists(path):
+        return []
+
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - max_bytes))
+        data = f.read()
+
+    lines = deque(data.decode("utf-8", errors="replace").splitlines(), maxlen=max_lines)
+    if size > max_bytes and lines:
+        # The first line is most likely cut
+        lines.popleft()
+
+    return list(lines)
@@ -0,0 +1,174 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# How long a blocking lease request is held open before the agent is told to ask again
+LONG_POLL_SECONDS = 20
+
+
+class Coordinator:
+    """
+    Hands out the leases of a LeaseQueue to render agents on other machines and keeps track of who holds what.
+
+    Every request of an agent counts as a heartbeat. The leases of an agent that was not heard of for
+    `lease_timeout` seconds go back to the queue, whole: rendering a sample twice only overwrites the same files,
+    skipping one would leave a hole. A late completion of a requeued lease is ignored.
+    """
+
+    def __init__(self, leases, job, lease_timeout=60.0, events=None):
+        self.leases = leases
+        self.job = job
+        self.lease_timeout = lease_timeout
+        self.events = events
+
+        self._lock = threading.Lock()
+        self._owners = {}
+        self._last_seen = {}
+
+        self._stop = threading.Event()
+        self._reaper = threading.Thread(target=self._reap, name="lease-reaper", daemon=True)
+        self._reaper.start()
+
+    def _log(self, event, **fields):
+        if self.events is not None:
+            self.events.log(event, **fields)
+
+    def heartbeat(self, agent):
+        with self._lock:
+            if agent not in self._last_seen:
+                self._log("agent_joined", agent=agent)
+            self._last_seen[agent] = time.time()
+
+    def acquire(self, agent, wait=True):
+        """Returns {"lease": lease} or {"lease": None, "done": bool}; not done means ask again."""
+        self.heartbeat(agent)
+        lease = self.leases.acquire(wait=wait, timeout=LONG_POLL_SECONDS if wait else None)
+
+        if lease is None:
+            return {"lease": None, "done": self.leases.finished}
+
+        with self._lock:
+            self._owners[lease["id"]] = (agent, lease)
+
+        return {"lease": lease}
+
+    def complete(self, agent, lease_id):
+        self.heartbeat(agent)
+        owned = self._take(agent, lease_id)
+        if owned is not None:
+            self.leases.complete(owned)
+
+    def release(self, agent, lease_id, done=0, skip=None):
+        self.heartbeat(agent)
+        owned = self._take(agent, lease_id)
+        if owned is not None:
+            self.leases.release(owned, done, skip)
+
+    def _take(self, agent, lease_id):
+        with self._lock:
+            owner, lease = self._owners.get(lease_id, (None, None))
+            if owner != agent:
+                return None
+            del self._owners[lease_id]
+            return lease
+
+    def _reap(self):
+        while not self._stop.wait(min(5.0, self.lease_timeout / 4)):
+            now = time.time()
+            with self._lock:
+                expired_agents = {agent for agent, seen in self._last_seen.items() if now - seen > self.lease_timeout}
+                expired = [(lease_id, agent, lease) for lease_id, (agent, lease) in self._owners.items()
+                           if agent in expired_agents]
+                for lease_id, _, _ in expired:
+                    del self._owners[lease_id]
+                for agent in expired_agents:
+                    del self._last_seen[agent]
+
+            for lease_id, agent, lease in expired:
+                self._log("lease_expired", agent=agent, lease=lease)
+                self.leases.release(lease, 0)
+
+            for agent in expired_agents:
+                self._log("agent_lost", agent=agent)
+
+    def status(self):
+        with self._lock:
+            agents = sorted(self._last_seen)
+            in_flight = len(self._owners)
+
+        return {
+            "total": self.leases.total,
+            "completed": self.leases.completed,
+            "skipped": self.leases.skipped,
+            "remaining": self.leases.remaining,
+            "in_flight": in_flight,
+            "agents": agents,
+        }
+
+    def close(self):
+        self._stop.set()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    coordinator = None
+
+    def _reply(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/job":
+            self._reply({"job": self.coordinator.job, "total": self.coordinator.leases.total})
+        elif self.path == "/status":
+            self._reply(self.coordinator.status())
+        else:
+            self._reply({"error": f"unknown path {self.path}"}, 404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        agent = request.get("agent", self.client_address[0])
+
+        if self.path == "/lease":
+            self._reply(self.coordinator.acquire(agent, wait=request.get("wait", True)))
+        elif self.path == "/complete":
+            self.coordinator.complete(agent, request["lease_id"])
+            self._reply({})
+        elif self.path == "/release":
+            self.coordinator.release(agent, request["lease_id"], request.get("done", 0), request.get("skip"))
+            self._reply({})
+        elif self.path == "/heartbeat":
+            self.coordinator.heartbeat(agent)
+            self._reply({})
+        else:
+            self._reply({"error": f"unknown path {self.path}"}, 404)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(coordinator, host="0.0.0.0", port=8765, linger=10.0):
+    """
+    Serves the coordinator over HTTP until every lease is completed, then keeps answering for `linger` seconds
+    so the agents still asking for work are told to stop.
+    """
+    handler = type("CoordinatorHandler", (_Handler,), {"coordinator": coordinator})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+
+    thread = threading.Thread(target=server.serve_forever, name="coordinator-http", daemon=True)
+    thread.start()
+
+    try:
+        while not coordinator.leases.finished:
+            time.sleep(1.0)
+        time.sleep(linger)
+    finally:
+        server.shutdown()
+        server.server_close()
+        coordinator.close()
@@ -0,0 +1,221 @@
+import io
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from scripts.shards import SHARDS_DIR, INDEX_DIR, iter_shard
+
+DEDUP_DIR = "dedup"
+HASHES_FILE = "hashes.bin"
+PAIRS_FILE = "pairs.jsonl"
+
+HASH_DTYPE = np.dtype([("split", np.uint8), ("index", np.int64), ("hash", np.uint64)])
+CHUNK_SIZE = 4096
+
+# Near-duplicate buckets larger than this (e.g. thousands of frames of one background) are only counted
+MAX_BUCKET = 2048
+
+
+def dhash(source):
+    """
+    64 bit difference hash of an image (path or file object): whether each pixel of a 9x8 grayscale thumbnail is
+    brighter than its right neighbour. JPEGs are decoded at a reduced scale, which is most of the speed.
+    """
+    with Image.open(source) as image:
+        image.draft("L", (64, 64))
+        pixels = np.asarray(image.convert("L").resize((9, 8), Image.BOX), dtype=np.int16)
+
+    bits = pixels[:, 1:] > pixels[:, :-1]
+    return int(np.packbits(bits.ravel()).view(">u8")[0])
+
+
+def iter_images(root, split_names):
+    """(split, index, source) of every rendered image, from images/<split>/ or from the tar shards."""
+    for split in split_names:
+        directory = os.path.join(root, "images", split)
+        if os.path.isdir(directory):
+            for entry in os.scandir(directory):
+                stem, ext = os.path.splitext(entry.name)
+                if ext == ".jpg" and stem.isdigit():
+                    yield split, int(stem), entry.path
+
+        shard_dir = os.path.join(root, SHARDS_DIR, split)
+        if split != INDEX_DIR and os.path.isdir(shard_dir):
+            for shard_name in sorted(os.listdir(shard_dir)):
+                for name, data in iter_shard(os.path.join(shard_dir, shard_name)):
+                    stem, _, suffix = name.partition(".")
+                    if suffix == "jpg":
+                        yield split, int(stem), io.BytesIO(data)
+
+
+def compute_hashes(root, split_names, workers=8):
+    """
+    Hashes every image into dedup/hashes.bin (HASH_DTYPE records), streaming: CHUNK_SIZE images at a time are
+    decoded by a thread pool and appended, so memory does not grow with the dataset. Returns the number hashed.
+    """
+    directory = os.path.join(root, DEDUP_DIR)
+    os.makedirs(directory, exist_ok=True)
+    split_ids = {split: number for number, split in enumerate(split_names)}
+    count = 0
+
+    def hash_item(item):
+        split, index, source = item
+        try:
+            return split_ids[split], index, dhash(source)
+        except OSError as e:
+            print(f"Skipping {split}:{index}, the image can't be read: {e}")
+            return None
+
+    with open(os.path.join(directory, HASHES_FILE), "wb") as f, ThreadPoolExecutor(workers) as pool:
+        chunk = []
+        for item in iter_images(root, split_names):
+            chunk.append(item)
+            if len(chunk) == CHUNK_SIZE:
+                count += _write_hashes(f, pool.map(hash_item, chunk))
+                chunk = []
+        count += _write_hashes(f, pool.map(hash_item, chunk))
+
+    return count
+
+
+def _write_hashes(f, results):
+    records = np.array([result for result in results if result is not None], dtype=HASH_DTYPE)
+    records.tofile(f)
+    return len(records)
+
+
+def band_masks(max_distance):
+    """
+    Splits the 64 bits into max_distance + 1 bands: two hashes at most max_distance bits apart are equal in at
+    least one band, so only hashes sharing a band value need to be compared.
+    """
+    bands = max_distance + 1
+    edges = np.linspace(0, 64, bands + 1).astype(int)
+    return [(int(low), (1 << int(high - low)) - 1) for low, high in zip(edges[:-1], edges[1:])]
+
+
+def popcount64(x):
+    x = x - ((x >> np.uint64(1)) & np.uint64(0x5555555555555555))
+    x = (x & np.uint64(0x3333333333333333)) + ((x >> np.uint64(2)) & np.uint64(0x3333333333333333))
+    x = (x + (x >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    return ((x * np.uint64(0x0101010101010101)) >> np.uint64(56)).astype(np.int64)
+
+
+def find_duplicates(root, split_names, max_distance=3):
+    """
+    Pairs of images whose hashes are at most max_distance bits apart, written to dedup/pairs.jsonl.
+
+    Multi-index hashing: per band the records are sorted by band value and only records of equal value are
+    compared. A pair is reported in the first band it shares whose bucket was compared (at most MAX_BUCKET
+    records), so no set of seen pairs is kept; memory is 8 bytes of hash, one sort order and a bit per band of
+    compared buckets per image. Pairs that only share buckets too large to compare are lost, skipped_buckets in
+    the report counts those buckets. Returns the report (counts per split pair, etc.).
+
+    Every further bit of max_distance adds a band and makes the bands narrower: 3 (four 16 bit bands) keeps the
+    buckets small up to tens of millions of images.
+    """
+    directory = os.path.join(root, DEDUP_DIR)
+    hashes_path = os.path.join(directory, HASHES_FILE)
+    # No image was hashed (nothing rendered yet): an empty file can't be mapped
+    records = np.memmap(hashes_path, dtype=HASH_DTYPE, mode="r") if os.path.getsize(hashes_path) else \
+        np.zeros(0, dtype=HASH_DTYPE)
+    hashes = np.asarray(records["hash"])
+    masks = band_masks(max_distance)
+
+    # Bit b of a record: its bucket of band b was compared, not skipped for its size
+    compared = np.zeros(len(hashes), dtype=np.min_scalar_type((1 << len(masks)) - 1))
+
+    pair_counts = {}
+    exact = 0
+    skipped_buckets = 0
+
+    with open(os.path.join(directory, PAIRS_FILE), "w", encoding="utf-8") as pairs_file:
+        for band, (shift, mask) in enumerate(masks):
+            values = (hashes >> np.uint64(shift)) & np.uint64(mask)
+            order = np.argsort(values, kind="stable")
+            sorted_values = values[order]
+
+            starts = np.flatnonzero(np.r_[True, sorted_values[1:] != sorted_values[:-1]])
+            sizes = np.diff(np.r_[starts, len(order)])
+            skipped_buckets += int(np.count_nonzero(sizes > MAX_BUCKET))
+            compared[order] |= np.repeat(sizes <= MAX_BUCKET, sizes).astype(compared.dtype) << band
+
+            for first, second in _bucket_pairs(hashes, order, starts, sizes, max_distance):
+                # Reported already by an earlier band they share, unless its bucket was too large to compare
+                earlier = np.zeros(len(first), dtype=bool)
+                for earlier_band, (earlier_shift, earlier_mask) in enumerate(masks[:band]):
+                    shared = (((hashes[first] ^ hashes[second]) >> np.uint64(earlier_shift))
+                              & np.uint64(earlier_mask)) == 0
+                    earlier |= shared & ((compared[first] >> earlier_band) & 1).astype(bool)
+
+                for a, b in zip(first[~earlier], second[~earlier]):
+                    a_record, b_record = records[a], records[b]
+                    distance = int(popcount64(np.array([hashes[a] ^ hashes[b]], dtype=np.uint64))[0])
+                    splits = sorted((split_names[a_record["split"]], split_names[b_record["split"]]))
+                    key = "/".join(splits)
+
+                    pair_counts[key] = pair_counts.get(key, 0) + 1
+                    exact += distance == 0
+                    pairs_file.write(json.dumps({
+                        "a": [split_names[a_record["split"]], int(a_record["index"])],
+                        "b": [split_names[b_record["split"]], int(b_record["index"])],
+                        "distance": distance,
+                    }) + "\n")
+
+    cross_split = sum(count for key, count in pair_counts.items() if key.split("/")[0] != key.split("/")[1])
+    report = {
+        "images": len(records),
+        "max_distance": max_distance,
+        "pairs": sum(pair_counts.values()),
+        "exact": int(exact),
+        "cross_split": cross_split,
+        "by_splits": pair_counts,
+        "skipped_buckets": skipped_buckets,
+    }
+
+    with open(os.path.join(directory, "report.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    return report
+
+
+def _bucket_pairs(hashes, order, starts, sizes, max_distance, max_cells=1 << 16):
+    """
+    (first, second) row arrays of the close pairs within the buckets of one band. Buckets of the same size are
+    compared together, as (buckets, size, size) distance blocks of at most max_cells entries (small enough to
+    stay in cache, which matters more than the number of NumPy calls).
+    """
+    for size in np.unique(sizes[(sizes > 1) & (sizes <= MAX_BUCKET)]):
+        bucket_starts = starts[sizes == size]
+        upper = np.triu(np.ones((size, size), dtype=bool), k=1)
+        step = max(1, max_cells // (size * size))
+
+        for chunk in range(0, len(bucket_starts), step):
+            rows = order[bucket_starts[chunk:chunk + step, None] + np.arange(size)]
+            bucket_hashes = hashes[rows]
+            distances = popcount64(bucket_hashes[:, :, None] ^ bucket_hashes[:, None, :])
+            bucket, i, j = np.nonzero((distances <= max_distance) & upper)
+
+            if len(bucket):
+                yield rows[bucket, i], rows[bucket, j]
+
+
+def samples_to_rerender(root, split_names):
+    """
+    One sample of every pair across splits, the one in the later split (train is kept, test is given up first),
+    as (bucket, index), without repeats.
+    """
+    rank = {split: number for number, split in enumerate(split_names)}
+    flagged = set()
+
+    with open(os.path.join(root, DEDUP_DIR, PAIRS_FILE), "r", encoding="utf-8") as f:
+        for line in f:
+            pair = json.loads(line)
+            a, b = tuple(pair["a"]), tuple(pair["b"])
+            if a[0] != b[0]:
+                flagged.add(max(a, b, key=lambda sample: rank[sample[0]]))
+
+    return sorted(flagged)
@@ -0,0 +1,52 @@
+import json
+import os
+import threading
+import time
+
+
+class EventLog:
+    """Thread-safe JSON lines log of orchestrator events (restarts, crashes, ...), one object per line."""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def log(self, event, **fields):
+        entry = {"time": round(time.time(), 3), "event": event, **fields}
+
+        with self._lock:
+            self._file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def read_throughput(path, n):
+    """
+    Samples per second of workers 0..n-1 from the last "throughput" event of each in the log, workers without
+    one get the mean of the others. None when nothing was measured yet.
+    """
+    if not os.path.exists(path):
+        return None
+
+    rates = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+
+            if entry.get("event") == "throughput" and entry.get("seconds", 0) > 0 and entry.get("samples", 0) > 0:
+                rates[entry["worker"]] = entry["samples"] / entry["seconds"]
+
+    measured = [rates[worker] for worker in range(n) if worker in rates]
+    if not measured:
+        return None
+
+    mean = sum(measured) / len(measured)
+    return [rates.get(worker, mean) for worker in range(n)]
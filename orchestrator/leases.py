@@ -0,0 +1,101 @@
+import threading
+from collections import deque
+
+
+class LeaseQueue:
+    """
+    Thread-safe queue of small index ranges ("leases") that Blender workers pull from.
+
+    Each lease is a dict {"id", "name", "start", "size"}, the same shape as a bucket entry, so the worker side
+    can iterate it exactly like a bucket. Leases that are not completed (crash, recycle) are put back at the
+    front of the queue with whatever was already rendered cut off.
+    """
+
+    def __init__(self, buckets, lease_size=16):
+        self.lease_size = max(1, int(lease_size))
+        self._pending = deque()
+        self._in_flight = {}
+        self._next_id = 0
+        self._condition = threading.Condition()
+
+        self.total = 0
+        self.completed = 0
+        self.skipped = 0
+
+        for bucket in buckets:
+            self.total += bucket['size']
+            self._pending.extend(self._split(bucket))
+
+    def _split(self, bucket):
+        start = bucket.get('start', 0)
+        end = start + bucket['size']
+
+        for lease_start in range(start, end, self.lease_size):
+            yield self._new_lease(bucket['name'], lease_start, min(self.lease_size, end - lease_start))
+
+    def _new_lease(self, name, start, size):
+        lease = {"id": self._next_id, "name": name, "start": start, "size": size}
+        self._next_id += 1
+        return lease
+
+    def acquire(self, wait=True, timeout=None):
+        """
+        Returns the next lease, or None when there is no work left.
+
+        With wait=True an empty queue only means "done" once nothing is in flight anymore, since leases held
+        by other workers may still be released back into the queue. With a timeout it also returns None when
+        nothing came back in time, `finished` tells the two apart.
+        """
+        with self._condition:
+            while not self._pending:
+                if not wait or not self._in_flight:
+                    return None
+                if not self._condition.wait(timeout):
+                    return None
+
+            lease = self._pending.popleft()
+            self._in_flight[lease["id"]] = lease
+            return lease
+
+    def complete(self, lease):
+        with self._condition:
+            if self._in_flight.pop(lease["id"], None) is not None:
+                self.completed += lease["size"]
+            self._condition.notify_all()
+
+    def release(self, lease, done=0, skip=None):
+        """
+        Puts the unfinished part of a lease back at the front of the queue.
+
+        `skip` is an index of the lease that is left out for good (a quarantined sample); it counts as skipped.
+        """
+        with self._condition:
+            if self._in_flight.pop(lease["id"], None) is None:
+                return
+
+            self.completed += done
+            start, end = lease["start"] + done, lease["start"] + lease["size"]
+
+            if skip is not None and start <= skip < end:
+                self.skipped += 1
+                parts = [(start, skip), (skip + 1, end)]
+            else:
+                parts = [(start, end)]
+
+            for part_start, part_end in reversed(parts):
+                if part_end > part_start:
+                    self._pending.appendleft(self._new_lease(lease["name"], part_start, part_end - part_start))
+
+            self._condition.notify_all()
+
+    @property
+    def finished(self):
+        with self._condition:
+            return not self._pending and not self._in_flight
+
+    @property
+    def remaining(self):
+        with self._condition:
+            return sum(lease["size"] for lease in self._pending) + sum(
+                lease["size"] for lease in self._in_flight.values()
+            )
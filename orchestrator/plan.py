@@ -0,0 +1,153 @@
+import json
+import math
+import os
+import time
+
+import numpy as np
+
+from scripts.plan import META_FILE, PLAN_DTYPE, bucket_plan_path, plan_dir
+from scripts.projection import project_card_boxes
+from scripts.sample_params import (
+    CAMERA_POSITION, CAMERA_POSITION_RANGE, CAMERA_ROTATION_RANGE, CARD_POSITION, CARD_POSITION_RANGE,
+    CARD_ROTATION_RANGE, FIELDS, LIGHT_DONUT_RADIUS, LIGHT_INTENSITY, LIGHT_POSITION, LIGHT_POSITION_RANGE,
+    LIGHT_ROTATION_RANGE, LIGHT_TEMPERATURE, MATERIAL_SEED_MAX
+)
+from scripts.seeding import GOLDEN_GAMMA, MASK64, bucket_seed
+
+CHUNK_SIZE = 65536
+
+
+def splitmix64(x):
+    """scripts.seeding.splitmix64 on a uint64 array; the products wrap around like the masked Python version."""
+    x = x + np.uint64(GOLDEN_GAMMA)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def sample_seeds(dataset_name, bucket_name, indices):
+    indices = np.asarray(indices, dtype=np.uint64)
+    return splitmix64(np.uint64(bucket_seed(dataset_name, bucket_name)) + indices * np.uint64(GOLDEN_GAMMA))
+
+
+def uniforms(seeds, field):
+    offset = np.uint64(((field + 1) * GOLDEN_GAMMA) & MASK64)
+    return (splitmix64(seeds + offset) >> np.uint64(11)) * (1.0 / (1 << 53))
+
+
+def draw_scene_params_batch(seeds, vertical):
+    """draw_scene_params for many samples at once; `vertical` tells which samples are vertical cards."""
+
+    def around(base, ranges, fields):
+        return np.stack([b + (2.0 * uniforms(seeds, f) - 1.0) * r for b, r, f in zip(base, ranges, fields)], axis=1)
+
+    def between(low_high, field):
+        low, high = low_high
+        return low + uniforms(seeds, field) * (high - low)
+
+    light_location = around(LIGHT_POSITION, LIGHT_POSITION_RANGE, FIELDS["light_location"])
+    radius = between(LIGHT_DONUT_RADIUS, FIELDS["light_donut_radius"])
+    angle = between((0.0, 2.0 * math.pi), FIELDS["light_donut_angle"])
+    light_location[:, 0], light_location[:, 1] = radius * np.cos(angle), radius * np.sin(angle)
+
+    card_rotation = around((0.0, 0.0, 0.0), CARD_ROTATION_RANGE, FIELDS["card_rotation"])
+    card_rotation[:, 2] += np.where(vertical, math.radians(90), 0.0)
+
+    return {
+        "seed": seeds,
+        "camera_location": around(CAMERA_POSITION, CAMERA_POSITION_RANGE, FIELDS["camera_location"]),
+        "camera_rotation": around((0.0, 0.0, 0.0), CAMERA_ROTATION_RANGE, FIELDS["camera_rotation"]),
+        "card_location": around(CARD_POSITION, CARD_POSITION_RANGE, FIELDS["card_location"]),
+        "card_rotation": card_rotation,
+        "light_location": light_location,
+        "light_rotation": around((0.0, 0.0, 0.0), LIGHT_ROTATION_RANGE, FIELDS["light_rotation"]),
+        "light_energy": between(LIGHT_INTENSITY, FIELDS["light_energy"]),
+        "light_temperature": between(LIGHT_TEMPERATURE, FIELDS["light_temperature"]),
+        "card_material": uniforms(seeds, FIELDS["card_material"]),
+        "card_material_seed": (uniforms(seeds, FIELDS["card_material_seed"]) * MATERIAL_SEED_MAX).astype(np.int64),
+        "table_material": uniforms(seeds, FIELDS["table_material"]),
+        "table_material_seed": (uniforms(seeds, FIELDS["table_material_seed"]) * MATERIAL_SEED_MAX).astype(np.int64),
+    }
+
+
+def build_plan(root, dataset_name, buckets, id_ds, classes, geometry):
+    """
+    Writes the scene parameters and card box of every sample of the buckets to plan/<bucket>.npy (PLAN_DTYPE rows,
+    memory-mapped while written), plus plan/meta.json. Only the card class and subtype are read per record, the
+    rest is computed in chunks of CHUNK_SIZE samples.
+    """
+    directory = plan_dir(root)
+    os.makedirs(directory, exist_ok=True)
+    meta = {"dataset": dataset_name, "created": time.time(), "geometry": geometry, "buckets": {}}
+
+    for bucket in buckets:
+        name, start, size = bucket['name'], bucket.get('start', 0), bucket['size']
+        rows = np.lib.format.open_memmap(bucket_plan_path(root, name), mode="w+", dtype=PLAN_DTYPE, shape=(size,))
+
+        for offset in range(0, size, CHUNK_SIZE):
+            indices = np.arange(start + offset, start + min(offset + CHUNK_SIZE, size), dtype=np.int64)
+            chunk = rows[offset:offset + len(indices)]
+
+            objects = [id_ds[int(index)].objects[0] for index in indices]
+            object_classes = np.array([info["class"] for info in objects])
+
+            seeds = sample_seeds(dataset_name, name, indices)
+            params = draw_scene_params_batch(seeds, object_classes == "vertical_card")
+            boxes, clipped = project_card_boxes(params, geometry)
+
+            chunk["index"] = indices
+            chunk["class_id"] = [classes[object_class] for object_class in object_classes]
+            chunk["subtype"] = [info["subtype"] for info in objects]
+            for field, values in params.items():
+                chunk[field] = values
+            chunk["box"] = boxes
+            chunk["box_clipped"] = clipped
+
+        rows.flush()
+        del rows
+        meta["buckets"][name] = {"start": start, "size": size}
+
+    meta_path = os.path.join(directory, META_FILE)
+    with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(meta_path + ".tmp", meta_path)
+
+    return meta
+
+
+def summarize_plan(root, meta, classes):
+    """Label distribution of a plan per bucket: class counts, box size and center percentiles, clipped share."""
+    class_names = {class_id: name for name, class_id in classes.items()}
+    width, height = meta["geometry"]["resolution"]
+    summary = {}
+
+    for name in meta["buckets"]:
+        rows = np.load(bucket_plan_path(root, name), mmap_mode="r")
+        if len(rows) == 0:
+            continue
+
+        boxes = np.asarray(rows["box"], dtype=np.float64)
+        box_width = (boxes[:, 2] - boxes[:, 0]) / width
+        box_height = (boxes[:, 3] - boxes[:, 1]) / height
+        center_x = (boxes[:, 0] + boxes[:, 2]) / 2.0 / width
+        center_y = (boxes[:, 1] + boxes[:, 3]) / 2.0 / height
+        class_ids, counts = np.unique(rows["class_id"], return_counts=True)
+
+        def percentiles(values):
+            return [round(float(value), 4) for value in np.percentile(values, (5, 50, 95))]
+
+        summary[name] = {
+            "samples": len(rows),
+            "classes": {class_names.get(int(c), str(c)): int(count) for c, count in zip(class_ids, counts)},
+            "subtypes": len(np.unique(rows["subtype"])),
+            "box_width_p5_p50_p95": percentiles(box_width),
+            "box_height_p5_p50_p95": percentiles(box_height),
+            "center_x_p5_p50_p95": percentiles(center_x),
+            "center_y_p5_p50_p95": percentiles(center_y),
+            "clipped": round(float(np.mean(rows["box_clipped"])), 4),
+        }
+
+    with open(os.path.join(plan_dir(root), "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+
+    return summary
@@ -0,0 +1,96 @@
+import json
+import os
+import threading
+import time
+
+QUARANTINE_DIR = "quarantine"
+
+
+class RetryPolicy:
+    """
+    How a crashed Blender instance is relaunched: after 2, 4, 8, ... seconds (at most max_delay), and given up
+    after max_retries crashes in a row without a single finished sample in between.
+    """
+
+    def __init__(self, max_retries=5, base_delay=2.0, max_delay=60.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, crashes):
+        return min(self.max_delay, self.base_delay * 2 ** (crashes - 1))
+
+
+class Quarantine:
+    """
+    Counts the crashes blamed on each sample and quarantines a sample that crashed Blender max_failures times,
+    so the run goes on without it.
+
+    Quarantined samples are appended to quarantine/<segment>.jsonl with the error and its traceback; later runs
+    skip them (see read_quarantine) until they are rendered explicitly with --only.
+    """
+
+    def __init__(self, root, segment="run", max_failures=2, events=None):
+        self.path = os.path.join(root, QUARANTINE_DIR, f"{segment}.jsonl")
+        self.max_failures = max_failures
+        self.events = events
+
+        self.entries = []
+        self._failures = {}
+        self._lock = threading.Lock()
+
+    def record_failure(self, bucket_name, index, error=None, returncode=None):
+        """Blames one crash on the sample; returns True when that quarantines it."""
+        key = (bucket_name, index)
+
+        with self._lock:
+            self._failures[key] = self._failures.get(key, 0) + 1
+            if self._failures[key] < self.max_failures:
+                return False
+
+            entry = {
+                "bucket": bucket_name,
+                "index": index,
+                "failures": self._failures[key],
+                "returncode": returncode,
+                "error": error and f"{error['type']}: {error['message']}",
+                "traceback": error and error["traceback"],
+                "time": round(time.time(), 3),
+            }
+            self.entries.append(entry)
+
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+        if self.events is not None:
+            self.events.log("quarantine", bucket=bucket_name, index=index, error=entry["error"])
+
+        return True
+
+    def only_spec(self):
+        """The quarantined samples of this run as a --only argument, to render them again later."""
+        return ",".join(f"{entry['bucket']}:{entry['index']}" for entry in self.entries)
+
+
+def read_quarantine(root):
+    """bucket name -> set of quarantined indices, over every quarantine segment."""
+    quarantined = {}
+    directory = os.path.join(root, QUARANTINE_DIR)
+
+    if not os.path.isdir(directory):
+        return quarantined
+
+    for entry in os.scandir(directory):
+        if not entry.name.endswith(".jsonl"):
+            continue
+
+        with open(entry.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                quarantined.setdefault(record["bucket"], set()).add(record["index"])
+
+    return quarantined
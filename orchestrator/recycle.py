@@ -0,0 +1,83 @@
+MB = 1024 * 1024
+
+
+class RecyclePolicy:
+    """
+    Decides when a Blender worker has to be restarted.
+
+    With memory limits configured the worker is restarted only when its RSS crosses max_rss_mb or when RSS
+    keeps growing faster than max_growth_mb (MB per sample, least squares over the last `window` samples).
+    restart_every is the fallback for workers that do not report memory, and max_samples an optional hard cap.
+    """
+
+    def __init__(self, restart_every=80, max_rss_mb=None, max_growth_mb=None, window=40, warmup=8,
+                 max_samples=None):
+        self.restart_every = restart_every
+        self.max_rss_mb = max_rss_mb
+        self.max_growth_mb = max_growth_mb
+        self.window = window
+        self.warmup = warmup
+        self.max_samples = max_samples
+
+    @property
+    def memory_based(self):
+        return self.max_rss_mb is not None or self.max_growth_mb is not None
+
+    def tracker(self):
+        return MemoryTracker(self)
+
+
+class MemoryTracker:
+    """Memory readings of a single worker process."""
+
+    def __init__(self, policy):
+        self.policy = policy
+        self.samples = []
+        self.last = None
+
+    def observe(self, sample_count, stats):
+        self.last = stats
+
+        if stats.get("rss") is None:
+            return
+
+        self.samples.append((sample_count, stats["rss"] / MB))
+        if len(self.samples) > self.policy.window:
+            self.samples.pop(0)
+
+    def growth_mb_per_sample(self):
+        points = [(x, y) for x, y in self.samples if x > self.policy.warmup]
+        if len(points) < 2:
+            return None
+
+        mean_x = sum(x for x, _ in points) / len(points)
+        mean_y = sum(y for _, y in points) / len(points)
+        variance = sum((x - mean_x) ** 2 for x, _ in points)
+
+        if variance == 0:
+            return None
+
+        return sum((x - mean_x) * (y - mean_y) for x, y in points) / variance
+
+    def restart_reason(self, sample_count):
+        """Returns why the worker should be restarted after `sample_count` samples, or None to keep it."""
+        policy = self.policy
+
+        if policy.max_samples is not None and sample_count >= policy.max_samples:
+            return f"sample cap ({sample_count} samples)"
+
+        if not policy.memory_based or not self.samples:
+            if sample_count >= policy.restart_every:
+                return f"fixed count ({sample_count} samples)"
+            return None
+
+        rss_mb = self.samples[-1][1]
+        if policy.max_rss_mb is not None and rss_mb >= policy.max_rss_mb:
+            return f"rss {rss_mb:.0f} MB >= {policy.max_rss_mb} MB"
+
+        growth = self.growth_mb_per_sample()
+        if policy.max_growth_mb is not None and growth is not None and len(self.samples) >= policy.window \
+                and growth >= policy.max_growth_mb:
+            return f"leak {growth:.2f} MB/sample >= {policy.max_growth_mb} MB/sample"
+
+        return None
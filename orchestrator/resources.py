@@ -0,0 +1,143 @@
+"""
+CPU budget of the Blender instances running on one machine: which cores each one may use and how many threads it
+starts, so N instances share the machine instead of each sizing its thread pools for all of it.
+"""
+import ctypes
+import glob
+import os
+import sys
+from contextlib import contextmanager
+
+# Thread pools sized by environment variable: OpenMP (Cycles' denoiser and many native libraries) and BLAS
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "NUMEXPR_NUM_THREADS",
+                   "VECLIB_MAXIMUM_THREADS")
+
+
+def parse_cpu_list(text):
+    """CPU ids of a Linux cpulist such as "0-3,8-11"."""
+    cpus = []
+    for part in text.strip().split(","):
+        if "-" in part:
+            low, high = part.split("-")
+            cpus.extend(range(int(low), int(high) + 1))
+        elif part:
+            cpus.append(int(part))
+    return cpus
+
+
+def available_cpus():
+    """The CPUs this process may run on (its affinity where the platform tells it), in id order."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def numa_nodes():
+    """
+    CPU ids of every NUMA node, from /sys on Linux; a single node with every available CPU elsewhere or when
+    the machine has one node. CPUs this process may not use are left out.
+    """
+    allowed = set(available_cpus())
+    nodes = []
+
+    for path in sorted(glob.glob("/sys/devices/system/node/node[0-9]*/cpulist"),
+                       key=lambda p: int(os.path.basename(os.path.dirname(p))[4:])):
+        with open(path, "r") as f:
+            cpus = [cpu for cpu in parse_cpu_list(f.read()) if cpu in allowed]
+        if cpus:
+            nodes.append(cpus)
+
+    return nodes or [sorted(allowed)]
+
+
+def plan_cpu_sets(instances, threads=None):
+    """
+    A disjoint CPU set per instance of `threads` CPUs each (default: an equal share of the machine). Every NUMA
+    node is filled with whole sets first, so a set only spans nodes when no node has room left for it; those are
+    cut from the CPUs the nodes have left over, node by node. With more instances than CPUs the sets are shared
+    round robin, one CPU each.
+    """
+    nodes = numa_nodes()
+    cpus = [cpu for node in nodes for cpu in node]
+
+    if instances >= len(cpus):
+        return [[cpus[i % len(cpus)]] for i in range(instances)]
+
+    size = min(threads or len(cpus) // instances, len(cpus) // instances)
+    sets = []
+    leftover = []
+
+    for node in nodes:
+        whole = min(len(node) // size, instances - len(sets))
+        sets.extend(node[i * size:(i + 1) * size] for i in range(whole))
+        leftover.extend(node[whole * size:])
+
+    while len(sets) < instances:
+        sets.append(leftover[:size])
+        leftover = leftover[size:]
+
+    return sets
+
+
+def thread_env(threads):
+    """Environment variables that keep the thread pools of a worker at `threads`."""
+    return {name: str(threads) for name in THREAD_ENV_VARS}
+
+
+@contextmanager
+def spawn_pinned(cpus):
+    """
+    Processes started inside the block start on the CPUs, with every thread they ever run: the calling thread's
+    affinity is set for the block and restored after it, and a child inherits it from the thread that starts it
+    before running any code. Yields False where the platform can't do it (then see pin_process).
+    """
+    if not cpus or not hasattr(os, "sched_setaffinity"):
+        yield False
+        return
+
+    # Pid 0 is the calling thread only, the orchestrator's other threads keep their affinity
+    previous = os.sched_getaffinity(0)
+    os.sched_setaffinity(0, cpus)
+    try:
+        yield True
+    finally:
+        os.sched_setaffinity(0, previous)
+
+
+def pin_process(pid, cpus):
+    """
+    Restricts every thread of the running process to the CPUs, for a process started before its CPUs were known
+    (a warm spare); threads it starts meanwhile may still run elsewhere for a moment. Returns False when the
+    platform can't do it (macOS), or on Windows for CPUs beyond the first 64 (one processor group).
+    """
+    if hasattr(os, "sched_setaffinity"):
+        # Threads the process already started (a warm spare) keep their own affinity, set every one of them
+        task_dir = f"/proc/{pid}/task"
+        threads = [int(tid) for tid in os.listdir(task_dir)] if os.path.isdir(task_dir) else [pid]
+        for tid in threads:
+            try:
+                os.sched_setaffinity(tid, cpus)
+            except (ProcessLookupError, FileNotFoundError):
+                pass
+        return True
+
+    if sys.platform == "win32" and max(cpus) < 64:
+        return _windows_set_affinity(pid, sum(1 << cpu for cpu in cpus))
+
+    return False
+
+
+PROCESS_SET_INFORMATION = 0x0200
+PROCESS_QUERY_INFORMATION = 0x0400
+
+
+def _windows_set_affinity(pid, mask):
+    kernel32 = ctypes.windll.kernel32
+    handle = kernel32.OpenProcess(PROCESS_SET_INFORMATION | PROCESS_QUERY_INFORMATION, False, pid)
+    if not handle:
+        return False
+
+    try:
+        return bool(kernel32.SetProcessAffinityMask(handle, ctypes.c_size_t(mask)))
+    finally:
+        kernel32.CloseHandle(handle)
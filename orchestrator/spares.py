@@ -0,0 +1,40 @@
+import threading
+from collections import deque
+
+
+class SparePool:
+    """
+    Worker processes started ahead of time: they load the .blend file, the scripts and the datasets, connect and
+    then wait on their channel for a first lease. An instance that restarts its worker (recycled or crashed)
+    takes a spare instead of launching Blender and waiting for it, and the pool starts the next spare right away.
+
+    Every process writes its manifest, annotation and shard segments under its worker id, so two live processes
+    must never share one: a new spare gets the id of the process whose replacement it stands in for, which has
+    exited by then. A run thus uses the instances' ids plus one per spare.
+
+    launch(worker_id) starts a worker process and returns it (see run.py:launch_worker), stop(worker) ends one
+    that was never used.
+    """
+
+    def __init__(self, launch, stop, worker_ids):
+        self._launch = launch
+        self._stop = stop
+        self._lock = threading.Lock()
+        self._ready = deque(launch(worker_id) for worker_id in worker_ids)
+        self.taken = 0
+
+    def take(self, freed_id):
+        """A started spare, or None when there is none; freed_id is the id of the worker it replaces."""
+        with self._lock:
+            if not self._ready:
+                return None
+
+            spare = self._ready.popleft()
+            self._ready.append(self._launch(freed_id))
+            self.taken += 1
+            return spare
+
+    def close(self):
+        with self._lock:
+            while self._ready:
+                self._stop(self._ready.popleft())
@@ -0,0 +1,129 @@
+import json
+import math
+import os
+import threading
+import time
+
+from scripts.timing import STAGES
+
+# Log-spaced histogram from 1 µs to ~3 hours, 20 bins per decade: percentiles are within ~6% of the true value
+BINS_PER_DECADE = 20
+MIN_SECONDS = 1e-6
+BIN_COUNT = 10 * BINS_PER_DECADE
+
+
+class LogHistogram:
+    """Constant-memory histogram of durations, good enough for p50 / p95 over millions of samples."""
+
+    def __init__(self):
+        self.bins = [0] * BIN_COUNT
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+        position = math.log10(max(seconds, MIN_SECONDS) / MIN_SECONDS) * BINS_PER_DECADE
+        self.bins[min(int(position), BIN_COUNT - 1)] += 1
+
+    def percentile(self, q):
+        if not self.count:
+            return 0.0
+
+        rank = q / 100.0 * self.count
+        seen = 0
+        for position, count in enumerate(self.bins):
+            seen += count
+            if seen >= rank:
+                # Geometric middle of the bin
+                return min(MIN_SECONDS * 10 ** ((position + 0.5) / BINS_PER_DECADE), self.max)
+
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": round(self.sum / self.count, 6) if self.count else 0.0,
+            "p50": round(self.percentile(50), 6),
+            "p95": round(self.percentile(95), 6),
+            "max": round(self.max, 6),
+            "total": round(self.sum, 3),
+        }
+
+
+class StageReport:
+    """
+    Aggregates the TIMING lines of every worker into per-stage histograms.
+
+    With a Rich progress task the stage p50 / p95 are shown live as its description, refreshed at most every
+    `refresh_seconds`. `write(path)` saves the final report as JSON.
+    """
+
+    def __init__(self, progress=None, task=None, refresh_seconds=1.0):
+        self.progress = progress
+        self.task = task
+        self.refresh_seconds = refresh_seconds
+
+        self.stages = {}
+        self.samples = 0
+        self.per_worker = {}
+        self.started_at = time.time()
+
+        self._lock = threading.Lock()
+        self._refreshed_at = 0.0
+
+    def add(self, worker, timings):
+        with self._lock:
+            self.samples += 1
+            self.per_worker[worker] = self.per_worker.get(worker, 0) + 1
+
+            for stage, seconds in timings.items():
+                if isinstance(seconds, (int, float)):
+                    self.stages.setdefault(stage, LogHistogram()).add(seconds)
+
+            now = time.time()
+            refresh = self.progress is not None and now - self._refreshed_at >= self.refresh_seconds
+            if refresh:
+                self._refreshed_at = now
+                line = self._line()
+
+        if refresh:
+            self.progress.update(self.task, description=line)
+
+    def _ordered_stages(self):
+        known = [stage for stage in STAGES if stage in self.stages]
+        return known + sorted(stage for stage in self.stages if stage not in STAGES)
+
+    def _line(self):
+        parts = []
+        for stage in self._ordered_stages():
+            histogram = self.stages[stage]
+            parts.append(f"{stage} {_format_seconds(histogram.percentile(50))}/"
+                         f"{_format_seconds(histogram.percentile(95))}")
+
+        return "[bold]p50/p95[/bold] " + "  ".join(parts)
+
+    def report(self):
+        with self._lock:
+            elapsed = time.time() - self.started_at
+            return {
+                "samples": self.samples,
+                "seconds": round(elapsed, 3),
+                "samples_per_second": round(self.samples / elapsed, 4) if elapsed > 0 else 0.0,
+                "per_worker": {str(worker): count for worker, count in self.per_worker.items()},
+                "stages": {stage: self.stages[stage].summary() for stage in self._ordered_stages()},
+            }
+
+    def write(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+
+
+def _format_seconds(seconds):
+    if seconds >= 1.0:
+        return f"{seconds:.2f}s"
+    return f"{seconds * 1000:.1f}ms"
@@ -1,104 +1,355 @@
+import argparse
 import json
 import math
 import os
+import shlex
+import shutil
+import socket
 import subprocess
+import sys
 import threading
+import time
+from collections import deque
+from fractions import Fraction
+from types import SimpleNamespace
 
 import yaml
 from lambdawalker.dataset.DiskDataset import DiskDataset
 from rich.progress import Progress, BarColumn, TextColumn, TimeElapsedColumn, TimeRemainingColumn, SpinnerColumn, MofNCompleteColumn
 
+from orchestrator.agent import CoordinatorClient, RemoteLeaseQueue
+from orchestrator.annotations import merge_annotations
+from orchestrator.channel import WorkerChannel, WorkerLog, read_tail
+from orchestrator.coordinator import Coordinator, serve
+from orchestrator.dedup import MAX_BUCKET, compute_hashes, find_duplicates, samples_to_rerender
+from orchestrator.events import EventLog, read_throughput
+from orchestrator.leases import LeaseQueue
+from orchestrator.plan import build_plan, summarize_plan
+from orchestrator.quarantine import Quarantine, RetryPolicy, read_quarantine
+from orchestrator.recycle import RecyclePolicy
+from orchestrator.resources import available_cpus, numa_nodes, pin_process, plan_cpu_sets, spawn_pinned, thread_env
+from orchestrator.spares import SparePool
+from orchestrator.timing import StageReport
+from scripts.manifest import bootstrap_manifest, manifest_dir, missing_intervals, read_manifest
+from scripts.plan import load_geometry
+from scripts.protocol import encode_lease
+from scripts.render_profiles import resolve_profile
+from scripts.sample_params import ParamsWriter, draw_scene_params
+from scripts.seeding import add_salts, read_salts, sample_seed
+from scripts.shards import expand_shards as expand_shards_to_layout, read_shard_index
 
-def start_blender_instance(progress, task_id, blender_path, blend_file, script_path, data, restart_every=80):
-    chunk_size = sum(item['size'] for item in data["buckets"])
-    task = progress.add_task(f"[cyan]Instance {task_id}", total=chunk_size, status="[yellow]Initializing...")
+BLENDER_PATH = os.environ.get("BLENDER_PATH", r"C:\Program Files\Blender Foundation\Blender 5.0\blender.exe")
 
-    completed_total = 0
-    env = os.environ.copy()
-    env["PYTHONUNBUFFERED"] = "1"
-
-    while completed_total < chunk_size:
-        # Update data for the current 'restart' segment
-        # We need to tell the Blender script where to resume for each bucket
-        temp_data = json.loads(json.dumps(data))  # Deep copy
+# Worker command of --renderer numpy(-fast): the Blender stand-in, running the job with the NumPy backend
+NUMPY_RENDERER_COMMAND = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "stub_blender.py")]
 
-        remaining_to_skip = completed_total
 
-        for bucket in temp_data["buckets"]:
-            if remaining_to_skip >= bucket['size']:
-                remaining_to_skip -= bucket['size']
-                bucket['size'] = 0
-            else:
-                bucket['start'] = bucket.get('start', 0) + remaining_to_skip
-                bucket['size'] -= remaining_to_skip
-                remaining_to_skip = 0
+def launch_worker(blender_path, blend_file, script_path, data, worker_id, log_dir="logs", threads=None, cpus=None):
+    """
+    Starts a Blender process and the WorkerChannel it connects to. The worker pulls its work as leases over the
+    channel, so it starts with no buckets of its own; Blender's own output goes to
+    <log_dir>/workers/worker-<id>.log. With threads, Blender (--threads) and the thread pools sized by
+    environment variables start that many threads; with cpus the process is started pinned to them.
+    """
+    channel = WorkerChannel()
+    worker_data = dict(data, buckets=[], lease_mode="channel", channel=channel.info, worker_id=worker_id,
+                       launched_at=time.time())
 
-        command = [
-            blender_path, blend_file,
-            "--background", "--python", script_path,
-            "--", json.dumps(temp_data)
-        ]
+    command = [
+        *blender_command(blender_path), blend_file,
+        "--background", *(["--threads", str(threads)] if threads else []),
+        "--python-exit-code", "1", "--python", script_path,
+        "--", json.dumps(worker_data)
+    ]
 
-        full_output = []
-        progress_since_restart = 0
+    env = os.environ.copy()
+    env["PYTHONUNBUFFERED"] = "1"
+    if threads:
+        env.update(thread_env(threads))
+    log = WorkerLog(os.path.join(log_dir, "workers", f"worker-{worker_id}.log"))
 
-        try:
+    try:
+        log.write(f"--- {time.strftime('%Y-%m-%d %H:%M:%S')} worker {worker_id} ---\n".encode())
+        with spawn_pinned(cpus) as pinned:
             process = subprocess.Popen(
                 command,
+                stdin=subprocess.DEVNULL,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1,
                 env=env
             )
+        if cpus and not pinned:
+            pin_process(process.pid, cpus)
+    except Exception:
+        log.close()
+        channel.close()
+        raise
 
-            progress.update(task, status=f"[green]Running (Part {completed_total})")
+    # Copied by a thread so the log can be rotated by size while the process runs
+    log.follow(process.stdout)
+
+    return SimpleNamespace(worker_id=worker_id, process=process, channel=channel, log=log)
+
+
+def stop_worker(worker):
+    """Ends a worker that never got a lease (an unused spare), it has nothing to finish."""
+    if worker.process.poll() is None:
+        worker.process.kill()
+    worker.process.wait()
+    worker.channel.close()
+    worker.log.close()
+
+
+def start_blender_instance(progress, task_id, blender_path, blend_file, script_path, data, leases, total=None,
+                           overall_task=None, recycle=None, events=None, timings=None, log_dir="logs", retry=None,
+                           quarantine=None, spares=None, resources=None):
+    """
+    Runs Blender processes for one instance until its leases are exhausted, restarting them as the recycle
+    policy asks. Progress, metrics and leases go over a WorkerChannel socket; Blender's own output goes to
+    <log_dir>/workers/worker-<id>.log, of which only the tail is read back for a crash report.
+
+    A crashed process is relaunched with the backoff of the RetryPolicy. The crash is blamed on the sample it
+    was rendering, and the Quarantine takes a sample out of the run once it crashed Blender too often.
+
+    With a SparePool a restart takes an already started worker instead of launching one; the instance then
+    continues under that worker's id.
+
+    resources ({"cpus", "threads"}, see plan_resources) is the instance's share of the machine: every process
+    it runs is started pinned to the cpus and with that many threads; a spare, started before it was known which
+    instance takes it, is pinned when it takes over.
+    """
+    task = progress.add_task(f"[cyan]Instance {task_id}", total=total, status="[yellow]Initializing...")
+    worker_id = task_id
+    resources = resources or {"cpus": None, "threads": None}
+
+    recycle = recycle or RecyclePolicy()
+    retry = retry or RetryPolicy()
+    # Launches in a row that crashed without finishing a sample
+    crashes = 0
+    completed_total = 0
+    started_at = time.time()
+    launches = 0
 
-            for line in iter(process.stdout.readline, ""):
-                full_output.append(line)
-                line_clean = line.strip()
+    while True:
+        # Leases sent to this process that are not finished yet, oldest first, as [lease, rendered]
+        outstanding = deque()
+        error = None
+        current_sample = None
+        worker = None
+        process = None
+        progress_since_restart = 0
+        recycling = False
+        lease_requested = False
+        memory = recycle.tracker()
 
-                if task_id == 1:
-                    pass
-                    #print(f"W{task_id}>", line_clean, end="\n")
+        try:
+            # The previous process has exited, a spare can take over its id
+            if launches and spares is not None:
+                worker = spares.take(worker_id)
+            if worker is None:
+                worker = launch_worker(blender_path, blend_file, script_path, data, worker_id, log_dir,
+                                       resources["threads"], resources["cpus"])
+            else:
+                if resources["cpus"]:
+                    pin_process(worker.process.pid, resources["cpus"])
+                if events is not None:
+                    events.log("spare", worker=task_id, replaced=worker_id, spare=worker.worker_id)
 
-                if "Traceback" in line_clean or "Error:" in line_clean:
-                    has_python_error = True
+            worker_id, process, channel = worker.worker_id, worker.process, worker.channel
+            launches += 1
 
-                if line_clean.startswith("PROGRESS:"):
-                    val = int(float(line_clean.split(":")[1]))
+            progress.update(task, status=f"[green]Running (Part {completed_total})")
 
-                    # Track incremental progress
-                    increment = val - progress_since_restart
+            connected = channel.accept(process)
+
+            for kind, value in (channel.messages() if connected else ()):
+                if kind == "PROGRESS":
+                    increment = value - progress_since_restart
+                    progress_since_restart = value
                     completed_total += increment
-                    progress_since_restart = val
+
+                    if outstanding:
+                        outstanding[0][1] += increment
 
                     progress.update(task, completed=completed_total)
+                    if overall_task is not None:
+                        progress.advance(overall_task, increment)
 
-                    # CHECK FOR RESTART TRIGGER
-                    if progress_since_restart >= restart_every:
-                        progress.update(task, status="[bold blue]Restarting for Memory...")
-                        process.terminate()
-                        break
+                elif kind == "STARTUP":
+                    if events is not None:
+                        events.log("startup", worker=task_id, **value)
 
-            process.wait()
+                elif kind == "PREFETCH":
+                    if events is not None:
+                        events.log("prefetch", worker=task_id, **value)
+
+                elif kind == "CACHE":
+                    if events is not None:
+                        events.log("cache", worker=task_id, **value)
+
+                elif kind == "OUTPUT":
+                    if events is not None:
+                        events.log("output", worker=task_id, **value)
+
+                elif kind == "MEMORY":
+                    memory.observe(progress_since_restart, value)
+
+                elif kind == "TIMING":
+                    if timings is not None:
+                        timings.add(task_id, value)
+
+                elif kind == "ERROR":
+                    error = value
+
+                elif kind == "SAMPLE":
+                    current_sample = value
 
-            # Handle legitimate crashes
-            if process.returncode != 0 and not progress_since_restart >= restart_every:
-                # ... [Keep your existing error logging logic here] ...
-                progress.update(task, status="[bold red]CRASHED")
-                break  # Exit the while loop on actual errors
+                elif kind == "LEASE_DONE":
+                    if outstanding and outstanding[0][0]["id"] == value:
+                        leases.complete(outstanding.popleft()[0])
+
+                elif kind == "LEASE_REQUEST":
+                    lease_requested = True
+
+                # While this process still holds unconfirmed leases it only gets a lease that is ready right away
+                # (so a prefetching worker can read ahead), waiting on the shared queue could mean waiting on ourselves
+                if lease_requested:
+                    # CHECK FOR RESTART TRIGGER, only between leases so nothing is cut mid-sample
+                    reason = memory.restart_reason(progress_since_restart) if progress_since_restart else None
+                    if reason is not None:
+                        recycling = True
+                        lease = None
+                        progress.update(task, status=f"[bold blue]Restarting: {reason}")
+                        if events is not None:
+                            events.log("restart", worker=task_id, reason=reason, samples=progress_since_restart,
+                                       **(memory.last or {}))
+                    else:
+                        lease = leases.acquire(wait=not outstanding)
+                        if lease is None and outstanding:
+                            continue
+
+                    lease_requested = False
+                    if lease is not None:
+                        outstanding.append([lease, 0])
+
+                    channel.send(encode_lease(lease))
+
+            process.wait()
 
         except Exception as e:
             progress.update(task, status=f"[bold red]System Error")
             print(f"\nInternal Wrapper Error: {e}")
+            _release_outstanding(leases, outstanding)
+            if process is not None and process.poll() is None:
+                process.kill()
+            return
+        finally:
+            if worker is not None:
+                worker.channel.close()
+                worker.log.close()
+
+        # Blender only exits with an error code for a failing script with --python-exit-code, ERROR covers the rest
+        crashed = (process.returncode != 0 or error is not None) and not recycling
+
+        skip = None
+        if crashed and current_sample is not None and quarantine is not None:
+            bucket_name, index = current_sample["bucket"], current_sample["index"]
+            if quarantine.record_failure(bucket_name, index, error, process.returncode):
+                skip = (bucket_name, index)
+
+        # Anything not reported as done goes back to the queue for the next process (or another instance)
+        _release_outstanding(leases, outstanding, skip)
+
+        if crashed:
+            report = write_crash_report(log_dir, task_id, process.returncode, error, read_tail(worker.log.path))
+            crashes = crashes + 1 if progress_since_restart == 0 else 1
+            if events is not None:
+                events.log("crash", worker=task_id, returncode=process.returncode, report=report,
+                           error=error and f"{error['type']}: {error['message']}", sample=current_sample,
+                           quarantined=skip is not None, crashes=crashes)
+
+            if crashes > retry.max_retries:
+                progress.update(task, status=f"[bold red]CRASHED {crashes} times, see {report}")
+                return
+
+            delay = retry.delay(crashes)
+            progress.update(task, status=f"[bold red]Crashed, retry in {delay:.0f}s")
+            time.sleep(delay)
+            continue
+
+        crashes = 0
+
+        if not recycling:
+            # The worker was told there is no work left
             break
 
-    if completed_total >= chunk_size:
-        progress.update(task, status="[bold green]Success")
+    if events is not None:
+        # Lets the next static run weight this worker by its speed (--weights auto)
+        events.log("throughput", worker=task_id, samples=completed_total, seconds=round(time.time() - started_at, 3))
+
+    progress.update(task, status="[bold green]Success")
+
+
+def write_crash_report(log_dir, worker_id, returncode, error, tail):
+    path = os.path.join(log_dir, f"crash-{worker_id}-{time.strftime('%Y%m%d-%H%M%S')}.log")
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"Worker {worker_id} exited with code {returncode}\n\n")
+        if error is not None:
+            f.write(error["traceback"] + "\n")
+        f.write(f"--- last {len(tail)} lines of the worker log ---\n")
+        f.write("\n".join(tail) + "\n")
+
+    return path
 
 
-def run_blender_with_progress(blender_path, blend_file, script_path, jobs):
+def _release_outstanding(leases, outstanding, skip=None):
+    while outstanding:
+        lease, rendered = outstanding.popleft()
+        skip_index = skip[1] if skip is not None and skip[0] == lease["name"] else None
+        leases.release(lease, rendered, skip_index)
+
+
+def blender_command(blender_path):
+    """Accepts a single executable path or a full command (e.g. ["python", "stub_blender.py"])."""
+    if isinstance(blender_path, (list, tuple)):
+        return list(blender_path)
+
+    return [blender_path]
+
+
+def run_blender_with_progress(blender_path, blend_file, script_path, jobs, scheduler="static", lease_size=16,
+                              recycle=None, events=None, shared_leases=None, worker_prefix=None, timing=False,
+                              log_dir="logs", retry=None, quarantine=None, spares=0, resources=None):
+    """
+    Runs one Blender instance per job.
+
+    scheduler="static" gives every instance the buckets of its own job, scheduler="queue" puts all buckets in a
+    single shared LeaseQueue so instances that finish early keep pulling work from the slow ones.
+    scheduler="remote" takes the leases from `shared_leases` (a RemoteLeaseQueue of a coordinator) instead;
+    worker_prefix then keeps the worker ids (manifest segments) of different machines apart.
+
+    With timing the workers' TIMING lines are aggregated into a StageReport, shown live and returned.
+    retry and quarantine decide how crashed instances are relaunched and which samples are given up on.
+    spares is the number of warm workers kept started for restarting instances to take over (see SparePool).
+    resources is the CPU set and thread count of every instance (see plan_resources), None to leave both alone.
+    """
+    if scheduler == "remote":
+        worker_leases = [(shared_leases, None) for _ in jobs]
+        grand_total = None
+    elif scheduler == "queue":
+        shared_leases = LeaseQueue([bucket for job in jobs for bucket in job["buckets"]], lease_size)
+        worker_leases = [(shared_leases, None) for _ in jobs]
+        grand_total = shared_leases.total
+    elif scheduler == "static":
+        worker_leases = []
+        for job in jobs:
+            leases = LeaseQueue(job["buckets"], lease_size)
+            worker_leases.append((leases, leases.total))
+        grand_total = sum(leases.total for leases, _ in worker_leases)
+    else:
+        raise ValueError(f"Unknown scheduler '{scheduler}', expected 'static', 'queue' or 'remote'")
+
     # Added a {task.fields[status]} column to the UI
     with Progress(
             TextColumn("{task.description}"),
@@ -111,20 +362,51 @@ def run_blender_with_progress(blender_path, blend_file, script_path, jobs):
             SpinnerColumn(),
             MofNCompleteColumn()
     ) as progress:
+        overall_task = progress.add_task("[bold]All instances", total=grand_total, status=f"[white]{scheduler}")
+
+        timings = None
+        if timing:
+            timings = StageReport(progress, progress.add_task("[bold]p50/p95", total=None, status="[white]timing"))
+
+        worker_ids = [f"{worker_prefix}-{i}" if worker_prefix else i for i in range(len(jobs) + spares)]
+
+        # Spares take the ids after the instances' ones, a job without buckets is the same for every instance
+        spare_threads = resources[0]["threads"] if resources else None
+        spare_pool = SparePool(
+            lambda worker_id: launch_worker(blender_path, blend_file, script_path, jobs[0], worker_id, log_dir,
+                                            spare_threads),
+            stop_worker, worker_ids[len(jobs):]
+        ) if spares > 0 and jobs else None
 
         threads = []
         for i, job_config in enumerate(jobs):
+            leases, total = worker_leases[i]
             t = threading.Thread(
                 target=start_blender_instance,
-                args=(progress, i, blender_path, blend_file, script_path, job_config)
+                args=(progress, worker_ids[i], blender_path, blend_file, script_path, job_config, leases, total,
+                      overall_task, recycle, events, timings, log_dir, retry, quarantine, spare_pool,
+                      resources[i] if resources else None)
             )
             threads.append(t)
             t.start()
 
-        for t in threads:
-            t.join()
+        try:
+            for t in threads:
+                t.join()
+        finally:
+            if spare_pool is not None:
+                spare_pool.close()
+                print(f"\n{spare_pool.taken} restarts took a warm spare")
+
+    print(f"\nAll processes finished. Check {log_dir} for crash reports if any instance failed.")
+
+    if quarantine is not None and quarantine.entries:
+        print(f"{len(quarantine.entries)} samples quarantined after crashing Blender (see {quarantine.path}):")
+        for entry in quarantine.entries:
+            print(f"  {entry['bucket']}:{entry['index']}  {entry['error'] or 'exit code ' + str(entry['returncode'])}")
+        print(f"Render them again with --only \"{quarantine.only_spec()}\"")
 
-    print("\nAll processes finished. Check current directory for crash logs if any instance failed.")
+    return timings
 
 
 def yolo_splits(dataset_size):
@@ -155,98 +437,739 @@ def yolo_splits(dataset_size):
     ]
 
 
-def split_workload_with_offsets(metadata, n):
-    total_size = sum(item['size'] for item in metadata)
-    target_capacity = total_size / n
+def split_workload_with_offsets(metadata, n, weights=None):
+    """
+    Splits the items ({'name', 'size'} with an optional 'start') into n lists of exact, non-overlapping, gap-free
+    intervals, one list per worker.
+
+    Worker k gets the samples between boundaries k and k + 1 of all items laid end to end, where boundary k is
+    total * (weights[0] + ... + weights[k - 1]) / sum(weights) rounded down, computed exactly. Equal weights give
+    shares that differ by at most one sample; weights proportional to measured throughput give faster workers
+    bigger shares. Workers only get nothing when there are fewer samples than workers (or their weight is 0).
+    O(n + len(metadata)).
+    """
+    weights = [1] * n if weights is None else [Fraction(weight) for weight in weights]
 
-    # Track the current read-head for each named split
-    # e.g., {'train': 0, 'val': 0, 'test': 0}
-    offsets = {item['name']: 0 for item in metadata}
+    if len(weights) != n:
+        raise ValueError(f"Expected {n} weights, got {len(weights)}")
+    if any(weight < 0 for weight in weights) or sum(weights) == 0:
+        raise ValueError(f"Weights must be non-negative and not all zero: {weights}")
 
-    # Work on a copy to avoid mutating input
-    remaining_work = [dict(item) for item in metadata]
+    total_size = sum(item['size'] for item in metadata)
+    weight_total = sum(weights)
 
     buckets = []
+    item_index, offset, position, cumulative_weight = 0, 0, 0, 0
 
-    for i in range(n):
+    for weight in weights:
+        cumulative_weight += weight
+        end = math.floor(total_size * cumulative_weight / weight_total)
         current_bucket = []
-        filled_in_this_bucket = 0
 
-        # The last bucket should just take everything left to avoid rounding errors
-        is_last_bucket = (i == n - 1)
+        while position < end:
+            item = metadata[item_index]
+            take = min(item['size'] - offset, end - position)
 
-        while remaining_work:
-            item = remaining_work[0]
-            name = item['name']
+            if take > 0:
+                entry = {'name': item['name'], 'size': take}
+                start = item.get('start', 0) + offset
+                if start > 0:
+                    entry['start'] = start
+                current_bucket.append(entry)
 
-            # How much space is left in this worker's bucket?
-            space_left = target_capacity - filled_in_this_bucket
+            offset += take
+            position += take
 
-            if not is_last_bucket and item['size'] > space_left:
-                # Partial fit: take only what we need
-                take = math.floor(space_left)
-                if take > 0:
-                    entry = {'name': name, 'size': take}
-                    if offsets[name] > 0:
-                        entry['start'] = offsets[name]
+            if offset == item['size']:
+                item_index += 1
+                offset = 0
 
-                    current_bucket.append(entry)
-                    offsets[name] += take + 1
-                    item['size'] -= take
-                    filled_in_this_bucket += take
+        buckets.append(current_bucket)
 
-                # Bucket is full, move to next worker
-                break
-            else:
-                # Full fit: take the whole remaining chunk of this split
-                take = item['size']
-                entry = {'name': name, 'size': take}
-                if offsets[name] > 0:
-                    entry['start'] = offsets[name]
+    return buckets
 
-                current_bucket.append(entry)
-                offsets[name] += take + 1
-                filled_in_this_bucket += take
-                remaining_work.pop(0)  # This split is fully allocated
 
-        buckets.append(current_bucket)
+def parse_weights(spec, n, events_path):
+    """
+    "auto" weights workers by the throughput they had in earlier runs (see orchestrator/events.py), a comma separated
+    list gives them explicitly; None means equal shares.
+    """
+    if spec is None:
+        return None
 
-    return buckets
+    if spec == "auto":
+        weights = read_throughput(events_path, n)
+        if weights is not None:
+            print("Worker weights from measured throughput: " + ", ".join(f"{weight:.2f}" for weight in weights))
+        return weights
+
+    return [float(weight) for weight in spec.split(",")]
+
+
+def pending_buckets(root, buckets):
+    """
+    Returns the parts of the buckets that are not in the run manifest yet, leaving out quarantined samples.
+
+    A run started before the manifest existed gets one built from a directory listing first.
+    """
+    if not os.path.isdir(manifest_dir(root)) and os.path.isdir(os.path.join(root, "images")):
+        print("No run manifest found, building one from existing output...")
+        bootstrap_manifest(root, [bucket['name'] for bucket in buckets])
+
+    completed = read_manifest(root)
+
+    quarantined = read_quarantine(root)
+    quarantined_count = sum(len(indices - completed.get(name, set())) for name, indices in quarantined.items())
+    if quarantined_count:
+        print(f"Skipping {quarantined_count} quarantined samples (see {os.path.join(root, 'quarantine')}), "
+              f"render them with --only")
+        for name, indices in quarantined.items():
+            completed[name] = completed.get(name, set()) | indices
+
+    return missing_intervals(buckets, completed)
+
+
+def plan_resources(instances, threads=None, pin_cpus=False):
+    """
+    The share of the machine of every instance as {"cpus", "threads"}: with pin_cpus a disjoint CPU set per
+    instance (NUMA node by node, see orchestrator/resources.py) and as many threads as it has CPUs, otherwise only
+    the thread count. None when neither is asked for, each Blender then sizes its threads for the whole machine.
+    """
+    if not pin_cpus and not threads:
+        return None
+
+    if not pin_cpus:
+        return [{"cpus": None, "threads": threads} for _ in range(instances)]
 
+    cpu_sets = plan_cpu_sets(instances, threads)
+    nodes = numa_nodes()
+    print(f"CPUs: {len(available_cpus())} on {len(nodes)} NUMA node{'s' if len(nodes) > 1 else ''}, "
+          f"{instances} instances of {len(cpu_sets[0])} threads")
+    return [{"cpus": cpus, "threads": len(cpus)} for cpus in cpu_sets]
 
-def main(instances=8):
+
+def main(instances=8, scheduler="static", lease_size=16, blender_path=BLENDER_PATH, recycle=None, worker_options=None,
+         only=None, dry_run=False, plan=False, weights=None, listen=None, lease_timeout=60.0, retry=None,
+         quarantine_after=2, expand_shards=False, warm_spares=0, pin_cpus=False, threads=None, autotune=False,
+         autotune_samples=40,
+         merge_only=False, benchmark=None, benchmark_samples=20, dedup=False, dedup_distance=3, dedup_rerender=False):
+    """
+    worker_options are passed to every Blender worker as part of its job (see scripts/main.py:main).
+    only is a list of {'name', 'start', 'size'} intervals to (re-)render regardless of the run manifest.
+    plan only writes the plan of the whole dataset (scene parameters and card boxes, see orchestrator/plan.py).
+    weights is "auto" or a comma separated list of per-instance weights for the static split.
+    listen ("host:port") turns this machine into the coordinator of render agents (see run_agent) instead of
+    rendering itself; the manifest it resumes from has to be the one the agents write to (shared output).
+    retry is the RetryPolicy of crashed instances, quarantine_after the crashes after which a sample is skipped.
+    warm_spares workers are kept started so a recycled or crashed instance is replaced without waiting for Blender.
+    pin_cpus gives every instance its own CPUs and threads its thread count (see plan_resources); autotune
+    first picks instances and threads by rendering autotune_samples seeded samples with a few splits of the machine.
+    expand_shards only writes the samples of the tar shards (worker option 'shards') out as the YOLO layout,
+    merge_only only merges the workers' annotation segments into metadata.jsonl and data.yaml.
+    benchmark is a list of render profiles to compare on the same benchmark_samples seeded samples instead.
+    dedup hashes the rendered images and reports near-duplicates (at most dedup_distance bits apart) in dedup/;
+    with dedup_rerender one sample of every pair across splits gets a new seed and is rendered again.
+    """
     dataset_name = "IdCardV0.8"
+    root = os.path.join(os.getcwd(), "output", dataset_name)
+
+    # An unknown profile would crash every instance, fail here instead
+    resolve_profile((worker_options or {}).get("render_profile"))
+
+    if expand_shards:
+        shard_index = read_shard_index(root)
+        print(f"Expanding {sum(entry['samples'] for entry in shard_index)} indexed samples "
+              f"({len(shard_index)} closed shards) of {root}")
+        print(f"{expand_shards_to_layout(root)} files written")
+        return
 
     # Read classes.yaml
     with open("classes.yaml", "r") as f:
         classes = yaml.safe_load(f)
 
+    if merge_only:
+        write_metadata(root, classes)
+        return
+
     main_data_source = DiskDataset("@DS/ds.plain_id")
     dataset_size = len(main_data_source)
 
     buckets = yolo_splits(dataset_size)
-    buckets_per_process = split_workload_with_offsets(buckets, instances)
 
     print(f"Working Directory: {os.getcwd()}")
     print(f"Dataset Size: {dataset_size}")
 
+    if plan:
+        write_plan(root, dataset_name, buckets, main_data_source, classes)
+        return
+
+    if benchmark:
+        benchmark_profiles(root, benchmark, benchmark_samples, blender_path, dataset_name, dataset_size, classes,
+                           worker_options)
+        return
+
+    if dedup:
+        only = find_near_duplicates(root, [bucket['name'] for bucket in buckets], dedup_distance, dedup_rerender)
+        if only is None:
+            return
+
+    buckets = only if only is not None else pending_buckets(root, buckets)
+    pending_size = sum(bucket['size'] for bucket in buckets)
+
+    if pending_size == 0:
+        print("Nothing to render, every sample is already in the run manifest.")
+        return
+
+    if only is None and pending_size < dataset_size:
+        print(f"Resuming: {dataset_size - pending_size} samples already done, {pending_size} left")
+
+    if dry_run:
+        write_dry_run_params(root, dataset_name, buckets, main_data_source)
+        return
+
+    events_path = os.path.join(root, "logs", "events.jsonl")
+
+    if listen is not None:
+        job = {"dataset_name": dataset_name, "total_size": dataset_size, "classes": classes, **(worker_options or {})}
+        serve_leases(listen, buckets, job, lease_size, lease_timeout, events_path)
+        write_metadata(root, classes)
+        return
+
+    if autotune:
+        instances, threads = autotune_resources(root, autotune_samples, blender_path, dataset_name, dataset_size,
+                                                classes, worker_options, pin_cpus)
+        print(f"Auto-tune: rendering with {instances} instances of {threads} threads")
+
+    resources = plan_resources(instances, threads, pin_cpus)
+
+    worker_weights = parse_weights(weights, instances, events_path)
+    buckets_per_process = split_workload_with_offsets(buckets, instances, worker_weights)
+
     jobs = [
         {
             "wd": os.getcwd(),
             "buckets": bpp, "total_size": dataset_size,
             "dataset_name": dataset_name,
-            "classes": classes
+            "classes": classes,
+            **(worker_options or {})
         } for bpp in buckets_per_process
     ]
 
-    run_blender_with_progress(
-        blender_path=r"C:\Program Files\Blender Foundation\Blender 5.0\blender.exe",
-        blend_file="bitmapMaterialMask.blend",
-        script_path="scripts/init.py",
-        jobs=jobs
-    )
+    events = EventLog(events_path)
+    quarantine = Quarantine(root, "run", quarantine_after, events)
+
+    try:
+        timings = run_blender_with_progress(
+            blender_path=blender_path,
+            blend_file="bitmapMaterialMask.blend",
+            script_path="scripts/init.py",
+            jobs=jobs,
+            scheduler=scheduler,
+            lease_size=lease_size,
+            recycle=recycle,
+            events=events,
+            timing=(worker_options or {}).get("timing", False),
+            log_dir=os.path.join(root, "logs"),
+            retry=retry,
+            quarantine=quarantine,
+            spares=warm_spares,
+            resources=resources
+        )
+    finally:
+        events.close()
+
+    if timings is not None:
+        write_timing_report(timings, os.path.join(root, "logs", "report.json"))
+
+    write_metadata(root, classes)
+
+
+def benchmark_profiles(root, profiles, sample_count, blender_path, dataset_name, dataset_size, classes,
+                       worker_options=None):
+    """
+    Renders the same seeded samples (the first sample_count of train) with every render profile, one Blender
+    instance each, into benchmark/<profile>/ and reports the seconds per sample (from the per-stage timing, so
+    Blender's startup is left out) and the image size per sample. The report is written to benchmark/report.json.
+    """
+    for profile in profiles:
+        resolve_profile(profile)
+
+    benchmark_dir = os.path.join(root, "benchmark")
+    results = {}
+
+    for profile in profiles:
+        wd = os.path.join(benchmark_dir, profile)
+        # Results of an earlier benchmark of the profile would be counted in the image sizes
+        shutil.rmtree(wd, ignore_errors=True)
+
+        job = {
+            "wd": wd,
+            "buckets": [{"name": "train", "start": 0, "size": sample_count}],
+            "total_size": dataset_size,
+            "dataset_name": dataset_name,
+            "classes": classes,
+            **(worker_options or {}),
+            "seeded": True,
+            "plan": False,
+            "shards": False,
+            "timing": True,
+            "render_profile": profile,
+        }
+
+        print(f"\nBenchmarking render profile {profile} on {sample_count} samples")
+        timings = run_blender_with_progress(
+            blender_path=blender_path,
+            blend_file="bitmapMaterialMask.blend",
+            script_path="scripts/init.py",
+            jobs=[job],
+            timing=True,
+            log_dir=os.path.join(wd, "logs")
+        )
+
+        report = timings.report()
+        total = report["stages"].get("total", {})
+        images = os.path.join(wd, "output", dataset_name, "images", "train")
+        sizes = [entry.stat().st_size for entry in os.scandir(images)] if os.path.isdir(images) else []
+
+        results[profile] = {
+            "settings": resolve_profile(profile),
+            "samples": report["samples"],
+            "seconds_per_sample": total.get("mean", 0.0),
+            "p50_seconds": total.get("p50", 0.0),
+            "p95_seconds": total.get("p95", 0.0),
+            "render_p50_seconds": report["stages"].get("render", {}).get("p50", 0.0),
+            "image_kb_per_sample": round(sum(sizes) / len(sizes) / 1024, 1) if sizes else 0.0,
+        }
+
+    os.makedirs(benchmark_dir, exist_ok=True)
+    with open(os.path.join(benchmark_dir, "report.json"), "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+    print(f"\n{'profile':<12}{'samples':>8}{'s/sample':>10}{'p50':>9}{'p95':>9}{'KB/sample':>11}")
+    for profile, result in results.items():
+        print(f"{profile:<12}{result['samples']:>8}{result['seconds_per_sample']:>10.3f}{result['p50_seconds']:>9.3f}"
+              f"{result['p95_seconds']:>9.3f}{result['image_kb_per_sample']:>11.1f}")
+    print(f"Report written to {os.path.join(benchmark_dir, 'report.json')}")
+
+
+def autotune_splits(cpu_count, sample_count):
+    """Instances x threads tried by the auto-tune: 1, 2, 4, ... instances sharing cpu_count CPUs equally."""
+    splits = []
+    instances = 1
+    while instances <= min(cpu_count, sample_count):
+        splits.append((instances, cpu_count // instances))
+        instances *= 2
+    return splits
+
+
+def autotune_resources(root, sample_count, blender_path, dataset_name, dataset_size, classes, worker_options=None,
+                       pin_cpus=False):
+    """
+    Renders the same seeded samples (the first sample_count of train) with every split of the machine of
+    autotune_splits, into autotune/<instances>x<threads>/, and returns the (instances, threads) of the highest
+    throughput: instances over the mean seconds per sample from the per-stage timing, so Blender's startup,
+    paid once per run, is left out. The report is written to autotune/report.json.
+    """
+    tune_dir = os.path.join(root, "autotune")
+    results = {}
+
+    for instances, threads in autotune_splits(len(available_cpus()), sample_count):
+        name = f"{instances}x{threads}"
+        wd = os.path.join(tune_dir, name)
+        shutil.rmtree(wd, ignore_errors=True)
+
+        job = {
+            "wd": wd,
+            "buckets": [],
+            "total_size": dataset_size,
+            "dataset_name": dataset_name,
+            "classes": classes,
+            **(worker_options or {}),
+            "seeded": True,
+            "plan": False,
+            "shards": False,
+            "timing": True,
+        }
+        # Every instance takes leases of the one bucket, so the split is the only difference between the runs
+        jobs = [dict(job, buckets=[{"name": "train", "start": 0, "size": sample_count}] if i == 0 else [])
+                for i in range(instances)]
+
+        print(f"\nAuto-tune: {instances} instances of {threads} threads on {sample_count} samples")
+        timings = run_blender_with_progress(
+            blender_path=blender_path,
+            blend_file="bitmapMaterialMask.blend",
+            script_path="scripts/init.py",
+            jobs=jobs,
+            scheduler="queue",
+            lease_size=max(1, sample_count // (instances * 4)),
+            timing=True,
+            log_dir=os.path.join(wd, "logs"),
+            resources=plan_resources(instances, threads, pin_cpus)
+        )
+
+        report = timings.report()
+        total = report["stages"].get("total", {})
+        seconds_per_sample = total.get("mean", 0.0)
+
+        results[name] = {
+            "instances": instances,
+            "threads": threads,
+            "samples": report["samples"],
+            "seconds_per_sample": seconds_per_sample,
+            "p95_seconds": total.get("p95", 0.0),
+            "samples_per_second": instances / seconds_per_sample if seconds_per_sample else 0.0,
+            "wall_samples_per_second": report["samples_per_second"],
+        }
+
+    os.makedirs(tune_dir, exist_ok=True)
+    with open(os.path.join(tune_dir, "report.json"), "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+    best = max(results.values(), key=lambda result: result["samples_per_second"])
+
+    print(f"\n{'split':<10}{'samples':>8}{'s/sample':>10}{'p95':>9}{'samples/s':>11}{'wall/s':>9}")
+    for name, result in results.items():
+        print(f"{name:<10}{result['samples']:>8}{result['seconds_per_sample']:>10.3f}{result['p95_seconds']:>9.3f}"
+              f"{result['samples_per_second']:>11.2f}{result['wall_samples_per_second']:>9.2f}")
+    print(f"Report written to {os.path.join(tune_dir, 'report.json')}")
+
+    return best["instances"], best["threads"]
+
+
+def find_near_duplicates(root, split_names, max_distance, rerender):
+    """
+    Runs the dedup stage (orchestrator/dedup.py). With rerender the flagged samples are salted and returned as
+    --only intervals, None otherwise or when nothing has to be rendered again.
+    """
+    started_at = time.time()
+    hashed = compute_hashes(root, split_names)
+    report = find_duplicates(root, split_names, max_distance)
+
+    print(f"Hashed {hashed} images in {time.time() - started_at:.1f}s: {report['pairs']} near-duplicate pairs "
+          f"({report['exact']} exact), {report['cross_split']} across splits {report['by_splits']}")
+    if report["skipped_buckets"]:
+        print(f"{report['skipped_buckets']} hash buckets with more than {MAX_BUCKET} images were not compared")
+
+    if not rerender:
+        return None
+
+    flagged = samples_to_rerender(root, split_names)
+    if not flagged:
+        print("No duplicates across splits, nothing to render again.")
+        return None
+
+    add_salts(root, flagged)
+    print(f"Rendering {len(flagged)} samples again with new seeds and backgrounds")
+    return [{'name': bucket_name, 'start': index, 'size': 1} for bucket_name, index in flagged]
+
+
+def write_metadata(root, classes):
+    merged = merge_annotations(root, classes)
+    print(f"Merged {merged} new annotation records into images/<split>/metadata.jsonl and data.yaml")
+
+
+def serve_leases(listen, buckets, job, lease_size, lease_timeout, events_path):
+    host, _, port = listen.rpartition(":")
+    leases = LeaseQueue(buckets, lease_size)
+    events = EventLog(events_path)
+    coordinator = Coordinator(leases, job, lease_timeout, events)
+
+    print(f"Coordinator listening on {host or '0.0.0.0'}:{port}, {leases.total} samples in leases of {lease_size}")
+    try:
+        serve(coordinator, host or "0.0.0.0", int(port))
+    finally:
+        events.close()
+
+    print(f"All leases completed: {leases.completed} samples")
+
+
+def run_agent(url, instances=8, blender_path=BLENDER_PATH, recycle=None, agent_id=None, heartbeat_interval=10.0,
+              retry=None, quarantine_after=2, warm_spares=0, pin_cpus=False, threads=None):
+    """
+    Render agent: runs `instances` local Blender workers on leases from the coordinator at `url` and reports
+    completions and heartbeats back, until the coordinator has no work left. pin_cpus and threads split this
+    machine between them as in main.
+    """
+    agent_id = agent_id or f"{socket.gethostname()}-{os.getpid()}"
+    client = CoordinatorClient(url, agent_id)
+    job = client.get("/job")["job"]
+
+    root = os.path.join(os.getcwd(), "output", job["dataset_name"])
+    jobs = [dict(job, wd=os.getcwd(), buckets=[]) for _ in range(instances)]
+
+    leases = RemoteLeaseQueue(client, heartbeat_interval)
+    events = EventLog(os.path.join(root, "logs", f"events-{agent_id}.jsonl"))
+    quarantine = Quarantine(root, agent_id, quarantine_after, events)
+    print(f"Agent {agent_id} rendering {job['dataset_name']} for {url} with {instances} instances")
+
+    try:
+        timings = run_blender_with_progress(
+            blender_path=blender_path,
+            blend_file="bitmapMaterialMask.blend",
+            script_path="scripts/init.py",
+            jobs=jobs,
+            scheduler="remote",
+            recycle=recycle,
+            events=events,
+            shared_leases=leases,
+            worker_prefix=agent_id,
+            timing=job.get("timing", False),
+            log_dir=os.path.join(root, "logs"),
+            retry=retry,
+            quarantine=quarantine,
+            spares=warm_spares,
+            resources=plan_resources(instances, threads, pin_cpus)
+        )
+    finally:
+        leases.close()
+        events.close()
+
+    if timings is not None:
+        write_timing_report(timings, os.path.join(root, "logs", f"report-{agent_id}.json"))
+
+
+def write_timing_report(timings, path):
+    timings.write(path)
+    report = timings.report()
+    print(f"{report['samples']} samples in {report['seconds']:.0f}s ({report['samples_per_second']:.2f}/s), "
+          f"stage report in {path}")
+
+    for stage, stats in report["stages"].items():
+        print(f"  {stage:<12} p50 {stats['p50']:.4f}s  p95 {stats['p95']:.4f}s  total {stats['total']:.1f}s")
+
+
+def write_plan(root, dataset_name, buckets, id_ds, classes):
+    started_at = time.time()
+    meta = build_plan(root, dataset_name, buckets, id_ds, classes, load_geometry(root))
+    count = sum(bucket['size'] for bucket in meta['buckets'].values())
+    print(f"Plan of {count} samples written to {os.path.join(root, 'plan')} in {time.time() - started_at:.1f}s")
+
+    for name, stats in summarize_plan(root, meta, classes).items():
+        print(f"{name}: {stats['samples']} samples, classes {stats['classes']}, "
+              f"box width p5/p50/p95 {stats['box_width_p5_p50_p95']}, "
+              f"height {stats['box_height_p5_p50_p95']}, clipped {stats['clipped']:.1%}")
+
+
+def write_dry_run_params(root, dataset_name, buckets, id_ds):
+    """
+    Draws the scene parameters of every sample in the buckets without rendering, into params/worker-dry-run.jsonl.
+
+    They are exactly the parameters a --seeded render uses for the same samples.
+    """
+    writer = ParamsWriter(root, "dry-run")
+    salts = read_salts(root)
+    started_at = time.time()
+    count = 0
+
+    try:
+        for bucket in buckets:
+            start = bucket.get('start', 0)
+            for index in range(start, start + bucket['size']):
+                object_class = id_ds[index].objects[0]["class"]
+                salt = salts.get((bucket['name'], index), 0)
+                params = draw_scene_params(sample_seed(dataset_name, bucket['name'], index, salt), object_class)
+                writer.record(bucket['name'], index, params)
+                count += 1
+    finally:
+        writer.close()
+
+    elapsed = time.time() - started_at
+    print(f"Dry run: parameters of {count} samples written to {writer.path} in {elapsed:.1f}s")
+
+
+def parse_only(spec):
+    """Parses "train:12,train:40-49,val:3" into intervals (ranges are inclusive)."""
+    intervals = []
+
+    for part in spec.split(","):
+        name, _, indices = part.strip().partition(":")
+        first, _, last = indices.partition("-")
+        first = int(first)
+        last = int(last) if last else first
+        intervals.append({'name': name, 'start': first, 'size': last - first + 1})
+
+    return intervals
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Renders the synthetic id card dataset with several Blender instances.")
+    parser.add_argument("--instances", type=int, default=8)
+    parser.add_argument("--scheduler", choices=["static", "queue"], default="static",
+                        help="static: one fixed chunk per instance, queue: instances pull small leases from a shared queue")
+    parser.add_argument("--weights", default=None,
+                        help="static scheduler: 'auto' to split by each instance's measured throughput, "
+                             "or explicit weights like 1,1,2")
+    parser.add_argument("--lease-size", type=int, default=16, help="Samples per lease")
+    parser.add_argument("--restart-every", type=int, default=80,
+                        help="Samples per Blender process, used when no memory limit is set or memory is not reported")
+    parser.add_argument("--max-rss-mb", type=float, default=None, help="Restart a worker above this RSS")
+    parser.add_argument("--max-growth-mb", type=float, default=None,
+                        help="Restart a worker whose RSS grows faster than this many MB per sample")
+    parser.add_argument("--growth-window", type=int, default=40, help="Samples used to measure the RSS growth")
+    parser.add_argument("--max-samples", type=int, default=None, help="Hard cap of samples per Blender process")
+    parser.add_argument("--warm-spares", type=int, default=0,
+                        help="Blender workers kept started and idle, so a restarting instance takes one over at once")
+    parser.add_argument("--max-retries", type=int, default=5,
+                        help="Give an instance up after this many crashes in a row without a finished sample")
+    parser.add_argument("--retry-delay", type=float, default=2.0,
+                        help="Seconds before relaunching a crashed instance, doubled for every further crash")
+    parser.add_argument("--quarantine-after", type=int, default=2,
+                        help="Skip a sample (listed in quarantine/) once it crashed Blender this many times")
+    parser.add_argument("--pin-cpus", action="store_true",
+                        help="Pin every instance to its own CPUs (NUMA aware) and start it with as many threads")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="Threads per instance (Blender --threads and OMP/BLAS thread counts)")
+    parser.add_argument("--autotune", action="store_true",
+                        help="Pick instances and threads by rendering a short seeded run with a few splits first")
+    parser.add_argument("--autotune-samples", type=int, default=40, help="Seeded samples rendered per split")
+    parser.add_argument("--batched-render", action="store_true",
+                        help="Reuse material lists and image datablocks between samples instead of rebuilding them")
+    parser.add_argument("--purge-every", type=int, default=16,
+                        help="Samples between recursive orphan purges with --batched-render")
+    parser.add_argument("--writer-queue", type=int, default=0,
+                        help="Write labels and visualisations on a background thread with this many pending samples "
+                             "at most (0 writes them on the render thread)")
+    parser.add_argument("--render-buffer", action="store_true",
+                        help="Encode the image and its visualisation from the render result in memory "
+                             "(needs the Standard view transform, falls back to the file otherwise)")
+    parser.add_argument("--vis-every", type=int, default=1, help="Only visualise every Nth sample")
+    parser.add_argument("--vis-fraction", type=float, default=1.0,
+                        help="Share of the samples (after --vis-every) that get a visualisation, e.g. 0.01")
+    parser.add_argument("--prefetch", type=int, default=0,
+                        help="Load and decode this many upcoming samples on a background thread (0 disables)")
+    parser.add_argument("--decoded-cache-mb", type=int, default=0,
+                        help="LRU cache of decoded background and photo images per worker (0 disables)")
+    parser.add_argument("--blender-image-cache-mb", type=int, default=0,
+                        help="LRU cache of background image datablocks per worker (0 disables)")
+    parser.add_argument("--shards", action="store_true",
+                        help="Stream every worker's samples into rolling tar shards in shards/ instead of loose files")
+    parser.add_argument("--shard-size-mb", type=int, default=1024, help="Size at which a shard is closed")
+    parser.add_argument("--label-batch", type=int, default=0,
+                        help="Write the label files in batches of this many samples (0: one by one, as rendered)")
+    parser.add_argument("--fsync", choices=("none", "batch"), default="none",
+                        help="batch: fsync every label of a batch before its samples enter the manifest")
+    parser.add_argument("--expand-shards", action="store_true",
+                        help="Only write the samples of the shards out as images/, labels/ and vis/")
+    parser.add_argument("--no-annotations", action="store_true",
+                        help="Don't record annotation segments for metadata.jsonl (the YOLO labels are still written)")
+    parser.add_argument("--merge-annotations", action="store_true",
+                        help="Only merge the annotation segments into metadata.jsonl and data.yaml")
+    parser.add_argument("--cards-per-image", type=int, default=1,
+                        help="Cards rendered in every frame (front and back records mixed), each one labelled")
+    parser.add_argument("--max-card-overlap", type=float, default=0.2,
+                        help="Largest overlap (IoU) between the boxes of two cards of a frame")
+    parser.add_argument("--render-profile", default=None,
+                        help="Render settings applied before rendering: draft, train or hq (default: the .blend's)")
+    parser.add_argument("--benchmark", default=None, metavar="PROFILES",
+                        help="Only compare render profiles, e.g. draft,train,hq: seconds and image size per sample")
+    parser.add_argument("--benchmark-samples", type=int, default=20, help="Seeded samples rendered per profile")
+    parser.add_argument("--dedup", action="store_true",
+                        help="Only hash the rendered images and report near-duplicates (across splits) in dedup/")
+    parser.add_argument("--dedup-distance", type=int, default=3,
+                        help="Largest difference in bits of two 64 bit image hashes counted as near-duplicates")
+    parser.add_argument("--dedup-rerender", action="store_true",
+                        help="With --dedup: render one sample of every pair across splits again with a new seed")
+    parser.add_argument("--timing", action="store_true",
+                        help="Time every stage of every sample, show p50/p95 live and write logs/report.json")
+    parser.add_argument("--seeded", action="store_true",
+                        help="Draw every scene parameter from (dataset, bucket, index) and record them in params/")
+    parser.add_argument("--only", default=None,
+                        help="Render only these samples, ignoring the manifest, e.g. \"train:12,val:40-49\"")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Only write the seeded scene parameters of the pending samples, no rendering")
+    parser.add_argument("--plan", action="store_true",
+                        help="Only compute the scene parameters and card boxes of the whole dataset into plan/")
+    parser.add_argument("--from-plan", action="store_true",
+                        help="Workers read every sample's parameters (and card box) from the plan")
+    parser.add_argument("--coordinator", metavar="HOST:PORT", default=None,
+                        help="Serve the leases to render agents on other machines instead of rendering here")
+    parser.add_argument("--lease-timeout", type=float, default=60.0,
+                        help="Coordinator: seconds without a heartbeat after which an agent's leases are requeued")
+    parser.add_argument("--agent", metavar="URL", default=None,
+                        help="Render leases from the coordinator at URL, e.g. http://render-main:8765")
+    parser.add_argument("--agent-id", default=None, help="Agent name in the coordinator (default host-pid)")
+    parser.add_argument("--heartbeat", type=float, default=10.0, help="Agent: seconds between heartbeats")
+    parser.add_argument("--blender", default=None,
+                        help="Blender command, e.g. \"python stub_blender.py\" to run the scheduler without Blender")
+    parser.add_argument("--renderer", choices=("blender", "numpy", "numpy-fast"), default="blender",
+                        help="numpy: render every sample headless with NumPy (no Blender), e.g. for load tests; "
+                             "numpy-fast: write a constant placeholder image instead, to load-test the pipeline")
+    args = parser.parse_args()
+
+    # --dedup picks the samples to render again itself, it would silently replace the --only selection
+    if args.dedup and args.only:
+        parser.error("--only can't be combined with --dedup")
+
+    return args
 
 
 if __name__ == "__main__":
     print("Starting main function...")
-    main()
+    args = parse_args()
+    blender = shlex.split(args.blender, posix=os.name != "nt") if args.blender else BLENDER_PATH
+    if args.renderer != "blender" and not args.blender:
+        blender = NUMPY_RENDERER_COMMAND
+    recycle_policy = RecyclePolicy(
+        restart_every=args.restart_every,
+        max_rss_mb=args.max_rss_mb,
+        max_growth_mb=args.max_growth_mb,
+        window=args.growth_window,
+        max_samples=args.max_samples
+    )
+    retry_policy = RetryPolicy(max_retries=args.max_retries, base_delay=args.retry_delay)
+
+    if args.agent:
+        run_agent(args.agent, args.instances, blender, recycle_policy, args.agent_id, args.heartbeat, retry_policy,
+                  args.quarantine_after, args.warm_spares, args.pin_cpus, args.threads)
+        raise SystemExit(0)
+
+    main(
+        instances=args.instances,
+        scheduler=args.scheduler,
+        lease_size=args.lease_size,
+        blender_path=blender,
+        recycle=recycle_policy,
+        worker_options={
+            "batched_render": args.batched_render,
+            "purge_every": args.purge_every,
+            "writer_queue": args.writer_queue,
+            "render_buffer": args.render_buffer,
+            "vis_every": args.vis_every,
+            "vis_fraction": args.vis_fraction,
+            "prefetch": args.prefetch,
+            "decoded_cache_mb": args.decoded_cache_mb,
+            "blender_image_cache_mb": args.blender_image_cache_mb,
+            "seeded": args.seeded,
+            "plan": args.from_plan,
+            "timing": args.timing,
+            "shards": args.shards,
+            "shard_size_mb": args.shard_size_mb,
+            "label_batch": args.label_batch,
+            "fsync": args.fsync,
+            "annotations": not args.no_annotations,
+            "render_profile": args.render_profile,
+            "cards_per_image": args.cards_per_image,
+            "max_card_overlap": args.max_card_overlap,
+            "renderer": args.renderer
+        },
+        only=parse_only(args.only) if args.only else None,
+        dry_run=args.dry_run,
+        plan=args.plan,
+        weights=args.weights,
+        listen=args.coordinator,
+        lease_timeout=args.lease_timeout,
+        retry=retry_policy,
+        quarantine_after=args.quarantine_after,
+        warm_spares=args.warm_spares,
+        pin_cpus=args.pin_cpus,
+        threads=args.threads,
+        autotune=args.autotune,
+        autotune_samples=args.autotune_samples,
+        expand_shards=args.expand_shards,
+        merge_only=args.merge_annotations,
+        benchmark=args.benchmark.split(",") if args.benchmark else None,
+        benchmark_samples=args.benchmark_samples,
+        dedup=args.dedup or args.dedup_rerender,
+        dedup_distance=args.dedup_distance,
+        dedup_rerender=args.dedup_rerender
+    )
@@ -0,0 +1,60 @@
+import json
+import os
+
+from scripts.boxes import to_xyxy
+from scripts.sample_params import compact_value
+
+ANNOTATIONS_DIR = "annotations"
+
+
+def annotation_record(bucket_name, index, width, height, bounding_box_data, classes, params=None):
+    """
+    The annotation of one sample: every object's class and its box in pixels (x_min, y_min, x_max, y_max) and
+    YOLO-normalised (center x, center y, width, height), plus the sample's scene parameters when known.
+    """
+    objects = []
+
+    for item in bounding_box_data:
+        x0, y0, x1, y1 = to_xyxy(item["boundingBox"])
+        objects.append({
+            "class": item["class"],
+            "class_id": classes[item["class"]],
+            "bbox": [round(x0, 2), round(y0, 2), round(x1, 2), round(y1, 2)],
+            "yolo": [round((x0 + x1) / 2.0 / width, 6), round((y0 + y1) / 2.0 / height, 6),
+                     round((x1 - x0) / width, 6), round((y1 - y0) / height, 6)],
+        })
+
+    record = {
+        "bucket": bucket_name,
+        "index": index,
+        "file_name": f"images/{bucket_name}/{index}.jpg",
+        "width": round(width),
+        "height": round(height),
+        "objects": objects,
+    }
+
+    if params is not None:
+        record["params"] = {key: compact_value(value) for key, value in params.items()}
+
+    return record
+
+
+class AnnotationWriter:
+    """
+    Appends the annotation of every rendered sample to annotations/worker-<id>.jsonl, one compact line each;
+    orchestrator/annotations.py merges the segments into metadata.jsonl and data.yaml.
+    """
+
+    def __init__(self, root, worker_id):
+        directory = os.path.join(root, ANNOTATIONS_DIR)
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"worker-{worker_id}.jsonl")
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def record(self, bucket_name, index, width, height, bounding_box_data, classes, params=None):
+        entry = annotation_record(bucket_name, index, width, height, bounding_box_data, classes, params)
+        self._file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
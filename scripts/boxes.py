@@ -0,0 +1,45 @@
+import hashlib
+
+
+def to_xyxy(box):
+    """
+    Normalises a pixel bounding box to (x_min, y_min, x_max, y_max).
+
+    Accepts a dict with x_min/y_min/x_max/y_max keys, a dict with 'min'/'max' points, two corner points or four
+    numbers, which covers what compute_obj_pixel_bounding_box and the plan stage produce.
+    """
+    if isinstance(box, dict):
+        if "x_min" in box:
+            corners = (box["x_min"], box["y_min"], box["x_max"], box["y_max"])
+        else:
+            corners = (*box["min"], *box["max"])
+    elif len(box) == 2:
+        corners = (*box[0], *box[1])
+    else:
+        corners = tuple(box)
+
+    x0, y0, x1, y1 = (float(value) for value in corners)
+    return min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1)
+
+
+def yolo_line(class_id, box, width, height):
+    """One YOLO label line (class, normalised center and size) of a pixel box."""
+    x0, y0, x1, y1 = to_xyxy(box)
+    return (f"{class_id} {(x0 + x1) / 2.0 / width:.6f} {(y0 + y1) / 2.0 / height:.6f} "
+            f"{(x1 - x0) / width:.6f} {(y1 - y0) / height:.6f}")
+
+
+def should_visualize(index, vis_every=1, vis_fraction=1.0):
+    """
+    Decides whether a sample gets a visualisation: every `vis_every`-th index, and of those a `vis_fraction` share.
+
+    The fraction is decided by a hash of the index, so a re-rendered sample gets the same answer.
+    """
+    if vis_every > 1 and index % vis_every != 0:
+        return False
+
+    if vis_fraction >= 1.0:
+        return True
+
+    digest = hashlib.blake2b(str(index).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little") / 2 ** 64 < vis_fraction
@@ -0,0 +1,55 @@
+import bpy
+from lambdawalker.blender.query.get_scene_and_camera import get_scene_and_camera
+
+
+def scene_geometry():
+    """The camera and card values the plan stage projects with (see scripts/plan.py:DEFAULT_GEOMETRY)."""
+    scene, camera = get_scene_and_camera()
+    card = bpy.data.objects.get("card")
+    render = scene.render
+    scale = render.resolution_percentage / 100.0
+
+    corners = [[corner[axis] * card.scale[axis] for axis in range(3)] for corner in card.bound_box]
+
+    return {
+        "resolution": [round(render.resolution_x * scale), round(render.resolution_y * scale)],
+        "pixel_aspect": [render.pixel_aspect_x, render.pixel_aspect_y],
+        "camera_type": camera.data.type,
+        "lens": camera.data.lens,
+        "sensor_width": camera.data.sensor_width,
+        "sensor_height": camera.data.sensor_height,
+        "sensor_fit": camera.data.sensor_fit,
+        "shift": [camera.data.shift_x, camera.data.shift_y],
+        "rotation_modes": [camera.rotation_mode, card.rotation_mode],
+        "parented": camera.parent is not None or card.parent is not None,
+        "card_bound_box": [[min(c[axis] for c in corners) for axis in range(3)],
+                           [max(c[axis] for c in corners) for axis in range(3)]],
+    }
+
+
+class CardInstances:
+    """
+    The card object plus copies of it for frames with several cards. Every copy has its own mesh data, so it can
+    carry its own material; copies are made once per worker and the ones a frame doesn't use are not rendered.
+
+    `geometry` is the scene_geometry the cards are placed and projected with.
+    """
+
+    def __init__(self, card_object, geometry):
+        self.card_object = card_object
+        self.geometry = geometry
+        self.copies = []
+
+    def objects(self, count):
+        while len(self.copies) < count - 1:
+            copy = self.card_object.copy()
+            copy.data = self.card_object.data.copy()
+            copy.name = f"{self.card_object.name}_{len(self.copies) + 1}"
+            for collection in self.card_object.users_collection:
+                collection.objects.link(copy)
+            self.copies.append(copy)
+
+        for position, copy in enumerate(self.copies):
+            copy.hide_render = position >= count - 1
+
+        return [self.card_object] + self.copies[:count - 1]
@@ -0,0 +1,141 @@
+import glob
+import json
+import os
+import site
+import subprocess
+import sys
+from typing import List, Tuple, Optional
+
+SITE_PACKAGES_CACHE = "e-site-packages.env"
+
+
+def list_conda_environments() -> List[Tuple[str, str]]:
+    result = subprocess.run(['conda', 'info', '--envs'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        raise Exception(f"Error executing conda command: {result.stderr}")
+
+    envs = []
+    for line in result.stdout.split('\n'):
+        if line.startswith('#') or not line.strip():
+            continue
+        parts = line.split()
+        if len(parts) >= 2:
+            envs.append((parts[0], parts[-1]))
+
+    return envs
+
+
+def get_conda_env_location(env_name: str) -> str:
+    environments = list_conda_environments()
+    for env, location in environments:
+        if env == env_name:
+            return location
+
+    print(environments)
+    raise Exception(f"Environment '{env_name}' not found.")
+
+
+def read_name_from_disk(root: str):
+    name_path = os.path.join(root, "e-name.env")
+
+    if not os.path.exists(name_path):
+        raise Exception(f"Environment name not found at {name_path}")
+
+    with open(os.path.join(root, "e-name.env"), "r") as f:
+        return f.read().strip()
+
+
+def read_cached_environment(root: str, env_name: str) -> Optional[Tuple[str, str]]:
+    """
+    Reads the environment resolved by a previous start from e-site-packages.env.
+
+    Returns None on a cache miss: no cache, a cache for another environment or a site-packages that is gone.
+    """
+    cache_path = os.path.join(root, SITE_PACKAGES_CACHE)
+
+    if not os.path.exists(cache_path):
+        return None
+
+    try:
+        with open(cache_path, "r") as f:
+            cached = json.load(f)
+    except ValueError:
+        return None
+
+    if cached.get("env_name") != env_name or not os.path.isdir(cached.get("site_packages", "")):
+        return None
+
+    return cached["location"], cached["site_packages"]
+
+
+def find_site_packages(environment_location: str) -> str:
+    """
+    The site-packages folder of a conda environment: Lib/site-packages on Windows, lib/pythonX.Y/site-packages on
+    Linux and macOS, preferring the Python version Blender runs.
+
+    Raises:
+        Exception: If the environment has no site-packages folder.
+    """
+    python = f"python{sys.version_info[0]}.{sys.version_info[1]}"
+    candidates = [
+        os.path.join(environment_location, "Lib", "site-packages"),
+        os.path.join(environment_location, "lib", python, "site-packages"),
+        *sorted(glob.glob(os.path.join(environment_location, "lib", "python3*", "site-packages"))),
+    ]
+
+    for candidate in candidates:
+        if os.path.isdir(candidate):
+            return candidate
+
+    raise Exception(f"No site-packages folder found in the environment at {environment_location}")
+
+
+def environment_of(site_packages: str) -> str:
+    """The environment location of a site-packages folder, either layout of find_site_packages."""
+    parent = os.path.dirname(site_packages)
+    if os.path.basename(parent).startswith("python"):
+        parent = os.path.dirname(parent)
+    return os.path.dirname(parent)
+
+
+def write_cached_environment(root: str, env_name: str, environment_location: str, site_packages: str):
+    cache_path = os.path.join(root, SITE_PACKAGES_CACHE)
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+
+    with open(temp_path, "w") as f:
+        json.dump({"env_name": env_name, "location": environment_location, "site_packages": site_packages}, f)
+
+    # Several Blender instances may start at once, the rename keeps the cache file whole
+    os.replace(temp_path, cache_path)
+
+
+def setup(root: str, env_name: str = None, site_packages: str = None):
+    """
+    Configures the Python environment to use libraries from a specified Conda environment.
+    This setup is particularly important when using Blender, which needs to access Python libraries managed by Conda.
+
+    The resolved site-packages is cached in e-site-packages.env (or passed in by the orchestrator), so
+    'conda info --envs' only runs on a cache miss or when the cached path no longer exists.
+
+    Raises:
+        Exception: When an error occurs during the subprocess execution or if the 'conda' command fails.
+        Exception: If the environment is not found.
+    """
+
+    env_name = env_name if env_name is not None else read_name_from_disk(root)
+
+    if site_packages is not None and os.path.isdir(site_packages):
+        environment_location = environment_of(site_packages)
+    else:
+        cached = read_cached_environment(root, env_name)
+
+        if cached is not None:
+            environment_location, site_packages = cached
+        else:
+            environment_location = get_conda_env_location(env_name)
+            site_packages = find_site_packages(environment_location)
+            write_cached_environment(root, env_name, environment_location, site_packages)
+
+    site.addsitedir(site_packages)
+
+    return env_name, environment_location
@@ -1,107 +1,246 @@
-import os
 import random
 
 import bpy
 from PIL import Image
 from lambdawalker.blender.find_materials import find_materials_by_regex
-from lambdawalker.blender.images.assign_image_to_texture import assign_image_to_texture
 from lambdawalker.blender.material.randomize import randomize_material
 from lambdawalker.blender.material.update import set_material_to_mesh
 from lambdawalker.blender.query.get_scene_and_camera import get_scene_and_camera
-from lambdawalker.blender.render.render_scene import render_scene
-from lambdawalker.blender.spatial.compute_pixel_bounding_box import compute_obj_pixel_bounding_box
-from lambdawalker.file.path.ensure_directory import ensure_directory_for_file
-from lambdawalker.yolo.log.vis_log import draw_bounding_boxes
-from lambdawalker.yolo.log.yolo_log import create_yolo_description
 
+from scripts.boxes import should_visualize
+from scripts.outputs import ensure_directory_for_file, submit_outputs
 from scripts.randomizer import randomize_environment, randomize_card_position_and_rotation
+from scripts.sample_inputs import load_sample_inputs
+from scripts.sample_params import pick
+from scripts.scene_cache import image_from_pil, set_texture_image
+from scripts.timing import NULL_TIMER
+from scripts.writer import InlineWriter
 
 
-def render_id_simple_card(bucket_name, global_index: int, output_path: str, id_ds, photo_id_ds, background_ds, classes):
-    to_clean = []
-    scene, camera = get_scene_and_camera()
+def render_id_simple_card(bucket_name, global_index: int, output_path: str, id_ds, photo_id_ds, background_ds, classes,
+                          scene_cache=None, purge=True, writer=None, render_buffer=False, vis_every=1, vis_fraction=1.0,
+                          inputs=None, image_cache=None, params=None, timer=NULL_TIMER, shards=None,
+                          annotations=None, card_instances=None, max_card_overlap=0.2, labels=None):
+    """
+    Renders one sample with its YOLO label and visualisation.
 
-    next_output_file = f"{output_path}/images/{bucket_name}/{global_index + 1}.jpg"
-    output_file = f"{output_path}/images/{bucket_name}/{global_index}.jpg"
+    With a SceneCache (batched render path) material lists are resolved once per worker and the card, hologram
+    and background pixels go into persistent image datablocks instead of new ones; `purge` tells whether to run
+    the recursive orphan purge after this sample. The label and visualisation are written through `writer`
+    (an AsyncWriter moves them off the render thread).
 
-    if os.path.exists(next_output_file) and os.path.exists(output_file):
-        return
+    With render_buffer the image and its visualisation are both encoded from the render result in memory instead
+    of reading the JPEG back. Only the samples picked by vis_every / vis_fraction get a visualisation.
 
-    card_object_name = "card"
-    card_object = bpy.data.objects.get(card_object_name)
+    `inputs` are the already decoded dataset images from load_sample_inputs (e.g. by the Prefetcher); without
+    them they are loaded here. `image_cache` is a ByteLRUCache of background datablocks, which are then reused
+    instead of being created and freed for every sample.
 
-    record = id_ds[global_index]
-    objects_info = record.objects[0]
-    object_class = objects_info["class"]
+    `params` are the sample's scene parameters from draw_scene_params; without them the scene is randomized with
+    the global random module as before. The chosen material names are added to them. A planned card 'box' in
+    the params (see scripts/plan.py) is used instead of projecting the card in Blender.
 
-    randomize_card_position_and_rotation(
-        card_object, object_class=object_class
-    )
+    Every stage (material, scene, render, bbox, cleanup and the writes on the writer thread) is timed by `timer`.
 
-    id_card_image_pil, photo_image_pil = _prepare_card_images(record, photo_id_ds, objects_info)
-    to_clean.append(id_card_image_pil)
+    With a ShardWriter (scripts/shards.py) the image, label and visualisation go into the worker's tar shards
+    instead of loose files; a JPEG rendered to disk is only kept until its bytes are in the shard.
 
-    id_card_image_blender, hologram_image_blender = _setup_card_material(
-        card_object_name, objects_info, id_card_image_pil, photo_image_pil
-    )
-    to_clean.extend([id_card_image_blender, hologram_image_blender])
+    With an AnnotationWriter (scripts/annotations.py) the sample's boxes and params are also appended to the
+    worker's annotation segment, from which metadata.jsonl is built.
 
-    background_image_pil = _setup_background(global_index, background_ds)
-    to_clean.append(background_image_pil)
+    With CardInstances (scripts/card_instances.py) the further cards in inputs.cards are rendered in the same
+    frame: every card gets its own material copy, they are spread over the table with at most max_card_overlap
+    (IoU) between their boxes and all of their boxes come from one projection pass (scripts/projection.py).
+    Every card is written to the label.
 
-    to_clean = to_clean + randomize_environment(background_image_pil)
+    With a LabelWriter (scripts/outputs.py) the label is buffered and written with a batch of others.
+    """
+    writer = writer or InlineWriter()
+    to_clean = []
+    scene, camera = get_scene_and_camera()
 
-    ensure_directory_for_file(output_file)
-    render_scene(output_file)
+    # Already rendered samples are never scheduled again, run.py skips them using the run manifest
+    output_file = f"{output_path}/images/{bucket_name}/{global_index}.jpg"
+    if shards is not None:
+        output_file = f"{output_path}/tmp/{bucket_name}/{global_index}.jpg"
 
-    _cleanup_blender_resources(to_clean)
+    card_object_name = "card"
+    card_object = bpy.data.objects.get(card_object_name)
 
-    card_bounding_box = compute_obj_pixel_bounding_box(scene, card_object, camera)
-    bounding_box_data = [{"class": object_class, "boundingBox": card_bounding_box}]
+    if inputs is None:
+        inputs = load_sample_inputs(global_index, id_ds, photo_id_ds, background_ds, timer=timer)
 
-    _save_yolo_annotations(output_path, bucket_name, global_index, scene, bounding_box_data, classes)
-    _save_visualization(output_path, bucket_name, global_index, output_file, bounding_box_data)
+    objects_info = inputs.objects_info
+    object_class = objects_info["class"]
+
+    cards = inputs.cards if card_instances is not None else []
+    card_objects = card_instances.objects(len(cards) + 1) if card_instances is not None else [card_object]
+
+    # Several cards are placed together once the camera is set
+    if len(card_objects) == 1:
+        with timer.stage("scene"):
+            randomize_card_position_and_rotation(
+                card_object, object_class=object_class, params=params
+            )
+
+    id_card_image_pil, photo_image_pil = inputs.id_card_image, inputs.photo_image
+    # Images shared through the decoded image cache are not the sample's to close
+    to_clean.extend(inputs.owned)
+
+    with timer.stage("material"):
+        to_clean.extend(_setup_card_material(
+            card_object_name, objects_info, id_card_image_pil, photo_image_pil, scene_cache, params
+        ))
+
+        for position, (card, card_inputs) in enumerate(zip(card_objects[1:], cards), 1):
+            to_clean.extend(_setup_card_material(
+                card.name, card_inputs.objects_info, card_inputs.id_card_image, card_inputs.photo_image, scene_cache,
+                image_names=(f"card_{position}", f"hologram_{position}"), copy_material=True
+            ))
+
+    background_image_pil = inputs.background_image
+
+    with timer.stage("scene"):
+        background_image_blender = None
+        uncached_datablocks = []
+        if image_cache is not None:
+            # Cached datablocks are never in to_clean, the cache frees them on eviction
+            background_image_blender, cached = image_cache.get_or_load(
+                inputs.background_key,
+                lambda: image_from_pil("cached_{}_{}".format(*inputs.background_key), background_image_pil)
+            )
+            if not cached:
+                # Larger than the whole cache, nobody else frees it
+                uncached_datablocks.append(background_image_blender)
+
+        to_clean = to_clean + randomize_environment(background_image_pil, scene_cache, background_image_blender,
+                                                    params)
+
+    card_classes = [object_class] + [card_inputs.objects_info["class"] for card_inputs in cards]
+    placed_boxes = None
+    if len(card_objects) > 1:
+        with timer.stage("scene"):
+            placed_boxes = _place_cards(card_objects, card_classes, cards, camera, card_instances.geometry, params,
+                                        max_card_overlap)
 
+    ensure_directory_for_file(output_file)
 
-def _prepare_card_images(record, photo_id_ds, objects_info):
-    id_card_image_pil = record.image.to_pil()
-    photo_id = objects_info["photo_id"]
-    photo_record = photo_id_ds[photo_id]
-    photo_image_pil = photo_record.image.to_pil()
+    with timer.stage("render"):
+        pixels = None
+        if render_buffer:
+            # Modules only some jobs use are imported on first use, not when the worker starts
+            from scripts.render_buffer import render_to_array
+            pixels = render_to_array(scene)
+        if pixels is None:
+            from lambdawalker.blender.render.render_scene import render_scene
+            render_scene(output_file)
+
+    if scene_cache is not None:
+        # Persistent datablocks stay alive, only the PIL images are released
+        to_clean = [data for data in to_clean if not isinstance(data, bpy.types.Image)]
+    to_clean.extend(uncached_datablocks)
+
+    with timer.stage("cleanup"):
+        _cleanup_blender_resources(to_clean, purge)
+
+    # A plan only knows the box of a single card
+    planned_box = params.get("box") if params is not None and len(card_objects) == 1 else None
+    if planned_box is not None:
+        placed_boxes = [planned_box]
+
+    with timer.stage("bbox"):
+        if placed_boxes is not None:
+            card_bounding_boxes = [dict(zip(("x_min", "y_min", "x_max", "y_max"), box)) for box in placed_boxes]
+        else:
+            from lambdawalker.blender.spatial.compute_pixel_bounding_box import compute_obj_pixel_bounding_box
+            card_bounding_boxes = [compute_obj_pixel_bounding_box(scene, card, camera) for card in card_objects]
+
+    bounding_box_data = [{"class": card_class, "boundingBox": box}
+                         for card_class, box in zip(card_classes, card_bounding_boxes)]
+
+    # Projected and planned boxes are labelled with scripts/boxes.py, measured ones (one card or several) by
+    # lambdawalker's create_yolo_description, which knows the format compute_obj_pixel_bounding_box returns
+    own_boxes = placed_boxes is not None
+
+    # Everything the writer needs is read from the scene here, the writer thread must not touch bpy
+    width, height = _render_size(scene)
+    visualize = should_visualize(global_index, vis_every, vis_fraction)
+
+    return submit_outputs(writer, timer, output_path, bucket_name, global_index,
+                          output_file if pixels is None else pixels, width, height, bounding_box_data, classes,
+                          own_boxes, visualize, scene.render.image_settings.quality, shards, annotations, params,
+                          labels)
+
+
+def _setup_card_material(card_object_name, objects_info, id_card_image_pil, photo_image_pil, scene_cache=None,
+                         params=None, image_names=("card", "hologram"), copy_material=False):
+    """
+    Dresses the card object with a material of its subtype and the record's images. Returns the datablocks to
+    clean up after the render; with copy_material the card gets a copy of the material (which is among them), so
+    several cards can show different images.
+    """
+    subtype = objects_info["subtype"]
 
-    if objects_info["class"] == "vertical_card":
-        id_card_image_pil = id_card_image_pil.rotate(-90, expand=1)
-        photo_image_pil = photo_image_pil.rotate(-90, expand=1)
+    if scene_cache is not None:
+        possible_materials = scene_cache.card_materials(subtype)
+    else:
+        possible_materials = find_materials_by_regex(f"{subtype}.*") + find_materials_by_regex("df.*")
 
-    return id_card_image_pil, photo_image_pil
+    if params is not None:
+        material = pick(possible_materials, params["card_material"])
+        material_seed = params["card_material_seed"]
+        params["card_material_name"] = material.name
+    else:
+        material = random.choice(possible_materials)
+        material_seed = random.randint(0, 99999999999)
 
+    created = []
+    if copy_material:
+        material = material.copy()
+        created.append(material)
 
-def _setup_card_material(card_object_name, objects_info, id_card_image_pil, photo_image_pil):
-    subtype = objects_info["subtype"]
-    possible_materials = find_materials_by_regex(f"{subtype}.*") + find_materials_by_regex("df.*")
-    material = random.choice(possible_materials)
     set_material_to_mesh(card_object_name, material)
 
-    id_card_image_blender = assign_image_to_texture(material, "color_img", id_card_image_pil)
-    hologram_image_blender = assign_image_to_texture(material, "hologram_img", photo_image_pil)
+    if scene_cache is not None:
+        id_card_image_blender = scene_cache.image(image_names[0]).update(id_card_image_pil)
+        hologram_image_blender = scene_cache.image(image_names[1]).update(photo_image_pil)
+        set_texture_image(material, "color_img", id_card_image_blender)
+        set_texture_image(material, "hologram_img", hologram_image_blender)
+    else:
+        from lambdawalker.blender.images.assign_image_to_texture import assign_image_to_texture
+        id_card_image_blender = assign_image_to_texture(material, "color_img", id_card_image_pil)
+        hologram_image_blender = assign_image_to_texture(material, "hologram_img", photo_image_pil)
+
+    randomize_material(material, material_seed)
+    return [id_card_image_blender, hologram_image_blender] + created
 
-    randomize_material(material, random.randint(0, 99999999999))
-    return id_card_image_blender, hologram_image_blender
 
+def _place_cards(card_objects, card_classes, cards, camera, geometry, params, max_overlap):
+    import numpy as np
+    from scripts.projection import place_cards
 
-def _setup_background(global_index, background_ds):
-    mod_index = global_index % len(background_ds)
-    print(f"Using background {mod_index}")
-    return background_ds[mod_index].image.to_pil()
+    # Seeded samples place their cards from the sample seed as well
+    rng = np.random.default_rng(params["seed"] if params is not None and "seed" in params else None)
+    locations, rotations, boxes = place_cards(card_classes, geometry, tuple(camera.location),
+                                              tuple(camera.rotation_euler), rng, max_overlap)
 
+    for card, location, rotation in zip(card_objects, locations, rotations):
+        card.location = location.tolist()
+        card.rotation_euler = rotation.tolist()
 
-def _save_visualization(output_path, bucket_name, global_index, output_file, bounding_box_data):
-    output_file_vis = f"{output_path}/vis/{bucket_name}/{global_index}.jpg"
-    ensure_directory_for_file(output_file_vis)
-    draw_bounding_boxes(output_file, bounding_box_data, output_file_vis)
+    if params is not None:
+        params["card_location"], params["card_rotation"] = locations[0].tolist(), rotations[0].tolist()
+        params["cards"] = [
+            {"index": card_inputs.index, "class": card_class, "location": location.tolist(),
+             "rotation": rotation.tolist()}
+            for card_inputs, card_class, location, rotation in zip(cards, card_classes[1:], locations[1:],
+                                                                   rotations[1:])
+        ]
 
+    return boxes.tolist() if boxes is not None else None
 
-def _cleanup_blender_resources(to_clean):
+
+def _cleanup_blender_resources(to_clean, purge=True):
     for data in to_clean:
         if data is None:
             continue
@@ -110,24 +249,16 @@ def _cleanup_blender_resources(to_clean):
         elif isinstance(data, bpy.types.Image):
             data.buffers_free()
             bpy.data.images.remove(data, do_unlink=True)
+        elif isinstance(data, bpy.types.Material):
+            bpy.data.materials.remove(data, do_unlink=True)
 
     bpy.context.view_layer.update()
-    bpy.data.orphans_purge(do_recursive=True)
+
+    if purge:
+        bpy.data.orphans_purge(do_recursive=True)
 
 
-def _save_yolo_annotations(output_path, bucket_name, global_index, scene, bounding_box_data, classes):
+def _render_size(scene):
     render = scene.render
     render_scale = render.resolution_percentage / 100.0
-    width, height = (render.resolution_x * render_scale, render.resolution_y * render_scale)
-
-    yolo_data = create_yolo_description(
-        bounding_box_data,
-        width, height,
-        classes
-    )
-
-    yolo_txt_path = f"{output_path}/labels/{bucket_name}/{global_index}.txt"
-    ensure_directory_for_file(yolo_txt_path)
-
-    with open(yolo_txt_path, 'w') as yolo_file:
-        yolo_file.write(yolo_data)
+    return render.resolution_x * render_scale, render.resolution_y * render_scale
@@ -0,0 +1,209 @@
+"""
+The render job of a worker, whatever renders the samples: datasets, manifest, params, plan, shards, annotations,
+salts, writer, decoded cache and prefetch around a renderer backend.
+
+A renderer (BlenderRenderer in scripts/main.py, NumpyRenderer in scripts/numpy_renderer.py) provides:
+
+    geometry()                          the scene geometry (see scripts/plan.py:DEFAULT_GEOMETRY) for the plan check
+    render(sample, inputs, params, job) renders one sample, submits its writes and returns its outputs
+    memory_stats()                      the MEMORY report after every sample
+    caches()                            name -> cache of its own caches, for the CACHE report
+    close()
+"""
+import os.path
+import random
+import time
+from types import SimpleNamespace
+
+from lambdawalker.dataset.DiskDataset import DiskDataset
+
+from scripts.annotations import AnnotationWriter
+from scripts.lru_cache import MB, ByteLRUCache
+from scripts.manifest import ManifestWriter
+from scripts.outputs import SPLITS, LabelledManifest, LabelWriter, create_output_dirs
+from scripts.prefetch import Prefetcher
+from scripts.protocol import emit, emit_startup
+from scripts.sample_inputs import load_sample_inputs
+from scripts.sample_params import ParamsWriter, draw_scene_params
+from scripts.seeding import read_salts, sample_seed
+from scripts.writer import AsyncWriter, InlineWriter
+from scripts.worker import run_samples, samples_for_job
+
+
+def open_plan(root, dataset_name, geometry):
+    """
+    Opens the plan written by `run.py --plan` and tells whether its card boxes can be used as labels, which
+    needs the scene to have the geometry the plan was projected with.
+    """
+    from scripts.plan import PlanReader, geometry_matches, save_measured_geometry
+
+    plan_reader = PlanReader(root)
+
+    if plan_reader.meta["dataset"] != dataset_name:
+        raise ValueError(f"The plan in {root} is for {plan_reader.meta['dataset']}, not {dataset_name}")
+
+    if geometry_matches(geometry, plan_reader.geometry):
+        return plan_reader, True
+
+    print("Scene geometry differs from the plan, card boxes are computed by the renderer. "
+          "Run the plan stage again to use the measured geometry.")
+    save_measured_geometry(root, geometry)
+    return plan_reader, False
+
+
+def report_cache_stats(**caches):
+    stats = {name: cache.stats() for name, cache in caches.items() if cache is not None}
+
+    if stats:
+        for name, cache_stats in stats.items():
+            print(f"Cache {name}: {cache_stats['hit_rate']:.1%} hits, {cache_stats['entries']} entries, "
+                  f"{cache_stats['mb']} MB")
+        emit("CACHE", stats)
+
+
+def run_job(renderer, wd, buckets, dataset_name, classes, lease_mode=None, worker_id=None, writer_queue=0,
+            vis_every=1, vis_fraction=1.0, prefetch=0, decoded_cache_mb=0, seeded=False, plan=False, timing=False,
+            shards=False, shard_size_mb=1024, annotations=True, cards_per_image=1, max_card_overlap=0.2, label_batch=0,
+            fsync="none", load=None, **kwargs):
+    """
+    Renders the samples of the job (its buckets, or leases with lease_mode) with `renderer`.
+
+    `load(sample)` replaces the dataset reads of a sample, the datasets are then not opened (stub_blender.py).
+    """
+    datasets = None
+    if load is None:
+        started_at = time.time()
+        datasets = (DiskDataset("@DS/ds.plain_id"), DiskDataset("@DS/ds.photo_id"), DiskDataset("@DS/ds.indoors"))
+        emit_startup("dataset_open", time.time() - started_at)
+
+    root = os.path.join(wd, "output", dataset_name)
+
+    segment_id = worker_id if worker_id is not None else f"pid{os.getpid()}"
+    manifest = ManifestWriter(root, segment_id)
+
+    # Seeded runs draw every scene parameter from (dataset_name, bucket, index) and record them per sample
+    params_writer = ParamsWriter(root, segment_id) if seeded or plan else None
+
+    # With a plan the parameters (and card boxes) of every sample are read from its rows instead
+    plan_reader, planned_boxes = open_plan(root, dataset_name, renderer.geometry()) if plan else (None, False)
+
+    # Samples are streamed into rolling tar shards of this worker instead of loose files
+    shard_writer = None
+    if shards:
+        from scripts.shards import ShardWriter
+        shard_writer = ShardWriter(root, segment_id, shard_size_mb * MB)
+
+    # Otherwise the directories of the layout are made once here instead of checked for every file
+    if not shards:
+        create_output_dirs(root, sorted(set(SPLITS) | {bucket["name"] for bucket in buckets}))
+
+    # Labels written in batches of label_batch, the manifest records of their samples wait for them
+    label_writer = LabelWriter(label_batch, fsync) if label_batch > 1 and not shards else None
+    if label_writer is not None:
+        manifest = LabelledManifest(manifest, label_writer)
+
+    # Boxes and params of every sample for metadata.jsonl, merged by run.py (see orchestrator/annotations.py)
+    annotation_writer = AnnotationWriter(root, segment_id) if annotations else None
+
+    # Samples given a new scene (e.g. near-duplicates found by run.py --dedup), drawn from a salted seed
+    salts = read_salts(root)
+
+    first_render = [True]
+
+    # Labels, visualisations and manifest records are written off the render thread when writer_queue > 0
+    writer = AsyncWriter(writer_queue) if writer_queue > 0 else InlineWriter()
+
+    # Backgrounds repeat every len(background_ds) samples and photos repeat across records, keep them decoded
+    decoded_cache = ByteLRUCache(decoded_cache_mb * MB) if decoded_cache_mb > 0 else None
+
+    job = SimpleNamespace(
+        root=root,
+        datasets=datasets,
+        classes=classes,
+        writer=writer,
+        shards=shard_writer,
+        annotations=annotation_writer,
+        vis_every=vis_every,
+        vis_fraction=vis_fraction,
+        max_card_overlap=max_card_overlap,
+        labels=label_writer,
+    )
+
+    def load_dataset_inputs(progress_info):
+        return load_sample_inputs(progress_info.index, *datasets, decoded_cache, progress_info.timer,
+                                  cards_per_image - 1, salts.get((progress_info.bucket_name, progress_info.index), 0))
+
+    load_inputs = load or load_dataset_inputs
+
+    def render_sample(progress_info):
+        render_started_at = time.time()
+        if prefetch > 0:
+            # Raised here, after run_samples reported the sample, so a failing load is blamed on its own sample
+            if progress_info.load_error is not None:
+                raise progress_info.load_error
+            inputs = progress_info.inputs
+        else:
+            inputs = load_inputs(progress_info)
+
+        params = None
+        salt = salts.get((progress_info.bucket_name, progress_info.index), 0)
+        if salt:
+            # Replaces the planned scene too, the plan row is the one that duplicated another sample
+            seed = sample_seed(dataset_name, progress_info.bucket_name, progress_info.index, salt)
+            params = draw_scene_params(seed, inputs.objects_info["class"])
+            random.seed(seed)
+        elif plan_reader is not None:
+            params = plan_reader.params(progress_info.bucket_name, progress_info.index)
+            if not planned_boxes:
+                del params["box"]
+            random.seed(params["seed"])
+        elif seeded:
+            seed = sample_seed(dataset_name, progress_info.bucket_name, progress_info.index)
+            params = draw_scene_params(seed, inputs.objects_info["class"])
+            # Anything still using the global random module inside the libraries follows the sample seed too
+            random.seed(seed)
+
+        outputs = renderer.render(progress_info, inputs, params, job)
+
+        if params_writer is not None:
+            writer.submit(params_writer.record, progress_info.bucket_name, progress_info.index, params)
+
+        if first_render[0]:
+            first_render[0] = False
+            emit_startup("first_render", time.time() - render_started_at)
+
+        return outputs
+
+    # With timing every sample reports the seconds of each stage as a TIMING line
+    samples = samples_for_job(buckets, lease_mode, timing)
+
+    # Dataset reads and decoding of the next `prefetch` samples run on a background thread
+    if prefetch > 0:
+        samples = Prefetcher(samples, load_inputs, prefetch)
+
+    try:
+        run_samples(samples, render_sample, manifest, renderer.memory_stats, writer)
+    finally:
+        if prefetch > 0:
+            emit("PREFETCH", samples.stats())
+
+        report_cache_stats(decoded=decoded_cache, **renderer.caches())
+
+        # Flushes whatever is still queued, also when a sample failed, so finished samples are not lost
+        writer.close()
+        manifest.close()
+        renderer.close()
+
+        if label_writer is not None:
+            stats = label_writer.stats()
+            print(f"Labels: {stats}")
+            emit("OUTPUT", stats)
+
+        if shard_writer is not None:
+            shard_writer.close()
+
+        if params_writer is not None:
+            params_writer.close()
+
+        if annotation_writer is not None:
+            annotation_writer.close()
@@ -0,0 +1,86 @@
+import threading
+from collections import OrderedDict
+
+MB = 1024 * 1024
+
+
+def pil_nbytes(image):
+    width, height = image.size
+    return width * height * len(image.getbands())
+
+
+class ByteLRUCache:
+    """
+    Least recently used cache bounded by the total size of its values in bytes.
+
+    Keys are (dataset, index)-like tuples. on_evict(key, value) is called for every value pushed out, e.g. to free
+    a Blender datablock. A value larger than the whole budget is returned but never stored, so get_or_load tells
+    the caller whether the value it got is in the cache or its own to free.
+    """
+
+    def __init__(self, max_bytes, size_of=pil_nbytes, on_evict=None):
+        self.max_bytes = max_bytes
+        self.size_of = size_of
+        self.on_evict = on_evict
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_load(self, key, load):
+        """
+        Returns (value, cached). A value that is not cached (larger than the budget, or loaded by another thread
+        in the meantime) is never freed by the cache, it belongs to the caller.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0], True
+
+            self.misses += 1
+
+        value = load()
+        size = self.size_of(value)
+
+        if size > self.max_bytes:
+            return value, False
+
+        with self._lock:
+            if key in self._entries:
+                return value, False
+
+            self._entries[key] = (value, size)
+            self.bytes += size
+            self._evict()
+
+        return value, True
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def _evict(self):
+        while self.bytes > self.max_bytes and self._entries:
+            key, (value, size) = self._entries.popitem(last=False)
+            self.bytes -= size
+            self.evictions += 1
+
+            if self.on_evict is not None:
+                self.on_evict(key, value)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "mb": round(self.bytes / MB, 1),
+            }
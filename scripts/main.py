@@ -1,62 +1,94 @@
-import os.path
-from types import SimpleNamespace
-
-import bpy
 import bpy
-from lambdawalker.dataset.DiskDataset import DiskDataset
+from lambdawalker.blender.query.get_scene_and_camera import get_scene_and_camera
 
+from scripts.card_instances import CardInstances, scene_geometry
 from scripts.id_card import render_id_simple_card
+from scripts.job import run_job
+from scripts.lru_cache import MB, ByteLRUCache
+from scripts.memory import current_rss
+from scripts.render_profiles import apply_render_profile, resolve_profile
+from scripts.scene_cache import SceneCache, blender_image_nbytes, free_blender_image
 
 
 def setup_memory_optimized_settings():
     bpy.context.preferences.edit.use_global_undo = False
 
 
-def main(wd, buckets, dataset_name, classes, **kwargs):
-    main_data_source = DiskDataset("@DS/ds.plain_id")
+def memory_stats():
+    return {"rss": current_rss(), "images": len(bpy.data.images)}
 
-    photo_id_ds = DiskDataset("@DS/ds.photo_id")
-    background_ds = DiskDataset("@DS/ds.indoors")
 
+class BlenderRenderer:
+    """
+    Renders the samples of a job (see scripts/job.py) in the open .blend file with render_id_simple_card.
 
-    root = os.path.join(wd, "output", dataset_name)
+    The render profile is applied here, before the job checks the plan: its resolution is part of the scene
+    geometry.
+    """
 
-    setup_memory_optimized_settings()
+    def __init__(self, batched_render=False, purge_every=16, render_buffer=False, blender_image_cache_mb=0,
+                 render_profile=None, cards_per_image=1):
+        self.purge_every = purge_every
+        self.render_buffer = render_buffer
+
+        profile = resolve_profile(render_profile)
+        if profile is not None:
+            apply_render_profile(get_scene_and_camera()[0], profile)
+            print(f"Render profile {render_profile}: {profile}")
+
+        # Frames with several cards: copies of the card object, placed with the geometry measured once here
+        self.card_instances = CardInstances(bpy.data.objects["card"], scene_geometry()) \
+            if cards_per_image > 1 else None
 
-    for progress_info in progress_generator(buckets):
-        render_id_simple_card(
+        # Batched render path: one SceneCache for every sample of this worker, orphans purged every purge_every
+        self.scene_cache = SceneCache() if batched_render else None
+
+        self.image_cache = ByteLRUCache(
+            blender_image_cache_mb * MB, size_of=blender_image_nbytes, on_evict=free_blender_image
+        ) if blender_image_cache_mb > 0 else None
+
+    def geometry(self):
+        return scene_geometry()
+
+    def render(self, progress_info, inputs, params, job):
+        return render_id_simple_card(
             progress_info.bucket_name,
             progress_info.index,
-            root,
-            main_data_source,
-            photo_id_ds,
-            background_ds,
-            classes
+            job.root,
+            *job.datasets,
+            job.classes,
+            scene_cache=self.scene_cache,
+            purge=self.scene_cache is None or (progress_info.local_count + 1) % self.purge_every == 0,
+            writer=job.writer,
+            render_buffer=self.render_buffer,
+            vis_every=job.vis_every,
+            vis_fraction=job.vis_fraction,
+            inputs=inputs,
+            image_cache=self.image_cache,
+            params=params,
+            timer=progress_info.timer,
+            shards=job.shards,
+            annotations=job.annotations,
+            card_instances=self.card_instances,
+            max_card_overlap=job.max_card_overlap,
+            labels=job.labels
         )
 
+    def memory_stats(self):
+        return memory_stats()
 
-def progress_generator(buckets):
-    """
-    Generator that yields progress information for each item across all buckets.
+    def caches(self):
+        return {"datablocks": self.image_cache}
 
-    Yields:
-        dict: Contains 'bucket_name', 'index', 'local_count', and 'bucket' info
-    """
-    local_count = 0
-
-    for bucket in buckets:
-        start = bucket.get('start', 0)
-        size = bucket['size']
-        end = start + size
-        bucket_name = bucket['name']
+    def close(self):
+        pass
 
-        for i in range(start, end):
-            yield SimpleNamespace(
-                bucket_name=bucket_name,
-                index=i,
-                local_count=local_count,
-            )
-            local_count += 1
-            print(f"PROGRESS:{local_count}", flush=True)
 
+def main(wd, buckets, dataset_name, classes, batched_render=False, purge_every=16, render_buffer=False,
+         blender_image_cache_mb=0, render_profile=None, cards_per_image=1, **kwargs):
+    """Worker entry point (see scripts/init.py): runs the job (scripts/job.py:run_job) with a BlenderRenderer."""
+    setup_memory_optimized_settings()
 
+    renderer = BlenderRenderer(batched_render, purge_every, render_buffer, blender_image_cache_mb, render_profile,
+                               cards_per_image)
+    run_job(renderer, wd, buckets, dataset_name, classes, cards_per_image=cards_per_image, **kwargs)
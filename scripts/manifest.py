@@ -0,0 +1,126 @@
+import json
+import os
+
+MANIFEST_DIR = "manifest"
+
+
+def manifest_dir(root):
+    return os.path.join(root, MANIFEST_DIR)
+
+
+class ManifestWriter:
+    """
+    Append-only record of completed samples, one JSON line per (bucket, index).
+
+    Every worker appends to its own segment (manifest/worker-<id>.jsonl) so concurrent instances never
+    interleave writes; run.py reads all segments at startup to schedule only the missing work.
+    """
+
+    def __init__(self, root, worker_id):
+        os.makedirs(manifest_dir(root), exist_ok=True)
+        self.path = os.path.join(manifest_dir(root), f"worker-{worker_id}.jsonl")
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def record(self, bucket_name, index, image=True, label=True, vis=True):
+        entry = {"bucket": bucket_name, "index": index, "image": image, "label": label, "vis": vis}
+        self._file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        self._file.flush()
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def read_manifest(root):
+    """
+    Reads every manifest segment.
+
+    Returns:
+        dict: bucket name -> set of completed indices (image and label written). Truncated or malformed lines,
+        e.g. from a worker killed mid-write, are ignored.
+    """
+    completed = {}
+    directory = manifest_dir(root)
+
+    if not os.path.isdir(directory):
+        return completed
+
+    for entry in os.scandir(directory):
+        if not entry.name.endswith(".jsonl"):
+            continue
+
+        with open(entry.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+
+                if record.get("image") and record.get("label"):
+                    completed.setdefault(record["bucket"], set()).add(record["index"])
+
+    return completed
+
+
+def bootstrap_manifest(root, bucket_names):
+    """
+    Builds a manifest segment from the files of a run that predates the manifest.
+
+    Uses one directory listing per bucket instead of a stat call per sample, and is only needed once: afterwards
+    the manifest exists and the listing is skipped.
+    """
+    writer = None
+
+    for bucket_name in bucket_names:
+        images = _list_indices(os.path.join(root, "images", bucket_name), ".jpg")
+        labels = _list_indices(os.path.join(root, "labels", bucket_name), ".txt")
+        visualizations = _list_indices(os.path.join(root, "vis", bucket_name), ".jpg")
+
+        for index in sorted(images & labels):
+            writer = writer or ManifestWriter(root, "bootstrap")
+            writer.record(bucket_name, index, vis=index in visualizations)
+
+    if writer is not None:
+        writer.close()
+
+
+def _list_indices(directory, extension):
+    if not os.path.isdir(directory):
+        return set()
+
+    indices = set()
+    for entry in os.scandir(directory):
+        stem, ext = os.path.splitext(entry.name)
+        if ext == extension and stem.isdigit():
+            indices.add(int(stem))
+
+    return indices
+
+
+def missing_intervals(buckets, completed):
+    """
+    Removes completed indices from the buckets.
+
+    Returns:
+        list: {'name', 'start', 'size'} intervals, in bucket order, covering every index not yet completed.
+    """
+    intervals = []
+
+    for bucket in buckets:
+        name = bucket['name']
+        start = bucket.get('start', 0)
+        end = start + bucket['size']
+        done = sorted(i for i in completed.get(name, ()) if start <= i < end)
+
+        cursor = start
+        for index in done:
+            if index > cursor:
+                intervals.append({'name': name, 'start': cursor, 'size': index - cursor})
+            cursor = index + 1
+
+        if cursor < end:
+            intervals.append({'name': name, 'start': cursor, 'size': end - cursor})
+
+    return intervals
@@ -0,0 +1,51 @@
+import ctypes
+import os
+import sys
+
+
+def current_rss():
+    """
+    Resident set size of the current process in bytes, without psutil (not available in Blender's Python).
+
+    Returns None when the platform is not supported.
+    """
+    if sys.platform.startswith("linux"):
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+    if sys.platform == "win32":
+        return _windows_rss()
+
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    # Peak instead of current RSS, in bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class _ProcessMemoryCounters(ctypes.Structure):
+    _fields_ = [
+        ("cb", ctypes.c_ulong),
+        ("PageFaultCount", ctypes.c_ulong),
+        ("PeakWorkingSetSize", ctypes.c_size_t),
+        ("WorkingSetSize", ctypes.c_size_t),
+        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+        ("QuotaPagedPoolUsage", ctypes.c_size_t),
+        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+        ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+        ("PagefileUsage", ctypes.c_size_t),
+        ("PeakPagefileUsage", ctypes.c_size_t),
+    ]
+
+
+def _windows_rss():
+    counters = _ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(counters)
+
+    handle = ctypes.windll.kernel32.GetCurrentProcess()
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+        return None
+
+    return counters.WorkingSetSize
@@ -0,0 +1,170 @@
+"""
+Headless renderer backend: composites the card images onto the background with NumPy and PIL instead of
+rendering the .blend file, so the whole pipeline (scheduler, protocol, writers, shards, annotations, plan) runs and
+can be load-tested on machines without Blender. Used by stub_blender.py with the worker option renderer="numpy".
+
+The card is warped with the homography the camera gives its top face under the sample's scene parameters
+(drawn from a random seed when the sample has none), projected with the model of scripts/projection.py, so
+boxes agree with the plan stage. Light energy and temperature only scale and tint the frame; materials, the
+hologram layer and shadows are not drawn.
+
+With fast (`run.py --renderer numpy-fast`) nothing is drawn at all: every image is the same tiny gray JPEG and
+no visualisation is written, while scene parameters, boxes, labels, annotations and the manifest are the same as
+with the drawn frames. For load tests of the orchestrator and the writers, not for datasets.
+"""
+import random
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from scripts.boxes import should_visualize
+from scripts.memory import current_rss
+from scripts.outputs import jpeg_bytes, submit_outputs
+from scripts.plan import DEFAULT_GEOMETRY
+from scripts.projection import card_face_corners, place_cards, project_card_boxes
+from scripts.render_profiles import resolve_profile
+from scripts.sample_params import LIGHT_INTENSITY, draw_scene_params, kelvin_to_rgb
+
+
+def perspective_coefficients(source, target):
+    """
+    The 8 coefficients of PIL's PERSPECTIVE transform that map the target quad (output pixels) onto the source
+    quad (input pixels), corner by corner.
+    """
+    rows = []
+    for (x, y), (u, v) in zip(target, source):
+        rows.append([x, y, 1, 0, 0, 0, -u * x, -u * y])
+        rows.append([0, 0, 0, x, y, 1, -v * x, -v * y])
+
+    return np.linalg.solve(np.array(rows, dtype=np.float64), np.asarray(source, dtype=np.float64).ravel())
+
+
+def composite_card(frame, card_image, corners):
+    """Pastes card_image onto the frame (in place) with its corners at `corners` (4, 2), only touching their box."""
+    width, height = frame.size
+    x0, y0 = np.floor(corners.min(axis=0)).astype(int)
+    x1, y1 = np.ceil(corners.max(axis=0)).astype(int)
+    x0, y0, x1, y1 = max(x0, 0), max(y0, 0), min(x1, width), min(y1, height)
+    if x1 <= x0 or y1 <= y0:
+        return
+
+    w, h = card_image.size
+    coefficients = perspective_coefficients([(0, 0), (w, 0), (w, h), (0, h)], corners - (x0, y0))
+    size = (x1 - x0, y1 - y0)
+
+    card = card_image.convert("RGB").transform(size, Image.PERSPECTIVE, coefficients, Image.BILINEAR)
+    mask = Image.new("L", card_image.size, 255).transform(size, Image.PERSPECTIVE, coefficients, Image.BILINEAR)
+    frame.paste(card, (x0, y0), mask)
+
+
+def light_gain(params):
+    """Per-channel gain of the frame: brighter with the light's energy, tinted by a quarter of its color."""
+    low, high = LIGHT_INTENSITY
+    brightness = 0.75 + 0.5 * (params["light_energy"] - low) / (high - low)
+    color = np.array(kelvin_to_rgb(params["light_temperature"]))
+    return brightness * (0.75 + 0.25 * color / color.max())
+
+
+# Side of the constant image of the fast mode
+PLACEHOLDER_SIZE = 16
+
+
+class NumpyRenderer:
+    """Renderer of scripts/job.py without bpy. Of a render profile only the resolution and JPEG quality apply."""
+
+    def __init__(self, render_profile=None, geometry=DEFAULT_GEOMETRY, fast=False):
+        profile = resolve_profile(render_profile) or {}
+        scale = profile.get("resolution_percentage", 100) / 100.0
+
+        self.quality = profile.get("quality", 90)
+        self.scene_geometry = dict(geometry, resolution=[round(side * scale) for side in geometry["resolution"]])
+
+        # Encoded once, written as it is for every sample
+        self.placeholder = jpeg_bytes(Image.new("RGB", (PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), (128, 128, 128)),
+                                      self.quality) if fast else None
+
+    def geometry(self):
+        return self.scene_geometry
+
+    def render(self, progress_info, inputs, params, job):
+        timer = progress_info.timer
+        width, height = self.scene_geometry["resolution"]
+
+        card_images = [inputs.id_card_image] + [card.id_card_image for card in inputs.cards]
+        card_classes = [inputs.objects_info["class"]] + [card.objects_info["class"] for card in inputs.cards]
+        scene = params if params is not None else draw_scene_params(random.getrandbits(64), card_classes[0])
+
+        with timer.stage("scene"):
+            card_params = self._place_cards(inputs.cards, card_classes, scene, params, job.max_card_overlap)
+            corners = card_face_corners(card_params, self.scene_geometry)
+
+        with timer.stage("render"):
+            if self.placeholder is not None:
+                pixels = self.placeholder
+            else:
+                pixels = self._draw(inputs.background_image, card_images, corners, scene, width, height)
+
+        with timer.stage("cleanup"):
+            for image in inputs.owned:
+                image.close()
+
+        with timer.stage("bbox"):
+            planned_box = params.get("box") if params is not None and len(card_images) == 1 else None
+            boxes = [planned_box] if planned_box is not None else \
+                project_card_boxes(card_params, self.scene_geometry)[0].tolist()
+
+        bounding_box_data = [{"class": card_class, "boundingBox": box} for card_class, box in zip(card_classes, boxes)]
+        visualize = self.placeholder is None and should_visualize(progress_info.index, job.vis_every,
+                                                                  job.vis_fraction)
+
+        return submit_outputs(job.writer, timer, job.root, progress_info.bucket_name, progress_info.index, pixels,
+                              width, height, bounding_box_data, job.classes, True, visualize, self.quality, job.shards,
+                              job.annotations, params, job.labels)
+
+    def _draw(self, background_image, card_images, corners, scene, width, height):
+        frame = ImageOps.fit(background_image.convert("RGB"), (width, height), Image.BILINEAR)
+        # Cards are layered bottom up, as place_cards stacks them
+        for card_image, card_corners in zip(card_images, corners):
+            composite_card(frame, card_image, card_corners)
+
+        # One lookup table per channel, cheaper than scaling the frame as floats
+        lit = Image.merge("RGB", [band.point([min(round(value * gain), 255) for value in range(256)])
+                                  for band, gain in zip(frame.split(), light_gain(scene))])
+        frame.close()
+        return np.asarray(lit)
+
+    def _place_cards(self, cards, card_classes, scene, params, max_overlap):
+        """The card_params rows of project_card_boxes, one per card; several cards are spread by place_cards."""
+        count = len(card_classes)
+        camera_location, camera_rotation = scene["camera_location"], scene["camera_rotation"]
+
+        if count == 1:
+            locations, rotations = [scene["card_location"]], [scene["card_rotation"]]
+        else:
+            rng = np.random.default_rng(scene["seed"])
+            locations, rotations, _ = place_cards(card_classes, self.scene_geometry, camera_location, camera_rotation,
+                                                  rng, max_overlap)
+            if params is not None:
+                params["card_location"], params["card_rotation"] = locations[0].tolist(), rotations[0].tolist()
+                params["cards"] = [
+                    {"index": card_inputs.index, "class": card_class, "location": location.tolist(),
+                     "rotation": rotation.tolist()}
+                    for card_inputs, card_class, location, rotation in zip(cards, card_classes[1:], locations[1:],
+                                                                           rotations[1:])
+                ]
+
+        return {
+            "card_location": np.asarray(locations, dtype=np.float64),
+            "card_rotation": np.asarray(rotations, dtype=np.float64),
+            "camera_location": np.tile(np.asarray(camera_location, dtype=np.float64), (count, 1)),
+            "camera_rotation": np.tile(np.asarray(camera_rotation, dtype=np.float64), (count, 1)),
+        }
+
+    def memory_stats(self):
+        return {"rss": current_rss(), "images": 0}
+
+    def caches(self):
+        return {}
+
+    def close(self):
+        pass
@@ -0,0 +1,309 @@
+import io
+import os
+import time
+
+from PIL import Image, ImageDraw
+
+from scripts.boxes import to_xyxy, yolo_line
+
+# Top level directories of the YOLO layout, one subdirectory per split
+LAYOUT_DIRS = ("images", "labels", "vis")
+SPLITS = ("train", "val", "test")
+
+FSYNC_POLICIES = ("none", "batch")
+
+# Directories known to exist, so every sample doesn't pay a makedirs (a few metadata calls on a network volume)
+_created_dirs = set()
+
+
+def create_output_dirs(output_path, bucket_names=SPLITS):
+    """Creates the images/labels/vis directory of every bucket once, at job start."""
+    for layout_dir in LAYOUT_DIRS:
+        for bucket_name in bucket_names:
+            ensure_directory(os.path.join(output_path, layout_dir, bucket_name))
+
+
+def ensure_directory(directory):
+    if directory not in _created_dirs:
+        os.makedirs(directory, exist_ok=True)
+        _created_dirs.add(directory)
+
+
+def ensure_directory_for_file(path):
+    ensure_directory(os.path.dirname(path))
+
+
+class LabelWriter:
+    """
+    Buffers label files and writes them in batches of batch_size, instead of one open/write/close per sample
+    right away. The files are the same as written one by one.
+
+    Work passed to after() (the manifest records of the samples) runs once the labels buffered before it are
+    written, so a sample never counts as done before its label exists. With the fsync policy "batch" every label
+    of a batch is fsynced before that. Write latency is kept per batch, see stats().
+    """
+
+    def __init__(self, batch_size=64, fsync="none"):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy {fsync!r}, expected one of {', '.join(FSYNC_POLICIES)}")
+
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self._labels = []
+        self._after = []
+        self._batch_seconds = []
+        self._files = 0
+
+    def write(self, path, text):
+        self._labels.append((path, text))
+        if len(self._labels) >= self.batch_size:
+            self.flush()
+
+    def after(self, fn, *args, **kwargs):
+        if self._labels:
+            self._after.append((fn, args, kwargs))
+        else:
+            fn(*args, **kwargs)
+
+    def flush(self):
+        if self._labels:
+            started_at = time.perf_counter()
+            for path, text in self._labels:
+                with open(path, 'w') as label_file:
+                    label_file.write(text)
+                    if self.fsync == "batch":
+                        label_file.flush()
+                        os.fsync(label_file.fileno())
+
+            self._batch_seconds.append(time.perf_counter() - started_at)
+            self._files += len(self._labels)
+            self._labels = []
+
+        after, self._after = self._after, []
+        for fn, args, kwargs in after:
+            fn(*args, **kwargs)
+
+    def stats(self):
+        seconds = sorted(self._batch_seconds)
+        if not seconds:
+            return {"files": 0, "batches": 0}
+
+        return {
+            "files": self._files,
+            "batches": len(seconds),
+            "fsync": self.fsync,
+            "ms_per_file": round(1000.0 * sum(seconds) / self._files, 3),
+            "batch_ms_p50": round(1000.0 * seconds[len(seconds) // 2], 3),
+            "batch_ms_p95": round(1000.0 * seconds[min(int(len(seconds) * 0.95), len(seconds) - 1)], 3),
+        }
+
+    def close(self):
+        self.flush()
+
+
+class LabelledManifest:
+    """A ManifestWriter whose records wait for the labels buffered before them in a LabelWriter."""
+
+    def __init__(self, manifest, labels):
+        self.manifest = manifest
+        self.labels = labels
+
+    def record(self, *args, **kwargs):
+        self.labels.after(self.manifest.record, *args, **kwargs)
+
+    def flush(self):
+        self.labels.flush()
+        self.manifest.flush()
+
+    def close(self):
+        self.labels.close()
+        self.manifest.close()
+
+
+def submit_outputs(writer, timer, output_path, bucket_name, global_index, image, width, height, bounding_box_data,
+                   classes, own_boxes, visualize, quality=90, shards=None, annotations=None, params=None, labels=None):
+    """
+    Submits every write of a rendered sample to `writer`: annotation record, YOLO label, image and visualisation,
+    or the shard members with a ShardWriter. No bpy involved, shared by every renderer backend.
+
+    `image` is the rendered pixels (H, W, 3 uint8), an encoded JPEG (bytes, written as they are) or the path of
+    the JPEG the renderer wrote. With own_boxes the label is written from the boxes as they are (scripts/boxes.py)
+    instead of lambdawalker's description of compute_obj_pixel_bounding_box boxes, see label_text. With a
+    LabelWriter the label goes into its batch instead of its file right away. Returns the outputs of the sample for
+    the manifest.
+    """
+    if annotations is not None:
+        writer.submit(timer.wrap("label_write", annotations.record), bucket_name, global_index, width, height,
+                      bounding_box_data, classes, params)
+
+    if shards is not None:
+        writer.submit(timer.wrap("shard_write", _write_sample_to_shard), shards, bucket_name, global_index, image,
+                      width, height, bounding_box_data, classes, own_boxes, visualize, quality)
+        return {"image": True, "label": True, "vis": visualize}
+
+    if labels is not None:
+        writer.submit(timer.wrap("label_write", _buffer_label), labels, output_path, bucket_name, global_index, width,
+                      height, bounding_box_data, classes, own_boxes)
+    else:
+        writer.submit(timer.wrap("label_write", write_yolo_annotations), output_path, bucket_name, global_index, width,
+                      height, bounding_box_data, classes, own_boxes)
+
+    output_file = image if isinstance(image, str) else f"{output_path}/images/{bucket_name}/{global_index}.jpg"
+
+    if isinstance(image, bytes):
+        ensure_directory_for_file(output_file)
+        writer.submit(timer.wrap("image_write", _write_bytes), output_file, image)
+        image = output_file
+
+    if not isinstance(image, str):
+        ensure_directory_for_file(output_file)
+        output_file_vis = visualization_path(output_path, bucket_name, global_index) if visualize else None
+        writer.submit(timer.wrap("image_write", save_image_and_visualization), image, output_file, output_file_vis,
+                      bounding_box_data, quality)
+    elif visualize and own_boxes:
+        writer.submit(timer.wrap("vis_write", save_visualization_from_file), output_file,
+                      visualization_path(output_path, bucket_name, global_index), bounding_box_data, quality)
+    elif visualize:
+        writer.submit(timer.wrap("vis_write", _save_visualization), output_path, bucket_name, global_index, output_file,
+                      bounding_box_data)
+
+    return {"image": True, "label": True, "vis": visualize}
+
+
+def visualization_path(output_path, bucket_name, global_index):
+    output_file_vis = f"{output_path}/vis/{bucket_name}/{global_index}.jpg"
+    ensure_directory_for_file(output_file_vis)
+    return output_file_vis
+
+
+def _write_bytes(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def _save_visualization(output_path, bucket_name, global_index, output_file, bounding_box_data):
+    # lambdawalker's drawing is only imported once a sample is visualised this way
+    from lambdawalker.yolo.log.vis_log import draw_bounding_boxes
+
+    output_file_vis = visualization_path(output_path, bucket_name, global_index)
+    draw_bounding_boxes(output_file, bounding_box_data, output_file_vis)
+
+
+def write_yolo_annotations(output_path, bucket_name, global_index, width, height, bounding_box_data, classes,
+                           own_boxes=False):
+    yolo_data = label_text(bounding_box_data, width, height, classes, own_boxes)
+
+    yolo_txt_path = f"{output_path}/labels/{bucket_name}/{global_index}.txt"
+    ensure_directory_for_file(yolo_txt_path)
+
+    with open(yolo_txt_path, 'w') as yolo_file:
+        yolo_file.write(yolo_data)
+
+
+def _yolo_description(bounding_box_data, width, height, classes):
+    """lambdawalker's label of compute_obj_pixel_bounding_box boxes, imported when the first one is written."""
+    from lambdawalker.yolo.log.yolo_log import create_yolo_description
+    return create_yolo_description(bounding_box_data, width, height, classes)
+
+
+def _buffer_label(labels, output_path, bucket_name, global_index, width, height, bounding_box_data, classes,
+                  planned):
+    yolo_txt_path = f"{output_path}/labels/{bucket_name}/{global_index}.txt"
+    ensure_directory_for_file(yolo_txt_path)
+
+    labels.write(yolo_txt_path, label_text(bounding_box_data, width, height, classes, planned))
+
+
+def label_text(bounding_box_data, width, height, classes, own_boxes):
+    """
+    The YOLO label of a sample, the one formatter of every write path (loose file, label batch, shard member).
+    Own boxes (projected or planned) get the same text as lambdawalker's description of the same boxes, see
+    tests/test_outputs.py.
+    """
+    if own_boxes:
+        return _planned_yolo_description(width, height, bounding_box_data, classes)
+    return _yolo_description(bounding_box_data, width, height, classes)
+
+
+def _planned_yolo_description(width, height, bounding_box_data, classes):
+    lines = [yolo_line(classes[item["class"]], item["boundingBox"], width, height) for item in bounding_box_data]
+    return "\n".join(lines) + "\n"
+
+
+def _write_sample_to_shard(shards, bucket_name, global_index, image, width, height, bounding_box_data, classes,
+                           planned, visualize, quality):
+    image_bytes, vis_bytes = encode_image_and_visualization(image, bounding_box_data, visualize, quality)
+    if isinstance(image, str):
+        os.remove(image)
+
+    label = label_text(bounding_box_data, width, height, classes, planned)
+
+    members = {".jpg": image_bytes, ".txt": label.encode("utf-8")}
+    if vis_bytes is not None:
+        members[".vis.jpg"] = vis_bytes
+
+    shards.add(bucket_name, global_index, members)
+
+
+def save_image_and_visualization(pixels, output_file, output_file_vis, bounding_box_data, quality=90):
+    """Encodes the render and (when output_file_vis is set) its visualisation from the same buffer."""
+    image = Image.fromarray(pixels, "RGB")
+    image.save(output_file, "JPEG", quality=quality)
+
+    if output_file_vis is not None:
+        draw_bounding_boxes_on_image(image, bounding_box_data)
+        image.save(output_file_vis, "JPEG", quality=quality)
+
+    image.close()
+
+
+def save_visualization_from_file(output_file, output_file_vis, bounding_box_data, quality=90):
+    with Image.open(output_file) as image:
+        image = image.convert("RGB")
+    draw_bounding_boxes_on_image(image, bounding_box_data)
+    image.save(output_file_vis, "JPEG", quality=quality)
+    image.close()
+
+
+def encode_image_and_visualization(pixels, bounding_box_data, visualize, quality=90):
+    """
+    The JPEG bytes of the render and (when visualize is set, else None) of its visualisation, for the shards.
+    `pixels` is the render buffer, an encoded JPEG or the path of the JPEG Blender wrote, whose bytes are taken
+    as they are.
+    """
+    if isinstance(pixels, (str, bytes)):
+        image_bytes = pixels
+        if isinstance(pixels, str):
+            with open(pixels, "rb") as f:
+                image_bytes = f.read()
+        if not visualize:
+            return image_bytes, None
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            image = image.convert("RGB")
+    else:
+        image = Image.fromarray(pixels, "RGB")
+        image_bytes = jpeg_bytes(image, quality)
+
+    vis_bytes = None
+    if visualize:
+        vis_bytes = jpeg_bytes(draw_bounding_boxes_on_image(image, bounding_box_data), quality)
+
+    image.close()
+    return image_bytes, vis_bytes
+
+
+def jpeg_bytes(image, quality):
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def draw_bounding_boxes_on_image(image, bounding_box_data, color=(255, 0, 0)):
+    draw = ImageDraw.Draw(image)
+
+    for item in bounding_box_data:
+        x0, y0, x1, y1 = to_xyxy(item["boundingBox"])
+        draw.rectangle((x0, y0, x1, y1), outline=color, width=2)
+        draw.text((x0 + 3, y0 + 3), str(item["class"]), fill=color)
+
+    return image
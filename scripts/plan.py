@@ -0,0 +1,142 @@
+import json
+import os
+
+import numpy as np
+
+PLAN_DIR = "plan"
+META_FILE = "meta.json"
+MEASURED_GEOMETRY_FILE = "scene-geometry.json"
+
+# Camera and card of bitmapMaterialMask.blend as the plan stage assumes them. A worker measures the real scene and
+# only uses the planned boxes when it matches (see geometry_matches); it writes what it measured to
+# plan/scene-geometry.json, which the next plan run uses instead of these values.
+DEFAULT_GEOMETRY = {
+    "resolution": [800, 800],
+    "pixel_aspect": [1.0, 1.0],
+    "camera_type": "PERSP",
+    "lens": 50.0,
+    "sensor_width": 36.0,
+    "sensor_height": 24.0,
+    "sensor_fit": "AUTO",
+    "shift": [0.0, 0.0],
+    "rotation_modes": ["XYZ", "XYZ"],
+    "parented": False,
+    # Local bounding box of the card mesh times the object scale, ID-1 size (85.60 x 53.98 x 0.76 mm)
+    "card_bound_box": [[-0.0428, -0.02699, -0.00038], [0.0428, 0.02699, 0.00038]],
+}
+
+# One row per sample, the same values as draw_scene_params plus the projected card box
+PLAN_DTYPE = np.dtype([
+    ("index", np.int64),
+    ("seed", np.uint64),
+    ("class_id", np.int16),
+    ("subtype", "U32"),
+    ("camera_location", np.float64, 3),
+    ("camera_rotation", np.float64, 3),
+    ("card_location", np.float64, 3),
+    ("card_rotation", np.float64, 3),
+    ("light_location", np.float64, 3),
+    ("light_rotation", np.float64, 3),
+    ("light_energy", np.float64),
+    ("light_temperature", np.float64),
+    ("card_material", np.float64),
+    ("card_material_seed", np.int64),
+    ("table_material", np.float64),
+    ("table_material_seed", np.int64),
+    # x_min, y_min, x_max, y_max in pixels, clipped to the frame
+    ("box", np.float32, 4),
+    ("box_clipped", np.bool_),
+])
+
+PARAM_FIELDS = (
+    "camera_location", "camera_rotation", "card_location", "card_rotation", "light_location", "light_rotation",
+    "light_energy", "light_temperature", "card_material", "card_material_seed", "table_material",
+    "table_material_seed",
+)
+
+
+def plan_dir(root):
+    return os.path.join(root, PLAN_DIR)
+
+
+def bucket_plan_path(root, bucket_name):
+    return os.path.join(plan_dir(root), f"{bucket_name}.npy")
+
+
+def load_geometry(root):
+    """The scene geometry last measured by a worker, or DEFAULT_GEOMETRY."""
+    path = os.path.join(plan_dir(root), MEASURED_GEOMETRY_FILE)
+
+    if not os.path.exists(path):
+        return DEFAULT_GEOMETRY
+
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_measured_geometry(root, geometry):
+    os.makedirs(plan_dir(root), exist_ok=True)
+    path = os.path.join(plan_dir(root), MEASURED_GEOMETRY_FILE)
+
+    # Every worker may measure it, each writes its own temporary file
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "w", encoding="utf-8") as f:
+        json.dump(geometry, f, indent=2)
+    os.replace(temporary_path, path)
+
+
+def geometry_matches(a, b, rel_tol=1e-4):
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(geometry_matches(a[key], b[key], rel_tol) for key in a)
+
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        return len(a) == len(b) and all(geometry_matches(x, y, rel_tol) for x, y in zip(a, b))
+
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)) and not isinstance(a, bool):
+        return abs(a - b) <= rel_tol * max(abs(a), abs(b), 1e-3)
+
+    return a == b
+
+
+class PlanReader:
+    """
+    Reads the rows of a plan written by orchestrator/plan.py; the bucket files are memory-mapped, so a worker
+    only pages in the rows it renders.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+        with open(os.path.join(plan_dir(root), META_FILE), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+
+        self._arrays = {}
+
+    @property
+    def geometry(self):
+        return self.meta["geometry"]
+
+    def row(self, bucket_name, index):
+        array = self._arrays.get(bucket_name)
+
+        if array is None:
+            array = np.load(bucket_plan_path(self.root, bucket_name), mmap_mode="r")
+            self._arrays[bucket_name] = array
+
+        row = array[index - self.meta["buckets"][bucket_name]["start"]]
+        if row["index"] != index:
+            raise ValueError(f"Plan row of {bucket_name}:{index} holds sample {row['index']}")
+
+        return row
+
+    def params(self, bucket_name, index):
+        """The sample's scene parameters in the draw_scene_params layout, plus its planned 'box'."""
+        row = self.row(bucket_name, index)
+        params = {"seed": int(row["seed"])}
+
+        for field in PARAM_FIELDS:
+            value = row[field]
+            params[field] = value.tolist() if value.ndim else value.item()
+
+        params["box"] = row["box"].tolist()
+        return params
@@ -0,0 +1,79 @@
+import queue
+import threading
+import time
+
+_END = object()
+
+
+class Prefetcher:
+    """
+    Iterates samples while a background thread loads the inputs of the next `depth` samples.
+
+    The sample order is fully known from the buckets / leases, so `load(sample)` (dataset reads, decoding,
+    rotation) runs ahead of the render loop. At most `depth` loaded samples wait in the queue, plus the one being
+    loaded. Every yielded sample gets an `inputs` attribute and a `load_error` one (None when the load worked):
+    the error is raised by the consumer, once it has reported which sample it is working on.
+    """
+
+    def __init__(self, samples, load, depth=4):
+        self._samples = samples
+        self._load = load
+        self._queue = queue.Queue(maxsize=max(1, depth))
+
+        self.hits = 0
+        self.misses = 0
+        self.wait_seconds = 0.0
+        self.load_seconds = 0.0
+
+        self._thread = threading.Thread(target=self._run, name="prefetch", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            for sample in self._samples:
+                started_at = time.perf_counter()
+                try:
+                    inputs, error = self._load(sample), None
+                except Exception as e:
+                    inputs, error = None, e
+                self.load_seconds += time.perf_counter() - started_at
+
+                self._queue.put((sample, inputs, error))
+        except Exception as e:
+            self._queue.put((_END, None, e))
+            return
+
+        self._queue.put((_END, None, None))
+
+    def __iter__(self):
+        while True:
+            try:
+                sample, inputs, error = self._queue.get_nowait()
+                waited = 0.0
+            except queue.Empty:
+                started_at = time.perf_counter()
+                sample, inputs, error = self._queue.get()
+                waited = time.perf_counter() - started_at
+
+            if sample is _END:
+                if error is not None:
+                    raise error
+                return
+
+            if waited:
+                self.misses += 1
+                self.wait_seconds += waited
+            else:
+                self.hits += 1
+
+            sample.inputs = inputs
+            sample.load_error = error
+            yield sample
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "wait_seconds": round(self.wait_seconds, 4),
+            "load_seconds": round(self.load_seconds, 4),
+        }
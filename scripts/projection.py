@@ -0,0 +1,155 @@
+import math
+
+import numpy as np
+
+from scripts.sample_params import CARD_POSITION, card_base_rotation
+
+# Cards of a multi-card frame: spread around CARD_POSITION (meters), each card this much above the previous one
+# so overlapping cards don't z-fight, tilted around x / y and turned around z by up to these angles
+CARD_SPREAD = (0.06, 0.06)
+CARD_LAYER_HEIGHT = 0.0004
+CARD_SPREAD_ROTATION = tuple(map(math.radians, (4, 5, 20)))
+CANDIDATES = 32
+
+
+def euler_xyz_matrices(rotations):
+    """Rotation matrices (n, 3, 3) of Blender XYZ Euler angles (n, 3), i.e. Rz @ Ry @ Rx."""
+    cx, cy, cz = np.cos(rotations).T
+    sx, sy, sz = np.sin(rotations).T
+
+    return np.stack([
+        np.stack([cy * cz, sx * sy * cz - cx * sz, cx * sy * cz + sx * sz], axis=-1),
+        np.stack([cy * sz, sx * sy * sz + cx * cz, cx * sy * sz - sx * cz], axis=-1),
+        np.stack([-sy, sx * cy, cx * cy], axis=-1),
+    ], axis=1)
+
+
+def project_points(points, params, geometry):
+    """
+    Pixel coordinates x, y (n, k each, top-left origin) of card-local points (k, 3) of every card in params
+    (card_location / card_rotation / camera_location / camera_rotation, one row per card) as the camera sees them.
+
+    Same model as Blender's perspective camera: looks down its local -Z with +Y up, the sensor spans the
+    width or height as given by sensor_fit, shift is in units of the larger image side.
+    """
+    width, height = geometry["resolution"]
+
+    world = np.einsum("nij,kj->nki", euler_xyz_matrices(params["card_rotation"]), points)
+    world += params["card_location"][:, None, :]
+
+    relative = world - params["camera_location"][:, None, :]
+    # Camera space is the inverse (transposed) camera rotation applied to the offset from the camera
+    camera = np.einsum("nji,nkj->nki", euler_xyz_matrices(params["camera_rotation"]), relative)
+    depth = -camera[..., 2]
+
+    sensor_fit = geometry["sensor_fit"]
+    if sensor_fit == "AUTO":
+        sensor_fit, sensor = ("HORIZONTAL" if width >= height else "VERTICAL"), geometry["sensor_width"]
+    elif sensor_fit == "HORIZONTAL":
+        sensor = geometry["sensor_width"]
+    else:
+        sensor = geometry["sensor_height"]
+
+    focal = geometry["lens"] / sensor * (width if sensor_fit == "HORIZONTAL" else height)
+    side = max(width, height)
+    shift_x, shift_y = geometry["shift"]
+
+    x = width / 2.0 + shift_x * side + focal * camera[..., 0] / depth
+    y = height / 2.0 - shift_y * side - focal * camera[..., 1] / depth
+    return x, y
+
+
+def project_card_boxes(params, geometry):
+    """
+    Pixel boxes (x_min, y_min, x_max, y_max, top-left origin) of the card's bounding box corners as the camera
+    sees them, clipped to the frame, and whether each box had to be clipped.
+    """
+    width, height = geometry["resolution"]
+    low, high = geometry["card_bound_box"]
+    corners = np.array([[x, y, z] for x in (low[0], high[0]) for y in (low[1], high[1]) for z in (low[2], high[2])])
+
+    x, y = project_points(corners, params, geometry)
+
+    boxes = np.stack([x.min(axis=1), y.min(axis=1), x.max(axis=1), y.max(axis=1)], axis=1)
+    clipped = (boxes[:, 0] < 0) | (boxes[:, 1] < 0) | (boxes[:, 2] > width) | (boxes[:, 3] > height)
+    boxes[:, [0, 2]] = np.clip(boxes[:, [0, 2]], 0, width)
+    boxes[:, [1, 3]] = np.clip(boxes[:, [1, 3]], 0, height)
+
+    return boxes, clipped
+
+
+def card_face_corners(params, geometry):
+    """
+    Pixel corners (n, 4, 2) of the top face of every card: the card image's top-left, top-right, bottom-right and
+    bottom-left corner, as the card mesh maps its texture.
+    """
+    low, high = geometry["card_bound_box"]
+    face = np.array([[low[0], high[1], high[2]], [high[0], high[1], high[2]], [high[0], low[1], high[2]],
+                     [low[0], low[1], high[2]]])
+
+    x, y = project_points(face, params, geometry)
+    return np.stack([x, y], axis=-1)
+
+
+def projectable(geometry):
+    """Whether project_card_boxes reproduces what Blender renders for a scene geometry (see scene_geometry)."""
+    return (geometry["camera_type"] == "PERSP" and list(geometry["rotation_modes"]) == ["XYZ", "XYZ"]
+            and not geometry["parented"] and list(geometry["pixel_aspect"]) == [1.0, 1.0])
+
+
+def box_iou(a, b):
+    """Intersection over union of every box of a (n, 4) with every box of b (m, 4), as an (n, m) array."""
+    x0 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y0 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x1 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y1 = np.minimum(a[:, None, 3], b[None, :, 3])
+    intersection = np.clip(x1 - x0, 0, None) * np.clip(y1 - y0, 0, None)
+
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-12), 0.0)
+
+
+def place_cards(object_classes, geometry, camera_location, camera_rotation, rng, max_overlap=0.2,
+                candidates=CANDIDATES):
+    """
+    Spreads one card per class over the table, each a layer above the one before. `candidates` random placements
+    per card are projected in a single pass; every card takes the first of its candidates that stays in frame and
+    overlaps (IoU) each card placed before it by at most max_overlap, or else the least overlapping one.
+
+    rng is a numpy Generator. Returns the locations (n, 3), rotations (n, 3) and pixel boxes (n, 4) of the cards,
+    boxes None when the geometry can't be projected here (the placements then ignore max_overlap).
+    """
+    n = len(object_classes)
+    count = n * candidates
+
+    locations = np.column_stack([
+        CARD_POSITION[0] + rng.uniform(-CARD_SPREAD[0], CARD_SPREAD[0], count),
+        CARD_POSITION[1] + rng.uniform(-CARD_SPREAD[1], CARD_SPREAD[1], count),
+        np.repeat(CARD_POSITION[2] + CARD_LAYER_HEIGHT * np.arange(n), candidates),
+    ])
+    rotations = np.repeat([card_base_rotation(object_class) for object_class in object_classes], candidates, axis=0)
+    rotations += np.column_stack([rng.uniform(-limit, limit, count) for limit in CARD_SPREAD_ROTATION])
+
+    if not projectable(geometry):
+        chosen = np.arange(n) * candidates
+        return locations[chosen], rotations[chosen], None
+
+    boxes, clipped = project_card_boxes({
+        "card_location": locations,
+        "card_rotation": rotations,
+        "camera_location": np.tile(np.asarray(camera_location, dtype=np.float64), (count, 1)),
+        "camera_rotation": np.tile(np.asarray(camera_rotation, dtype=np.float64), (count, 1)),
+    }, geometry)
+
+    chosen = []
+    for card in range(n):
+        rows = slice(card * candidates, (card + 1) * candidates)
+        overlap = box_iou(boxes[rows], boxes[chosen]).max(axis=1) if chosen else np.zeros(candidates)
+
+        fitting = np.flatnonzero((overlap <= max_overlap) & ~clipped[rows])
+        best = fitting[0] if len(fitting) else np.argmin(overlap + clipped[rows])
+        chosen.append(card * candidates + int(best))
+
+    return locations[chosen], rotations[chosen], boxes[chosen]
@@ -0,0 +1,122 @@
+import json
+import os
+import socket
+import threading
+import traceback
+
+_emit_lock = threading.Lock()
+
+# Socket to the orchestrator (see open_channel), messages go to stdout without one
+_channel = None
+_channel_reader = None
+
+
+def open_channel(channel):
+    """
+    Connects to the orchestrator's channel ({"port", "token"} on localhost, see orchestrator/channel.py).
+
+    From then on every message goes over the socket instead of stdout, so Blender's own output can go to a log
+    file. The orchestrator answers lease requests on the same socket, read them with channel_reader().
+    """
+    global _channel, _channel_reader
+
+    connection = socket.create_connection(("127.0.0.1", channel["port"]))
+    connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    _channel = connection.makefile("w", encoding="utf-8", newline="\n")
+    _channel_reader = connection.makefile("r", encoding="utf-8", newline="\n")
+    emit("HELLO", {"token": channel["token"], "pid": os.getpid()})
+
+
+def channel_reader():
+    return _channel_reader
+
+
+def emit(kind, value=""):
+    """
+    Sends a single protocol line that the orchestrator in run.py understands.
+
+    Plain values are sent as-is (e.g. PROGRESS:12), anything else is dumped as compact JSON.
+    """
+    if not isinstance(value, (str, int, float)):
+        value = json.dumps(value, separators=(",", ":"))
+
+    with _emit_lock:
+        if _channel is not None:
+            _channel.write(f"{kind}:{value}\n")
+            _channel.flush()
+        else:
+            print(f"{kind}:{value}", flush=True)
+
+
+def emit_error(error):
+    """Reports an exception that ends the worker, with its traceback, before it is raised further."""
+    emit("ERROR", {
+        "type": type(error).__name__,
+        "message": str(error),
+        "traceback": "".join(traceback.format_exception(type(error), error, error.__traceback__)),
+    })
+
+
+def emit_startup(stage, seconds):
+    """Reports how long one worker start-up stage took (conda_resolve, blend_load, dataset_open, first_render)."""
+    emit("STARTUP", {"stage": stage, "seconds": round(seconds, 4)})
+
+
+def parse_line(line):
+    """
+    Parses a worker output line.
+
+    Returns:
+        tuple: (kind, value) for protocol lines, None for any other output (Blender logs, prints, etc.).
+    """
+    line = line.strip()
+    kind, separator, value = line.partition(":")
+
+    if not separator or kind not in MESSAGE_PARSERS:
+        return None
+
+    try:
+        return kind, MESSAGE_PARSERS[kind](value)
+    except ValueError:
+        return None
+
+
+def _parse_int(value):
+    return int(float(value))
+
+
+def _parse_text(value):
+    return value
+
+
+def _parse_json(value):
+    # A library printing something that happens to start with a message kind must not reach the handlers
+    parsed = json.loads(value)
+    if not isinstance(parsed, dict):
+        raise ValueError(f"Expected a JSON object, got {value!r}")
+    return parsed
+
+
+MESSAGE_PARSERS = {
+    "PROGRESS": _parse_int,
+    "LEASE_REQUEST": _parse_text,
+    "LEASE_DONE": _parse_int,
+    "MEMORY": _parse_json,
+    "STARTUP": _parse_json,
+    "PREFETCH": _parse_json,
+    "CACHE": _parse_json,
+    "OUTPUT": _parse_json,
+    "TIMING": _parse_json,
+    "HELLO": _parse_json,
+    "ERROR": _parse_json,
+    "SAMPLE": _parse_json,
+}
+
+
+def encode_lease(lease):
+    """Encodes a lease (or None, meaning 'stop') as the line written to the worker's stdin."""
+    if lease is None:
+        return json.dumps({"stop": True}) + "\n"
+
+    return json.dumps(lease) + "\n"
@@ -10,36 +10,61 @@ from lambdawalker.blender.randomize_light_properties import randomize_light_prop
 from lambdawalker.blender.spatial.randomize_position_and_rotation import randomize_position_and_rotation
 from lambdawalker.blender.spatial.randomize_position_in_donut import randomize_position_in_donut
 
+from scripts.sample_params import kelvin_to_rgb, pick
+from scripts.scene_cache import set_texture_image, set_world_image
 
-def randomize_environment(background_image_pil):
-    randomize_camera()
 
-    background_image_blender = randomize_light(background_image_pil)
-    bg_image_blender = randomize_table(background_image_pil)
+def randomize_environment(background_image_pil, scene_cache=None, background_image=None, params=None):
+    """
+    Randomizes camera, light and table. Returns the image datablocks created for this sample only, none when a
+    cached `background_image` datablock is given.
+
+    With `params` (see scripts/sample_params.py) every value comes from the sample's parameters instead of the
+    global random module, and the chosen table material name is added to them.
+    """
+    randomize_camera(params)
+
+    background_image_blender = randomize_light(background_image_pil, scene_cache, background_image, params)
+    bg_image_blender = randomize_table(background_image_pil, scene_cache, background_image, params)
+
+    if background_image is not None:
+        return []
 
     return [background_image_blender, bg_image_blender]
 
 
-def randomize_light(background_image_pil):
+def randomize_light(background_image_pil, scene_cache=None, background_image=None, params=None):
     light_name = "Light"
     light = bpy.data.objects.get(light_name)
 
-    intensity_range = (350, 800)  # Intensity range
-    temperature_range = (1000, 10000)  # Temperature range in Kelvin
+    if params is not None:
+        apply_light_params(light, params)
+    else:
+        intensity_range = (350, 800)  # Intensity range
+        temperature_range = (1000, 10000)  # Temperature range in Kelvin
 
-    randomize_light_properties(
-        light, intensity_range, temperature_range=temperature_range
-    )
+        randomize_light_properties(
+            light, intensity_range, temperature_range=temperature_range
+        )
+
+        position_range = ("2m", "2m", "1m")  # X, Y, Z ranges for position
+        point = ("0m", "0m", "3m")
+        rotation_range = (math.radians(15), math.radians(15), math.radians(15))  # X, Y, Z ranges for rotation in radians
+        randomize_position_and_rotation(light, position_range, rotation_range, point)
 
-    position_range = ("2m", "2m", "1m")  # X, Y, Z ranges for position
-    point = ("0m", "0m", "3m")
-    rotation_range = (math.radians(15), math.radians(15), math.radians(15))  # X, Y, Z ranges for rotation in radians
-    randomize_position_and_rotation(light, position_range, rotation_range, point)
+        pos_x, pos_y = randomize_position_in_donut(1.5, 3.5)
 
-    pos_x, pos_y = randomize_position_in_donut(1.5, 3.5)
+        light.location.x = pos_x
+        light.location.y = pos_y
 
-    light.location.x = pos_x
-    light.location.y = pos_y
+    if background_image is not None:
+        set_world_image("World", "env_light", background_image)
+        return background_image
+
+    if scene_cache is not None:
+        image = scene_cache.image("background").update(background_image_pil)
+        set_world_image("World", "env_light", image)
+        return image
 
     return assign_image_to_world_node(
         "World",
@@ -48,12 +73,32 @@ def randomize_light(background_image_pil):
     )
 
 
-def randomize_table(background_image_pil):
-    possible_materials = find_materials_by_regex(f"tbl.*")
-    material = random.choice(possible_materials)
+def randomize_table(background_image_pil, scene_cache=None, background_image=None, params=None):
+    if scene_cache is not None:
+        possible_materials = scene_cache.materials("tbl.*")
+    else:
+        possible_materials = find_materials_by_regex(f"tbl.*")
+
+    if params is not None:
+        material = pick(possible_materials, params["table_material"])
+        material_seed = params["table_material_seed"]
+        params["table_material_name"] = material.name
+    else:
+        material = random.choice(possible_materials)
+        material_seed = random.randint(0, 99999999999)
 
     set_material_to_mesh("floor", material)
-    randomize_material(material, random.randint(0, 99999999999))
+    randomize_material(material, material_seed)
+
+    if background_image is not None:
+        set_texture_image(material, "color_img", background_image)
+        return background_image
+
+    if scene_cache is not None:
+        # Shares the world light datablock, the background pixels are uploaded once per sample
+        image = scene_cache.image("background").update(background_image_pil)
+        set_texture_image(material, "color_img", image)
+        return image
 
     return assign_image_to_texture(
         material,
@@ -62,17 +107,26 @@ def randomize_table(background_image_pil):
     )
 
 
-def randomize_camera():
+def randomize_camera(params=None):
     object_name = "Camera"
     obj = bpy.data.objects.get(object_name)
 
+    if params is not None:
+        apply_transform(obj, params["camera_location"], params["camera_rotation"])
+        return
+
     position_range = ("1mm", "1mm", "30mm")
     point = ("0mm", "0mm", "260mm")
     rotation_range = (math.radians(1), math.radians(1), math.radians(1))  # X, Y, Z ranges for rotation in radians
     randomize_position_and_rotation(obj, position_range, rotation_range, point)
 
 
-def randomize_card_position_and_rotation(card_object, object_class="horizontal_card"):
+def randomize_card_position_and_rotation(card_object, object_class="horizontal_card", params=None):
+    if params is not None:
+        # The vertical base rotation is already part of params["card_rotation"]
+        apply_transform(card_object, params["card_location"], params["card_rotation"])
+        return
+
     position_range = ("5mm", "5mm", "2.5mm")
     base_position = ("0mm", "0mm", "6.5mm")
 
@@ -86,3 +140,21 @@ def randomize_card_position_and_rotation(card_object, object_class="horizontal_c
         base_position,
         base_rotation
     )
+
+
+def apply_transform(obj, location, rotation):
+    obj.location = location
+    obj.rotation_euler = rotation
+
+
+def apply_light_params(light, params):
+    light.data.energy = params["light_energy"]
+
+    # Newer Blender versions take the color temperature directly
+    if hasattr(light.data, "use_temperature"):
+        light.data.use_temperature = True
+        light.data.temperature = params["light_temperature"]
+    else:
+        light.data.color = kelvin_to_rgb(params["light_temperature"])
+
+    apply_transform(light, params["light_location"], params["light_rotation"])
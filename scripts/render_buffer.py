@@ -0,0 +1,70 @@
+import bpy
+import numpy as np
+
+VIEWER_NODE_NAME = "render_buffer_viewer"
+
+# View transforms whose display output is the plain sRGB curve applied to the linear render
+SUPPORTED_VIEW_TRANSFORMS = {"Standard", "Raw"}
+
+
+def render_to_array(scene):
+    """
+    Renders the scene and returns the result as a HxWx3 uint8 array, without writing or reading any file.
+
+    The pixels are taken from a Viewer node fed by the Render Layers node. Returns None (without rendering) when
+    the scene's view transform can't be reproduced here (e.g. AgX or Filmic), so the caller can fall back to
+    render_scene and the file on disk.
+    """
+    view_settings = scene.view_settings
+    if view_settings.view_transform not in SUPPORTED_VIEW_TRANSFORMS or view_settings.use_curve_mapping:
+        return None
+
+    _ensure_viewer_node(scene)
+    bpy.ops.render.render(write_still=False)
+
+    viewer = bpy.data.images["Viewer Node"]
+    width, height = viewer.size
+
+    pixels = np.empty(width * height * 4, dtype=np.float32)
+    viewer.pixels.foreach_get(pixels)
+    rgb = pixels.reshape(height, width, 4)[::-1, :, :3]
+
+    rgb = rgb * (2.0 ** view_settings.exposure)
+    if view_settings.view_transform == "Standard":
+        rgb = _linear_to_srgb(rgb)
+    if view_settings.gamma != 1.0:
+        rgb = np.power(np.clip(rgb, 0.0, 1.0), 1.0 / view_settings.gamma)
+
+    return (np.clip(rgb, 0.0, 1.0) * 255.0 + 0.5).astype(np.uint8)
+
+
+def _linear_to_srgb(rgb):
+    rgb = np.clip(rgb, 0.0, None)
+    return np.where(rgb <= 0.0031308, rgb * 12.92, 1.055 * np.power(rgb, 1.0 / 2.4) - 0.055)
+
+
+def _compositor_tree(scene):
+    # Blender 5 keeps the compositor in a node group, earlier versions in scene.node_tree
+    if hasattr(scene, "compositing_node_group"):
+        if scene.compositing_node_group is None:
+            scene.compositing_node_group = bpy.data.node_groups.new("Compositor", "CompositorNodeTree")
+        return scene.compositing_node_group
+
+    scene.use_nodes = True
+    return scene.node_tree
+
+
+def _ensure_viewer_node(scene):
+    scene.render.use_compositing = True
+    tree = _compositor_tree(scene)
+
+    if VIEWER_NODE_NAME in tree.nodes:
+        return
+
+    render_layers = next((node for node in tree.nodes if node.bl_idname == "CompositorNodeRLayers"), None)
+    if render_layers is None:
+        render_layers = tree.nodes.new("CompositorNodeRLayers")
+
+    viewer = tree.nodes.new("CompositorNodeViewer")
+    viewer.name = VIEWER_NODE_NAME
+    tree.links.new(render_layers.outputs["Image"], viewer.inputs["Image"])
@@ -0,0 +1,82 @@
+"""
+Named render settings, applied to the scene before the first sample instead of relying on what is saved in the
+.blend file. A job picks one with the worker option render_profile: a name of PROFILES, or a dict of settings
+(optionally {"base": name, ...} to override some settings of a named profile).
+"""
+
+PROFILES = {
+    "draft": {
+        "engine": "EEVEE",
+        "samples": 16,
+        "denoise": False,
+        "resolution_percentage": 50,
+        "quality": 85,
+    },
+    "train": {
+        "engine": "CYCLES",
+        "samples": 64,
+        "adaptive_threshold": 0.05,
+        "denoise": True,
+        "resolution_percentage": 100,
+        "tile_size": 2048,
+        "quality": 90,
+    },
+    "hq": {
+        "engine": "CYCLES",
+        "samples": 256,
+        "adaptive_threshold": 0.01,
+        "denoise": True,
+        "resolution_percentage": 100,
+        "tile_size": 2048,
+        "quality": 95,
+    },
+}
+
+# Eevee is BLENDER_EEVEE_NEXT in Blender 4.2 - 4.4 and BLENDER_EEVEE before and after
+ENGINE_IDS = {"EEVEE": ("BLENDER_EEVEE_NEXT", "BLENDER_EEVEE"), "CYCLES": ("CYCLES",)}
+
+
+def resolve_profile(spec):
+    """The settings of a render_profile worker option, None to keep the .blend file's settings."""
+    if spec is None:
+        return None
+
+    if isinstance(spec, str):
+        if spec not in PROFILES:
+            raise ValueError(f"Unknown render profile {spec!r}, expected one of {', '.join(PROFILES)}")
+        return dict(PROFILES[spec])
+
+    settings = dict(spec)
+    base = settings.pop("base", None)
+    return {**resolve_profile(base), **settings} if base is not None else settings
+
+
+def apply_render_profile(scene, profile):
+    """Sets the render settings of the profile on the scene; settings the profile doesn't name are left as they are."""
+    render = scene.render
+
+    if "engine" in profile:
+        available = render.bl_rna.properties["engine"].enum_items.keys()
+        render.engine = next(engine for engine in ENGINE_IDS[profile["engine"]] if engine in available)
+
+    if "resolution_percentage" in profile:
+        render.resolution_percentage = profile["resolution_percentage"]
+    if "quality" in profile:
+        render.image_settings.quality = profile["quality"]
+
+    if render.engine == "CYCLES":
+        cycles = scene.cycles
+        cycles.device = "CPU"
+
+        if "samples" in profile:
+            cycles.samples = profile["samples"]
+        if "adaptive_threshold" in profile:
+            cycles.use_adaptive_sampling = True
+            cycles.adaptive_threshold = profile["adaptive_threshold"]
+        if "denoise" in profile:
+            cycles.use_denoising = profile["denoise"]
+        if "tile_size" in profile and hasattr(cycles, "tile_size"):
+            cycles.use_auto_tile = True
+            cycles.tile_size = profile["tile_size"]
+    elif "samples" in profile:
+        scene.eevee.taa_render_samples = profile["samples"]
@@ -0,0 +1,117 @@
+import random
+from types import SimpleNamespace
+
+from scripts.timing import NULL_TIMER
+
+# Backgrounds a salted sample moves ahead per salt, prime so repeated salts don't cycle through few backgrounds
+BACKGROUND_SALT_STRIDE = 7919
+
+
+def load_sample_inputs(global_index, id_ds, photo_id_ds, background_ds, cache=None, timer=NULL_TIMER, extra_cards=0,
+                       salt=0):
+    """
+    Reads and decodes everything a sample needs from the datasets; no bpy involved, so it can run on the
+    prefetch thread.
+
+    With a ByteLRUCache the decoded photo and background images are shared between samples. Shared images must
+    not be closed or modified, so only the images listed in `owned` belong to the sample; images the cache did
+    not keep (larger than its budget) are among them.
+
+    Dataset reads and image decoding are timed as the dataset_read and decode stages of `timer`.
+
+    For a frame with several cards the records and images of `extra_cards` further cards (see extra_card_indices)
+    are loaded as well, into `cards`.
+
+    A salted sample (see scripts/seeding.py:read_salts) takes another background than its index gives.
+    """
+    with timer.stage("dataset_read"):
+        record = id_ds[global_index]
+    objects_info = record.objects[0]
+
+    id_card_image_pil, photo_image_pil, photo_cached = _prepare_card_images(
+        record, photo_id_ds, objects_info, cache, timer
+    )
+    background_index = global_index + salt * BACKGROUND_SALT_STRIDE
+    background_key = ("indoors", background_index % len(background_ds))
+    background_image_pil, background_cached = _setup_background(background_index, background_ds, cache, timer)
+
+    owned = [id_card_image_pil]
+    if not photo_cached:
+        owned.append(photo_image_pil)
+    if not background_cached:
+        owned.append(background_image_pil)
+
+    cards = []
+    for index in extra_card_indices(global_index, extra_cards, len(id_ds)):
+        with timer.stage("dataset_read"):
+            card_record = id_ds[index]
+        card_info = card_record.objects[0]
+
+        card_image_pil, card_photo_pil, card_photo_cached = _prepare_card_images(card_record, photo_id_ds, card_info,
+                                                                                 cache, timer)
+        owned.append(card_image_pil)
+        if not card_photo_cached:
+            owned.append(card_photo_pil)
+
+        cards.append(SimpleNamespace(index=index, objects_info=card_info, id_card_image=card_image_pil,
+                                     photo_image=card_photo_pil))
+
+    return SimpleNamespace(
+        record=record,
+        objects_info=objects_info,
+        id_card_image=id_card_image_pil,
+        photo_image=photo_image_pil,
+        background_image=background_image_pil,
+        background_key=background_key,
+        owned=owned,
+        cards=cards,
+    )
+
+
+def extra_card_indices(global_index, count, dataset_size):
+    """The records of the further cards of a sample, drawn from its index so a re-render shows the same cards."""
+    rng = random.Random(f"cards-{global_index}")
+    return [rng.randrange(dataset_size) for _ in range(count)]
+
+
+def _prepare_card_images(record, photo_id_ds, objects_info, cache=None, timer=NULL_TIMER):
+    """The card and photo images of a record, and whether the photo is held by the cache."""
+    with timer.stage("decode"):
+        id_card_image_pil = record.image.to_pil()
+    photo_id = objects_info["photo_id"]
+    rotate = objects_info["class"] == "vertical_card"
+
+    def load_photo():
+        with timer.stage("dataset_read"):
+            photo_record = photo_id_ds[photo_id]
+        with timer.stage("decode"):
+            photo_image_pil = photo_record.image.to_pil()
+            return photo_image_pil.rotate(-90, expand=1) if rotate else photo_image_pil
+
+    if cache is not None:
+        photo_image_pil, photo_cached = cache.get_or_load(("photo_id", photo_id, rotate), load_photo)
+    else:
+        photo_image_pil, photo_cached = load_photo(), False
+
+    if rotate:
+        with timer.stage("decode"):
+            id_card_image_pil = id_card_image_pil.rotate(-90, expand=1)
+
+    return id_card_image_pil, photo_image_pil, photo_cached
+
+
+def _setup_background(global_index, background_ds, cache=None, timer=NULL_TIMER):
+    """The background image of the sample, and whether it is held by the cache."""
+    mod_index = global_index % len(background_ds)
+    print(f"Using background {mod_index}")
+
+    def load_background():
+        with timer.stage("dataset_read"):
+            background_record = background_ds[mod_index]
+        with timer.stage("decode"):
+            return background_record.image.to_pil()
+
+    if cache is not None:
+        return cache.get_or_load(("indoors", mod_index), load_background)
+
+    return load_background(), False
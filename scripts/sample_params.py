@@ -0,0 +1,131 @@
+import json
+import math
+import os
+
+from scripts.seeding import uniform
+
+PARAMS_DIR = "params"
+
+# Scene ranges, in meters and radians. Every value is drawn uniformly in base ± range.
+CAMERA_POSITION = (0.0, 0.0, 0.26)
+CAMERA_POSITION_RANGE = (0.001, 0.001, 0.03)
+CAMERA_ROTATION_RANGE = (math.radians(1), math.radians(1), math.radians(1))
+
+CARD_POSITION = (0.0, 0.0, 0.0065)
+CARD_POSITION_RANGE = (0.005, 0.005, 0.0025)
+CARD_ROTATION_RANGE = tuple(map(math.radians, (4, 5, 1.5)))
+
+LIGHT_POSITION = (0.0, 0.0, 3.0)
+LIGHT_POSITION_RANGE = (2.0, 2.0, 1.0)
+LIGHT_ROTATION_RANGE = (math.radians(15), math.radians(15), math.radians(15))
+LIGHT_DONUT_RADIUS = (1.5, 3.5)
+LIGHT_INTENSITY = (350.0, 800.0)
+LIGHT_TEMPERATURE = (1000.0, 10000.0)
+
+MATERIAL_SEED_MAX = 99999999999
+
+# Which uniform field of the sample seed feeds which parameter. Append only: renumbering changes every dataset.
+FIELDS = {
+    "camera_location": (0, 1, 2),
+    "camera_rotation": (3, 4, 5),
+    "card_location": (6, 7, 8),
+    "card_rotation": (9, 10, 11),
+    "light_location": (12, 13, 14),
+    "light_rotation": (15, 16, 17),
+    "light_donut_radius": 18,
+    "light_donut_angle": 19,
+    "light_energy": 20,
+    "light_temperature": 21,
+    "card_material": 22,
+    "card_material_seed": 23,
+    "table_material": 24,
+    "table_material_seed": 25,
+}
+
+
+def card_base_rotation(object_class):
+    return 0.0, 0.0, math.radians(90) if object_class == "vertical_card" else 0.0
+
+
+def draw_scene_params(seed, object_class):
+    """
+    Every random scene parameter of a sample, drawn from its seed only (see scripts/seeding.py).
+
+    Material picks are kept as uniform numbers and only become a material in Blender (see `pick`), so the
+    parameters can be drawn without knowing the materials in the .blend file.
+    """
+
+    def around(base, ranges, fields):
+        return [b + (2.0 * uniform(seed, f) - 1.0) * r for b, r, f in zip(base, ranges, fields)]
+
+    def between(low_high, field):
+        low, high = low_high
+        return low + uniform(seed, field) * (high - low)
+
+    light_location = around(LIGHT_POSITION, LIGHT_POSITION_RANGE, FIELDS["light_location"])
+    radius = between(LIGHT_DONUT_RADIUS, FIELDS["light_donut_radius"])
+    angle = between((0.0, 2.0 * math.pi), FIELDS["light_donut_angle"])
+    light_location[0], light_location[1] = radius * math.cos(angle), radius * math.sin(angle)
+
+    return {
+        "seed": seed,
+        "camera_location": around(CAMERA_POSITION, CAMERA_POSITION_RANGE, FIELDS["camera_location"]),
+        "camera_rotation": around((0.0, 0.0, 0.0), CAMERA_ROTATION_RANGE, FIELDS["camera_rotation"]),
+        "card_location": around(CARD_POSITION, CARD_POSITION_RANGE, FIELDS["card_location"]),
+        "card_rotation": around(card_base_rotation(object_class), CARD_ROTATION_RANGE, FIELDS["card_rotation"]),
+        "light_location": light_location,
+        "light_rotation": around((0.0, 0.0, 0.0), LIGHT_ROTATION_RANGE, FIELDS["light_rotation"]),
+        "light_energy": between(LIGHT_INTENSITY, FIELDS["light_energy"]),
+        "light_temperature": between(LIGHT_TEMPERATURE, FIELDS["light_temperature"]),
+        "card_material": uniform(seed, FIELDS["card_material"]),
+        "card_material_seed": int(uniform(seed, FIELDS["card_material_seed"]) * MATERIAL_SEED_MAX),
+        "table_material": uniform(seed, FIELDS["table_material"]),
+        "table_material_seed": int(uniform(seed, FIELDS["table_material_seed"]) * MATERIAL_SEED_MAX),
+    }
+
+
+def pick(items, u):
+    """Turns a uniform number from the params into one of the items."""
+    return items[min(int(u * len(items)), len(items) - 1)]
+
+
+def kelvin_to_rgb(kelvin):
+    """Approximate blackbody color (0-1 RGB) of a color temperature, Tanner Helland's fit."""
+    t = kelvin / 100.0
+
+    if t <= 66:
+        red = 255.0
+        green = 99.4708025861 * math.log(t) - 161.1195681661
+        blue = 0.0 if t <= 19 else 138.5177312231 * math.log(t - 10) - 305.0447927307
+    else:
+        red = 329.698727446 * (t - 60) ** -0.1332047592
+        green = 288.1221695283 * (t - 60) ** -0.0755148492
+        blue = 255.0
+
+    return tuple(min(max(channel, 0.0), 255.0) / 255.0 for channel in (red, green, blue))
+
+
+def compact_value(value):
+    if isinstance(value, float):
+        return round(value, 6)
+    if isinstance(value, list):
+        return [compact_value(item) for item in value]
+    return value
+
+
+class ParamsWriter:
+    """Appends the parameters of every rendered sample to params/worker-<id>.jsonl, one compact line each."""
+
+    def __init__(self, root, worker_id):
+        directory = os.path.join(root, PARAMS_DIR)
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"worker-{worker_id}.jsonl")
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def record(self, bucket_name, index, params):
+        entry = {"bucket": bucket_name, "index": index, **{key: compact_value(value) for key, value in params.items()}}
+        self._file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
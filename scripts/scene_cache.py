@@ -0,0 +1,101 @@
+import bpy
+import numpy as np
+from lambdawalker.blender.find_materials import find_materials_by_regex
+
+
+class PersistentImage:
+    """
+    A bpy image datablock that is created once and gets new pixels for every sample.
+
+    Replacing the pixels avoids creating, freeing and purging a datablock per sample; the image is only resized
+    when the incoming picture has another size, and updating twice with the same picture uploads it once.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.image = None
+        self._source = None
+
+    def update(self, pil_image):
+        if pil_image is self._source:
+            return self.image
+
+        width, height = pil_image.size
+
+        if self.image is None:
+            self.image = bpy.data.images.new(self.name, width, height, alpha=True)
+            # Keeps the datablock out of orphans_purge while no material uses it
+            self.image.use_fake_user = True
+        elif tuple(self.image.size) != (width, height):
+            self.image.scale(width, height)
+
+        _set_pixels(self.image, pil_image)
+        self._source = pil_image
+
+        return self.image
+
+
+class SceneCache:
+    """
+    Per-worker state shared by every sample rendered with the batched render path: material lists resolved once
+    per regex (and per card subtype) and the persistent image datablocks.
+    """
+
+    def __init__(self):
+        self._materials = {}
+        self._card_materials = {}
+        self._images = {}
+
+    def materials(self, pattern):
+        if pattern not in self._materials:
+            self._materials[pattern] = find_materials_by_regex(pattern)
+
+        return self._materials[pattern]
+
+    def card_materials(self, subtype):
+        if subtype not in self._card_materials:
+            self._card_materials[subtype] = self.materials(f"{subtype}.*") + self.materials("df.*")
+
+        return self._card_materials[subtype]
+
+    def image(self, name):
+        if name not in self._images:
+            self._images[name] = PersistentImage(f"persistent_{name}")
+
+        return self._images[name]
+
+
+def _set_pixels(image, pil_image):
+    # Blender stores pixels bottom-up as flat float RGBA
+    pixels = np.asarray(pil_image.convert("RGBA"), dtype=np.float32)[::-1].ravel() / 255.0
+    image.pixels.foreach_set(pixels)
+    image.update()
+
+
+def image_from_pil(name, pil_image):
+    """Creates a datablock that outlives orphans_purge, used for images kept in a ByteLRUCache."""
+    width, height = pil_image.size
+    image = bpy.data.images.new(name, width, height, alpha=True)
+    image.use_fake_user = True
+    _set_pixels(image, pil_image)
+    return image
+
+
+def blender_image_nbytes(image):
+    width, height = image.size
+    return width * height * 4
+
+
+def free_blender_image(key, image):
+    """on_evict callback of the datablock cache, does what _cleanup_blender_resources does for per-sample images."""
+    image.use_fake_user = False
+    image.buffers_free()
+    bpy.data.images.remove(image, do_unlink=True)
+
+
+def set_texture_image(material, node_name, image):
+    material.node_tree.nodes[node_name].image = image
+
+
+def set_world_image(world_name, node_name, image):
+    bpy.data.worlds[world_name].node_tree.nodes[node_name].image = image
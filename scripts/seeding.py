@@ -0,0 +1,70 @@
+import hashlib
+import json
+import os
+
+MASK64 = (1 << 64) - 1
+GOLDEN_GAMMA = 0x9E3779B97F4A7C15
+
+SALTS_FILE = "salts.jsonl"
+
+
+def splitmix64(x):
+    x = (x + GOLDEN_GAMMA) & MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK64
+    return x ^ (x >> 31)
+
+
+def bucket_seed(dataset_name, bucket_name):
+    digest = hashlib.blake2b(f"{dataset_name}/{bucket_name}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def sample_seed(dataset_name, bucket_name, index, salt=0):
+    """
+    Seed of one sample, derived only from (dataset_name, bucket, index).
+
+    It is a counter-based hash, not a stream: any sample can be regenerated alone, a worker restart changes
+    nothing, and the same values can be computed vectorised for a whole bucket (see orchestrator/plan.py).
+    A salt (see read_salts) gives the sample another scene while every other sample keeps its own.
+    """
+    seed = splitmix64((bucket_seed(dataset_name, bucket_name) + index * GOLDEN_GAMMA) & MASK64)
+    return splitmix64((seed + salt * GOLDEN_GAMMA) & MASK64) if salt else seed
+
+
+def read_salts(root):
+    """(bucket, index) -> salt of the samples given a new scene, e.g. near-duplicates (see orchestrator/dedup.py)."""
+    salts = {}
+    path = os.path.join(root, SALTS_FILE)
+
+    if not os.path.exists(path):
+        return salts
+
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            salts[(entry["bucket"], entry["index"])] = entry["salt"]
+
+    return salts
+
+
+def add_salts(root, samples):
+    """Gives every (bucket, index) of samples its next salt; returns the new salts."""
+    salts = read_salts(root)
+    added = {}
+
+    with open(os.path.join(root, SALTS_FILE), "a", encoding="utf-8") as f:
+        for bucket_name, index in samples:
+            salt = salts.get((bucket_name, index), 0) + 1
+            added[(bucket_name, index)] = salt
+            f.write(json.dumps({"bucket": bucket_name, "index": index, "salt": salt}) + "\n")
+
+    return added
+
+
+def uniform(seed, field):
+    """The `field`-th uniform number in [0, 1) of a sample; every scene parameter reads its own field."""
+    return (splitmix64((seed + (field + 1) * GOLDEN_GAMMA) & MASK64) >> 11) * (1.0 / (1 << 53))
@@ -0,0 +1,146 @@
+import io
+import json
+import os
+import tarfile
+import time
+
+SHARDS_DIR = "shards"
+INDEX_DIR = "index"
+
+# Member suffix -> directory of the YOLO layout
+LAYOUT = {".jpg": "images", ".txt": "labels", ".vis.jpg": "vis"}
+
+
+class ShardWriter:
+    """
+    Streams samples into rolling tar shards, shards/<bucket>/<worker>-<number>.tar, WebDataset style: the members
+    of a sample share its index as key (<index>.jpg, <index>.txt, <index>.vis.jpg).
+
+    A shard is closed once it holds max_bytes and a line describing it is appended to
+    shards/index/<worker>.jsonl. Every sample is flushed whole, so a shard cut short by a crash still reads up to
+    its last complete sample; a new process never appends to an existing shard.
+    """
+
+    def __init__(self, root, worker_id, max_bytes=1024 ** 3):
+        self.directory = os.path.join(root, SHARDS_DIR)
+        self.worker_id = worker_id
+        self.max_bytes = max_bytes
+
+        os.makedirs(os.path.join(self.directory, INDEX_DIR), exist_ok=True)
+        self._index = open(os.path.join(self.directory, INDEX_DIR, f"{worker_id}.jsonl"), "a", encoding="utf-8")
+        self._shards = {}
+
+    def add(self, bucket_name, index, members):
+        """members: suffix -> bytes, e.g. {".jpg": image, ".txt": label}."""
+        shard = self._shards.get(bucket_name)
+        if shard is None:
+            shard = self._shards[bucket_name] = self._open(bucket_name)
+
+        for suffix, data in members.items():
+            info = tarfile.TarInfo(f"{index}{suffix}")
+            info.size = len(data)
+            info.mtime = int(time.time())
+            shard["tar"].addfile(info, io.BytesIO(data))
+
+        shard["tar"].fileobj.flush()
+        shard["keys"].append(index)
+
+        if shard["file"].tell() >= self.max_bytes:
+            self._close(bucket_name)
+
+    def _open(self, bucket_name):
+        directory = os.path.join(self.directory, bucket_name)
+        os.makedirs(directory, exist_ok=True)
+
+        number = 0
+        while os.path.exists(os.path.join(directory, f"{self.worker_id}-{number:05d}.tar")):
+            number += 1
+
+        path = os.path.join(directory, f"{self.worker_id}-{number:05d}.tar")
+        file = open(path, "wb")
+        return {"path": path, "file": file, "tar": tarfile.open(fileobj=file, mode="w"), "keys": []}
+
+    def _close(self, bucket_name):
+        shard = self._shards.pop(bucket_name)
+        shard["tar"].close()
+        size = shard["file"].tell()
+        shard["file"].close()
+
+        entry = {
+            "shard": os.path.relpath(shard["path"], self.directory).replace(os.sep, "/"),
+            "bucket": bucket_name,
+            "samples": len(shard["keys"]),
+            "bytes": size,
+            "keys": shard["keys"],
+        }
+        self._index.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        self._index.flush()
+
+    def close(self):
+        for bucket_name in list(self._shards):
+            self._close(bucket_name)
+        self._index.close()
+
+
+def read_shard_index(root):
+    """Every index line of every worker: shard path (relative to shards/), bucket, samples, bytes, keys."""
+    directory = os.path.join(root, SHARDS_DIR, INDEX_DIR)
+    entries = []
+
+    if not os.path.isdir(directory):
+        return entries
+
+    for entry in sorted(os.scandir(directory), key=lambda e: e.name):
+        with open(entry.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue
+
+    return entries
+
+
+def iter_shard(path):
+    """(member name, bytes) of a shard, stopping quietly at a sample cut short by a crash."""
+    with tarfile.open(path, mode="r") as tar:
+        try:
+            for member in tar:
+                if member.isfile():
+                    yield member.name, tar.extractfile(member).read()
+        except (tarfile.ReadError, EOFError):
+            return
+
+
+def expand_shards(root, bucket_names=None):
+    """
+    Writes the samples of every shard out as the YOLO directory layout (images/, labels/, vis/ per bucket).
+    Returns the number of files written.
+    """
+    directory = os.path.join(root, SHARDS_DIR)
+    written = 0
+
+    for bucket_name in sorted(os.listdir(directory)) if os.path.isdir(directory) else ():
+        bucket_dir = os.path.join(directory, bucket_name)
+        if bucket_name == INDEX_DIR or not os.path.isdir(bucket_dir):
+            continue
+        if bucket_names is not None and bucket_name not in bucket_names:
+            continue
+
+        for shard_name in sorted(os.listdir(bucket_dir)):
+            if not shard_name.endswith(".tar"):
+                continue
+
+            for name, data in iter_shard(os.path.join(bucket_dir, shard_name)):
+                key, _, suffix = name.partition(".")
+                layout_dir = LAYOUT.get("." + suffix)
+                if layout_dir is None:
+                    continue
+
+                target = os.path.join(root, layout_dir, bucket_name, key + (".txt" if suffix == "txt" else ".jpg"))
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with open(target, "wb") as f:
+                    f.write(data)
+                written += 1
+
+    return written
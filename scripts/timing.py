@@ -0,0 +1,69 @@
+import time
+from contextlib import contextmanager, nullcontext
+
+# Stages in pipeline order, the orchestrator reports them in this order
+STAGES = ("dataset_read", "decode", "material", "scene", "render", "bbox", "cleanup", "image_write", "label_write",
+          "vis_write", "shard_write", "total")
+
+
+class StageTimer:
+    """
+    Seconds spent per stage of one sample, reported as a TIMING line once the sample is finished.
+
+    Stages may run on other threads (prefetch, writer); each adds to its own entry, so a stage that runs twice
+    for a sample is summed.
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.seconds = {}
+
+    @contextmanager
+    def stage(self, name):
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started_at)
+
+    def add(self, name, seconds):
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+
+    def wrap(self, name, function):
+        """`function` timed as stage `name`, e.g. for a task submitted to the writer thread."""
+
+        def timed(*args, **kwargs):
+            with self.stage(name):
+                return function(*args, **kwargs)
+
+        return timed
+
+    def report(self):
+        return {name: round(seconds, 6) for name, seconds in self.seconds.items()}
+
+
+class _NullTimer:
+    """Stand-in when timing is off: no clock reads, no allocation per stage."""
+
+    enabled = False
+    _context = nullcontext()
+
+    def stage(self, name):
+        return self._context
+
+    def add(self, name, seconds):
+        pass
+
+    def wrap(self, name, function):
+        return function
+
+    def report(self):
+        return {}
+
+
+NULL_TIMER = _NullTimer()
+
+
+def new_timer(enabled):
+    return StageTimer() if enabled else NULL_TIMER
@@ -0,0 +1,121 @@
+import json
+import sys
+from types import SimpleNamespace
+
+from scripts.protocol import channel_reader, emit
+from scripts.timing import new_timer
+from scripts.writer import InlineWriter
+
+
+def bucket_samples(bucket, lease_id=None, timing=False):
+    start = bucket.get('start', 0)
+    end = start + bucket['size']
+    bucket_name = bucket['name']
+
+    for i in range(start, end):
+        yield SimpleNamespace(
+            bucket_name=bucket_name,
+            index=i,
+            lease_id=lease_id,
+            last_in_lease=lease_id is not None and i == end - 1,
+            timer=new_timer(timing),
+        )
+
+
+def progress_generator(buckets, timing=False):
+    """
+    Generator that yields progress information for each item across all buckets.
+
+    Yields:
+        SimpleNamespace: Contains 'bucket_name', 'index', 'local_count' and the sample's stage 'timer'
+    """
+    local_count = 0
+
+    for bucket in buckets:
+        for sample in bucket_samples(bucket, timing=timing):
+            sample.local_count = local_count
+            yield sample
+            local_count += 1
+
+
+def lease_generator(stream, timing=False):
+    """
+    Generator that pulls leases from the orchestrator and yields every sample in them.
+
+    A lease is a JSON line like {"id": 3, "name": "train", "start": 48, "size": 16}. The worker asks for the
+    next one with a LEASE_REQUEST line and stops on {"stop": true} or when the stream (the channel socket or
+    stdin) is closed.
+    """
+    local_count = 0
+
+    while True:
+        emit("LEASE_REQUEST")
+        line = stream.readline()
+
+        if not line:
+            return
+
+        lease = json.loads(line)
+        if lease.get("stop"):
+            return
+
+        for sample in bucket_samples(lease, lease_id=lease["id"], timing=timing):
+            sample.local_count = local_count
+            yield sample
+            local_count += 1
+
+
+def samples_for_job(buckets, lease_mode=None, timing=False):
+    """Samples of the job; with timing every sample carries a StageTimer, reported as TIMING when it is done."""
+    if lease_mode == "channel":
+        return lease_generator(channel_reader(), timing)
+
+    if lease_mode == "stdin":
+        return lease_generator(sys.stdin, timing)
+
+    return progress_generator(buckets, timing)
+
+
+def run_samples(samples, render_sample, manifest=None, memory_stats=None, writer=None):
+    """
+    Renders every sample and reports PROGRESS (and LEASE_DONE when a lease is finished) to the orchestrator.
+
+    render_sample may return the written outputs as a dict (image/label/vis -> bool) for the manifest.
+    memory_stats is an optional callable whose dict (e.g. rss, images) is reported as MEMORY after every sample,
+    so the orchestrator can recycle the worker based on memory instead of a fixed sample count.
+
+    With an AsyncWriter the manifest record and the reports go through the writer too, after the label and
+    visualisation tasks render_sample submitted, so a sample only counts as done once its files are written.
+    """
+    writer = writer or InlineWriter()
+    completed = 0
+
+    for sample in samples:
+        # Tells the orchestrator which sample to blame if the process dies now
+        emit("SAMPLE", {"bucket": sample.bucket_name, "index": sample.index})
+        with sample.timer.stage("total"):
+            outputs = render_sample(sample)
+        completed += 1
+        writer.submit(_finish_sample, sample, completed, outputs, manifest, memory_stats and memory_stats())
+
+    writer.flush()
+    return completed
+
+
+def _finish_sample(sample, completed, outputs, manifest, memory):
+    if manifest is not None:
+        manifest.record(sample.bucket_name, sample.index, **(outputs or {}))
+
+    emit("PROGRESS", completed)
+
+    if sample.timer.enabled:
+        emit("TIMING", sample.timer.report())
+
+    if memory is not None:
+        emit("MEMORY", memory)
+
+    if sample.last_in_lease:
+        # Records held back (e.g. until a batch of labels is written) are written before the lease counts as done
+        if manifest is not None:
+            manifest.flush()
+        emit("LEASE_DONE", sample.lease_id)
@@ -0,0 +1,67 @@
+import queue
+import threading
+
+
+class InlineWriter:
+    """Runs post-render work right away on the calling thread. Same interface as AsyncWriter."""
+
+    def submit(self, fn, *args, **kwargs):
+        fn(*args, **kwargs)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class AsyncWriter:
+    """
+    Runs post-render work (YOLO labels, visualisations, manifest records) on a background thread.
+
+    Tasks run in submission order. The queue is bounded: submit() blocks while max_pending tasks are waiting, so a
+    slow disk slows the renderer down instead of growing memory. flush() waits for every submitted task and
+    re-raises the first error a task hit; close() flushes and stops the thread.
+    """
+
+    def __init__(self, max_pending=16):
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="post-render-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, *args, **kwargs):
+        self._raise_error()
+        self._queue.put((fn, args, kwargs))
+
+    def flush(self):
+        self._queue.join()
+        self._raise_error()
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._queue.put(None)
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            task = self._queue.get()
+
+            try:
+                if task is None:
+                    return
+
+                fn, args, kwargs = task
+                if self._error is None:
+                    fn(*args, **kwargs)
+            except BaseException as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
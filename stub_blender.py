@@ -0,0 +1,144 @@
+"""
+Stand-in for the Blender executable, used to exercise run.py without Blender.
+
+It accepts the same command line that run.py builds for Blender
+(<blend_file> --background --python <script> -- <json>) and runs the same job as scripts/main.py
+(scripts/job.py), but "renders" by sleeping and reads no dataset. Usage:
+
+    python run.py --blender "python stub_blender.py" --scheduler queue
+
+Environment:
+    STUB_RENDER_SECONDS: seconds per sample (default 0.01)
+    STUB_SLOW_WORKERS: comma separated worker ids that render 5x slower, to see the queue balance the load
+    STUB_FAIL_AT: sample index whose render raises, to see the crash report
+
+Every sample is written like a rendered one (image, label, manifest, annotations or shards), its image a tiny
+placeholder JPEG. With a render_profile the render time scales with its pixels and samples and a fake image of
+matching size is written instead, for `run.py --benchmark`.
+
+Every sample is "loaded" in half the render time, on the prefetch thread with --prefetch.
+
+With the worker option renderer="numpy" (`run.py --renderer numpy`) it runs the real job of scripts/job.py
+instead, with the datasets, and renders every sample with the NumPy backend (scripts/numpy_renderer.py);
+renderer="numpy-fast" runs it without drawing, writing a constant placeholder image.
+"""
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from scripts.job import run_job  # noqa: E402
+from scripts.memory import current_rss  # noqa: E402
+from scripts.numpy_renderer import PLACEHOLDER_SIZE, NumpyRenderer  # noqa: E402
+from scripts.outputs import jpeg_bytes, submit_outputs  # noqa: E402
+from scripts.plan import DEFAULT_GEOMETRY  # noqa: E402
+from scripts.projection import place_cards  # noqa: E402
+from scripts.protocol import emit_error, emit_startup, open_channel  # noqa: E402
+from scripts.render_profiles import resolve_profile  # noqa: E402
+
+CARD_CLASSES = ["horizontal_card", "vertical_card", "horizontal_card_back"]
+
+
+def get_json_args():
+    try:
+        idx = sys.argv.index("--")
+        return json.loads(sys.argv[idx + 1])
+    except (ValueError, IndexError):
+        return {}
+
+
+class StubRenderer:
+    """Renderer of scripts/job.py that sleeps instead of rendering, with `load` as the job's dataset reads."""
+
+    def __init__(self, render_profile=None, worker_id=None, cards_per_image=1):
+        self.seconds = float(os.environ.get("STUB_RENDER_SECONDS", "0.01"))
+        slow_workers = {w.strip() for w in os.environ.get("STUB_SLOW_WORKERS", "").split(",") if w.strip()}
+        self.fail_at = int(os.environ.get("STUB_FAIL_AT", "-1"))
+        self.card_classes = (CARD_CLASSES * cards_per_image)[:cards_per_image]
+
+        if str(worker_id) in slow_workers:
+            self.seconds *= 5
+
+        profile = resolve_profile(render_profile)
+        self.quality = 90
+        self.image = jpeg_bytes(Image.new("RGB", (PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), (128, 128, 128)), 90)
+        if profile is not None:
+            scale = (profile.get("resolution_percentage", 100) / 100.0) ** 2
+            self.seconds *= scale * profile.get("samples", 64) / 64.0
+            self.quality = profile.get("quality", 90)
+            self.image = b"\0" * int(scale * self.quality * 2000)
+
+    def load(self, progress_info):
+        with progress_info.timer.stage("dataset_read"):
+            time.sleep(self.seconds / 2)
+
+        cards = [SimpleNamespace(index=progress_info.index, objects_info={"class": card_class})
+                 for card_class in self.card_classes[1:]]
+        return SimpleNamespace(objects_info={"class": self.card_classes[0]}, cards=cards, owned=[])
+
+    def geometry(self):
+        return DEFAULT_GEOMETRY
+
+    def render(self, progress_info, inputs, params, job):
+        print(f"Rendering {progress_info.bucket_name}:{progress_info.index}")
+        if progress_info.index == self.fail_at:
+            raise RuntimeError(f"Stub failure at sample {self.fail_at}")
+
+        with progress_info.timer.stage("render"):
+            time.sleep(self.seconds)
+
+        card_classes = [inputs.objects_info["class"]] + [card.objects_info["class"] for card in inputs.cards]
+        if params is not None and "box" in params and len(card_classes) == 1:
+            boxes = [params["box"]]
+        else:
+            _, _, boxes = place_cards(card_classes, DEFAULT_GEOMETRY, (0.0, 0.0, 0.26), (0.0, 0.0, 0.0),
+                                      np.random.default_rng(progress_info.index), job.max_card_overlap)
+            boxes = boxes.tolist()
+
+        width, height = DEFAULT_GEOMETRY["resolution"]
+        bounding_box_data = [{"class": card_class, "boundingBox": box} for card_class, box in zip(card_classes, boxes)]
+
+        return submit_outputs(job.writer, progress_info.timer, job.root, progress_info.bucket_name,
+                              progress_info.index, self.image, width, height, bounding_box_data, job.classes, True,
+                              False, self.quality, job.shards, job.annotations, params, job.labels)
+
+    def memory_stats(self):
+        return {"rss": current_rss(), "images": 0}
+
+    def caches(self):
+        return {}
+
+    def close(self):
+        pass
+
+
+def main(wd, dataset_name, buckets=(), classes=None, worker_id=None, launched_at=None, channel=None,
+         render_profile=None, cards_per_image=1, renderer=None, **kwargs):
+    if channel is not None:
+        open_channel(channel)
+
+    if launched_at is not None:
+        emit_startup("blend_load", time.time() - launched_at)
+
+    if renderer in ("numpy", "numpy-fast"):
+        run_job(NumpyRenderer(render_profile, fast=renderer == "numpy-fast"), wd, list(buckets), dataset_name,
+                classes, worker_id=worker_id, cards_per_image=cards_per_image, **kwargs)
+        return
+
+    stub = StubRenderer(render_profile, worker_id, cards_per_image)
+    run_job(stub, wd, list(buckets), dataset_name, classes, worker_id=worker_id, cards_per_image=cards_per_image,
+            load=stub.load, **kwargs)
+
+
+if __name__ == "__main__":
+    try:
+        main(**get_json_args())
+    except Exception as e:
+        emit_error(e)
+        raise
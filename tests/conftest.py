@@ -0,0 +1,49 @@
+import json
+import os
+import sys
+from collections import Counter
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The Blender stand-in, renders every sample by sleeping (see stub_blender.py)
+STUB_COMMAND = [sys.executable, os.path.join(ROOT, "stub_blender.py")]
+
+DATASET_NAME = "StubDataset"
+CLASSES = {"horizontal_card": 0, "vertical_card": 1, "horizontal_card_back": 2}
+
+
+@pytest.fixture
+def stub_env(monkeypatch):
+    monkeypatch.setenv("STUB_RENDER_SECONDS", "0.002")
+    monkeypatch.delenv("STUB_FAIL_AT", raising=False)
+    monkeypatch.delenv("STUB_SLOW_WORKERS", raising=False)
+
+
+def stub_job(wd, buckets=()):
+    return {"wd": str(wd), "buckets": list(buckets), "dataset_name": DATASET_NAME, "classes": CLASSES,
+            "annotations": False}
+
+
+def output_root(wd):
+    return os.path.join(str(wd), "output", DATASET_NAME)
+
+
+def manifest_counts(root):
+    """How often every (bucket, index) was recorded over all manifest segments."""
+    counts = Counter()
+    directory = os.path.join(root, "manifest")
+
+    for name in os.listdir(directory):
+        with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                counts[(record["bucket"], record["index"])] += 1
+
+    return counts
+
+
+def read_events(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
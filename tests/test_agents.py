@@ -0,0 +1,53 @@
+"""
+The coordinator and render agents of a multi-machine run, over HTTP on localhost with stub workers.
+"""
+import socket
+import threading
+
+import run
+from orchestrator.agent import CoordinatorClient
+from orchestrator.coordinator import Coordinator, serve
+from orchestrator.leases import LeaseQueue
+from tests.conftest import CLASSES, DATASET_NAME, STUB_COMMAND, manifest_counts, output_root
+
+
+class EventList:
+    def __init__(self):
+        self.events = []
+
+    def log(self, event, **fields):
+        self.events.append(dict(fields, event=event))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_leases_of_a_killed_agent_are_requeued_to_another(tmp_path, stub_env, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    leases = LeaseQueue([{"name": "train", "size": 30}], lease_size=5)
+    events = EventList()
+    coordinator = Coordinator(leases, {"dataset_name": DATASET_NAME, "classes": CLASSES, "annotations": False},
+                              lease_timeout=1.0, events=events)
+
+    port = free_port()
+    server = threading.Thread(target=serve, args=(coordinator, "127.0.0.1", port, 0.5), daemon=True)
+    server.start()
+    url = f"http://127.0.0.1:{port}"
+
+    # The killed agent took two leases and is never heard of again
+    lost = [CoordinatorClient(url, "killed").post("/lease", wait=False)["lease"] for _ in range(2)]
+
+    run.run_agent(url, instances=2, blender_path=STUB_COMMAND, agent_id="survivor", heartbeat_interval=0.2)
+    server.join(timeout=30)
+
+    expired = [event["lease"]["id"] for event in events.events if event["event"] == "lease_expired"]
+    assert sorted(expired) == sorted(lease["id"] for lease in lost)
+    assert leases.finished and leases.completed == 30
+
+    counts = manifest_counts(output_root(tmp_path))
+    assert set(counts) == {("train", index) for index in range(30)}
+    assert set(counts.values()) == {1}
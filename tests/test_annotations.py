@@ -0,0 +1,106 @@
+"""
+Worker annotation segments (scripts/annotations.py) merged into metadata.jsonl and data.yaml
+(orchestrator/annotations.py:merge_annotations).
+"""
+import json
+import os
+
+import yaml
+
+from orchestrator.annotations import METADATA_FILE, merge_annotations
+from scripts.annotations import AnnotationWriter
+from tests.conftest import CLASSES
+
+
+def box(x0, y0, x1, y1, name="horizontal_card"):
+    return [{"class": name, "boundingBox": [x0, y0, x1, y1]}]
+
+
+def record(writer, bucket, index, boxes=None, params=None):
+    writer.record(bucket, index, 100, 80, boxes or box(10.0, 20.0, 50.0, 60.0), CLASSES, params)
+
+
+def read_rows(root, split):
+    with open(os.path.join(root, "images", split, METADATA_FILE), "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_only_records_appended_since_the_last_merge_are_merged(tmp_path):
+    root = str(tmp_path)
+    first, second = AnnotationWriter(root, "0"), AnnotationWriter(root, "1")
+    record(first, "train", 0)
+    record(second, "train", 1)
+    record(second, "val", 0)
+
+    assert merge_annotations(root, CLASSES) == 3
+    assert merge_annotations(root, CLASSES) == 0
+
+    record(first, "train", 2)
+    assert merge_annotations(root, CLASSES) == 1
+
+    first.close()
+    second.close()
+    assert [row["file_name"] for row in read_rows(root, "train")] == ["0.jpg", "1.jpg", "2.jpg"]
+    assert [row["file_name"] for row in read_rows(root, "val")] == ["0.jpg"]
+
+
+def test_a_line_still_being_written_is_merged_once_complete(tmp_path):
+    root = str(tmp_path)
+    writer = AnnotationWriter(root, "0")
+    record(writer, "train", 0)
+    writer.close()
+
+    with open(writer.path, "r", encoding="utf-8") as f:
+        line = f.read().replace('"index":0', '"index":1')
+    with open(writer.path, "a", encoding="utf-8") as f:
+        f.write(line[:20])
+
+    assert merge_annotations(root, CLASSES) == 1
+
+    with open(writer.path, "a", encoding="utf-8") as f:
+        f.write(line[20:])
+
+    assert merge_annotations(root, CLASSES) == 1
+    assert [row["file_name"] for row in read_rows(root, "train")] == ["0.jpg", "1.jpg"]
+
+
+def test_a_sample_rendered_again_replaces_its_row_in_place(tmp_path):
+    root = str(tmp_path)
+    writer = AnnotationWriter(root, "0")
+    for index in range(3):
+        record(writer, "train", index)
+    merge_annotations(root, CLASSES)
+
+    record(writer, "train", 1, box(0.0, 0.0, 20.0, 40.0, "vertical_card"), params={"seed": 7})
+    record(writer, "train", 3)
+    writer.close()
+    assert merge_annotations(root, CLASSES) == 2
+
+    rows = read_rows(root, "train")
+    assert [row["file_name"] for row in rows] == ["0.jpg", "1.jpg", "2.jpg", "3.jpg"]
+    assert rows[1]["objects"] == {"bbox": [[0.0, 0.0, 20.0, 40.0]], "yolo": [[0.1, 0.25, 0.2, 0.5]],
+                                  "category": [1], "class": ["vertical_card"]}
+    assert rows[1]["params"] == {"seed": 7}
+    assert rows[0]["objects"]["bbox"] == [[10.0, 20.0, 40.0, 40.0]]
+
+
+def test_data_yaml_lists_the_merged_splits_and_class_names_by_id(tmp_path):
+    root = str(tmp_path)
+    writer = AnnotationWriter(root, "0")
+    record(writer, "val", 0)
+    record(writer, "train", 0)
+    writer.close()
+    os.makedirs(os.path.join(root, "images", "test"))
+
+    merge_annotations(root, CLASSES)
+
+    with open(os.path.join(root, "data.yaml"), "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f)
+
+    assert data == {"path": os.path.abspath(root), "train": "images/train", "val": "images/val",
+                    "names": {0: "horizontal_card", 1: "vertical_card", 2: "horizontal_card_back"}}
+
+
+def test_nothing_to_merge_without_annotation_segments(tmp_path):
+    assert merge_annotations(str(tmp_path), CLASSES) == 0
+    assert not os.path.exists(os.path.join(str(tmp_path), "data.yaml"))
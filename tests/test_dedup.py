@@ -0,0 +1,74 @@
+"""
+The near-duplicate search of orchestrator/dedup.py on hand-made hash files.
+"""
+import json
+import os
+import random
+
+import numpy as np
+import pytest
+
+import run
+from orchestrator import dedup
+
+SPLITS = ["train", "val", "test"]
+
+
+def write_hashes(root, rows):
+    directory = os.path.join(root, dedup.DEDUP_DIR)
+    os.makedirs(directory, exist_ok=True)
+    np.array(rows, dtype=dedup.HASH_DTYPE).tofile(os.path.join(directory, dedup.HASHES_FILE))
+
+
+def read_pairs(root):
+    with open(os.path.join(root, dedup.DEDUP_DIR, dedup.PAIRS_FILE), "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_no_rendered_images_gives_an_empty_report(tmp_path):
+    root = str(tmp_path)
+
+    assert dedup.compute_hashes(root, SPLITS) == 0
+    report = dedup.find_duplicates(root, SPLITS)
+
+    assert report["images"] == 0 and report["pairs"] == 0
+    assert read_pairs(root) == []
+    assert dedup.samples_to_rerender(root, SPLITS) == []
+
+
+def test_pair_first_sharing_an_oversized_bucket_is_reported_in_a_later_band(tmp_path, monkeypatch):
+    monkeypatch.setattr(dedup, "MAX_BUCKET", 4)
+    root = str(tmp_path)
+    rng = random.Random(0)
+
+    # Band 0 (the low 16 bits) is 0 for every image, so its single bucket is too large to compare
+    rows = [(0, 100 + number, rng.getrandbits(48) << 16) for number in range(10)]
+    a = (0x3333 << 48) | (0x2222 << 32) | (0x1111 << 16)
+    rows += [(0, 1, a), (1, 2, a ^ (1 << 20))]
+    write_hashes(root, rows)
+
+    report = dedup.find_duplicates(root, SPLITS, max_distance=3)
+
+    assert report["skipped_buckets"] >= 1
+    assert read_pairs(root) == [{"a": ["train", 1], "b": ["val", 2], "distance": 1}]
+    assert report["pairs"] == 1 and report["cross_split"] == 1
+
+
+def test_pair_sharing_several_bands_is_reported_once(tmp_path):
+    root = str(tmp_path)
+    a = 0x0123456789ABCDEF
+    write_hashes(root, [(0, 1, a), (2, 7, a ^ 1), (1, 3, ~a & (2 ** 64 - 1))])
+
+    report = dedup.find_duplicates(root, SPLITS, max_distance=3)
+
+    assert read_pairs(root) == [{"a": ["train", 1], "b": ["test", 7], "distance": 1}]
+    assert report["by_splits"] == {"test/train": 1}
+
+
+def test_only_is_rejected_with_dedup(monkeypatch, capsys):
+    monkeypatch.setattr("sys.argv", ["run.py", "--dedup", "--dedup-rerender", "--only", "train:1-5"])
+
+    with pytest.raises(SystemExit):
+        run.parse_args()
+
+    assert "--only can't be combined with --dedup" in capsys.readouterr().err
@@ -0,0 +1,79 @@
+"""
+Resolution and cache (e-site-packages.env) of the conda site-packages of a worker (scripts/environment.py).
+"""
+import json
+import os
+import sys
+
+import pytest
+
+from scripts import environment
+
+ENV_NAME = "syntheticDataset-TEST"
+POSIX_LAYOUT = os.path.join("lib", f"python{sys.version_info[0]}.{sys.version_info[1]}", "site-packages")
+WINDOWS_LAYOUT = os.path.join("Lib", "site-packages")
+
+
+@pytest.fixture
+def conda(tmp_path, monkeypatch):
+    """A made-up conda install with one environment; counts the 'conda info --envs' calls."""
+    location = str(tmp_path / "envs" / ENV_NAME)
+    calls = []
+
+    def list_conda_environments():
+        calls.append(1)
+        return [("base", str(tmp_path)), (ENV_NAME, location)]
+
+    monkeypatch.setattr(environment, "list_conda_environments", list_conda_environments)
+    monkeypatch.setattr(environment.site, "addsitedir", lambda path: None)
+    return location, calls
+
+
+def make_root(tmp_path):
+    root = tmp_path / "project"
+    root.mkdir()
+    return str(root)
+
+
+@pytest.mark.parametrize("layout", [POSIX_LAYOUT, WINDOWS_LAYOUT])
+def test_a_cache_miss_resolves_the_real_site_packages_and_a_hit_skips_conda(tmp_path, conda, layout):
+    location, calls = conda
+    os.makedirs(os.path.join(location, layout))
+    root = make_root(tmp_path)
+
+    assert environment.setup(root, ENV_NAME) == (ENV_NAME, location)
+    with open(os.path.join(root, environment.SITE_PACKAGES_CACHE), "r") as f:
+        assert json.load(f)["site_packages"] == os.path.join(location, layout)
+
+    environment.setup(root, ENV_NAME)
+    assert len(calls) == 1
+
+
+def test_a_cached_folder_that_is_gone_is_resolved_again(tmp_path, conda):
+    location, calls = conda
+    os.makedirs(os.path.join(location, POSIX_LAYOUT))
+    root = make_root(tmp_path)
+    environment.write_cached_environment(root, ENV_NAME, location, str(tmp_path / "removed" / "site-packages"))
+
+    environment.setup(root, ENV_NAME)
+
+    assert len(calls) == 1
+    assert environment.read_cached_environment(root, ENV_NAME) == (location, os.path.join(location, POSIX_LAYOUT))
+
+
+def test_an_environment_without_site_packages_is_not_cached(tmp_path, conda):
+    root = make_root(tmp_path)
+
+    with pytest.raises(Exception, match="No site-packages"):
+        environment.setup(root, ENV_NAME)
+
+    assert not os.path.exists(os.path.join(root, environment.SITE_PACKAGES_CACHE))
+
+
+@pytest.mark.parametrize("layout", [POSIX_LAYOUT, WINDOWS_LAYOUT])
+def test_site_packages_passed_in_skips_the_lookup(tmp_path, conda, layout):
+    location, calls = conda
+    os.makedirs(os.path.join(location, layout))
+
+    assert environment.setup(make_root(tmp_path), ENV_NAME, os.path.join(location, layout)) == (ENV_NAME, location)
+    assert calls == []
@@ -0,0 +1,115 @@
+"""
+Labels written in batches (scripts/outputs.py:LabelWriter) and the manifest records waiting for them
+(LabelledManifest), also end to end with stub workers.
+"""
+import os
+
+import pytest
+
+import run
+from scripts import outputs
+from scripts.manifest import ManifestWriter, read_manifest
+from scripts.outputs import LabelledManifest, LabelWriter, create_output_dirs
+from tests.conftest import STUB_COMMAND, manifest_counts, output_root, stub_job
+
+
+def label_path(root, index):
+    return os.path.join(root, f"{index}.txt")
+
+
+def test_records_wait_for_the_labels_buffered_before_them(tmp_path):
+    root = str(tmp_path)
+    labels = LabelWriter(batch_size=3)
+    manifest = LabelledManifest(ManifestWriter(root, "0"), labels)
+
+    for index in range(2):
+        labels.write(label_path(root, index), f"0 {index}\n")
+        manifest.record("train", index)
+
+    assert read_manifest(root) == {}
+    assert not os.path.exists(label_path(root, 0))
+
+    labels.write(label_path(root, 2), "0 2\n")
+    manifest.record("train", 2)
+
+    assert read_manifest(root) == {"train": {0, 1, 2}}
+    with open(label_path(root, 1), "r") as f:
+        assert f.read() == "0 1\n"
+
+    # A part batch is written when the worker flushes, e.g. before reporting its lease done
+    labels.write(label_path(root, 3), "0 3\n")
+    manifest.record("train", 3)
+    manifest.flush()
+
+    assert read_manifest(root) == {"train": {0, 1, 2, 3}}
+    manifest.close()
+    with open(os.path.join(root, "manifest", "worker-0.jsonl"), "r", encoding="utf-8") as f:
+        assert [line.split(",")[1] for line in f] == [f'"index":{index}' for index in range(4)]
+
+
+def test_batch_fsyncs_every_label_before_the_records(tmp_path, monkeypatch):
+    root = str(tmp_path)
+    synced = []
+    monkeypatch.setattr(outputs.os, "fsync", lambda fd: synced.append("fsync"))
+    labels = LabelWriter(batch_size=2, fsync="batch")
+    labels.after(lambda: synced.append("before any label"))
+
+    for index in range(4):
+        labels.write(label_path(root, index), "0\n")
+        labels.after(lambda index=index: synced.append(f"record {index}"))
+
+    # Every write completing a batch writes it, a record after it has nothing to wait for
+    assert synced == ["before any label", "fsync", "fsync", "record 0", "record 1",
+                      "fsync", "fsync", "record 2", "record 3"]
+
+    stats = labels.stats()
+    assert stats["files"] == 4 and stats["batches"] == 2 and stats["fsync"] == "batch"
+
+
+def test_an_unknown_fsync_policy_is_rejected():
+    with pytest.raises(ValueError, match="Unknown fsync policy 'always'"):
+        LabelWriter(fsync="always")
+
+
+def test_output_directories_are_created_once(tmp_path, monkeypatch):
+    root = str(tmp_path)
+    create_output_dirs(root, ["train", "val"])
+
+    assert sorted(os.listdir(root)) == ["images", "labels", "vis"]
+    assert all(sorted(os.listdir(os.path.join(root, name))) == ["train", "val"] for name in os.listdir(root))
+
+    made = []
+    monkeypatch.setattr(outputs.os, "makedirs", lambda *args, **kwargs: made.append(args))
+    outputs.ensure_directory_for_file(os.path.join(root, "labels", "train", "0.txt"))
+    outputs.ensure_directory_for_file(os.path.join(root, "labels", "test", "0.txt"))
+    outputs.ensure_directory_for_file(os.path.join(root, "labels", "test", "1.txt"))
+
+    assert made == [(os.path.join(root, "labels", "test"),)]
+
+
+def read_labels(root):
+    labels = {}
+    for split in ("train", "val"):
+        for name in os.listdir(os.path.join(root, "labels", split)):
+            with open(os.path.join(root, "labels", split, name), "rb") as f:
+                labels[(split, name)] = f.read()
+    return labels
+
+
+def test_a_batched_stub_run_writes_the_labels_of_a_plain_one(tmp_path, stub_env):
+    buckets = [{"name": "train", "size": 10}, {"name": "val", "start": 10, "size": 3}]
+
+    roots = []
+    for name, options in [("plain", {}), ("batched", {"label_batch": 4, "fsync": "batch"})]:
+        wd = tmp_path / name
+        jobs = [dict(stub_job(wd, bpp), cards_per_image=2, **options) for bpp in (buckets, [])]
+        root = output_root(wd)
+        run.run_blender_with_progress(STUB_COMMAND, "none.blend", "none.py", jobs, scheduler="queue", lease_size=3,
+                                      log_dir=os.path.join(root, "logs"))
+        roots.append(root)
+
+    plain, batched = roots
+    assert len(read_labels(batched)) == 13
+    assert read_labels(batched) == read_labels(plain)
+    assert manifest_counts(batched) == manifest_counts(plain)
+    assert set(manifest_counts(batched).values()) == {1}
@@ -0,0 +1,66 @@
+"""
+The decoded image cache (scripts/lru_cache.py:ByteLRUCache) and which images a sample then owns.
+"""
+from types import SimpleNamespace
+
+from PIL import Image
+
+from scripts.lru_cache import ByteLRUCache
+from scripts.sample_inputs import load_sample_inputs
+
+
+def sized(key):
+    return lambda: bytes(key[1])
+
+
+def test_least_recently_used_values_are_evicted_by_size():
+    evicted = []
+    cache = ByteLRUCache(100, size_of=len, on_evict=lambda key, value: evicted.append(key))
+
+    for key in [("a", 40), ("b", 40), ("a", 40), ("c", 40)]:
+        cache.get_or_load(key, sized(key))
+
+    assert evicted == [("b", 40)]
+    assert ("a", 40) in cache and ("c", 40) in cache
+    assert cache.bytes == 80
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 3 and cache.stats()["evictions"] == 1
+
+
+def test_a_value_larger_than_the_budget_is_returned_but_not_kept():
+    loads = []
+    cache = ByteLRUCache(100, size_of=len)
+
+    for _ in range(2):
+        value, cached = cache.get_or_load(("big", 101), lambda: loads.append(1) or bytes(101))
+        assert len(value) == 101 and not cached
+
+    assert len(loads) == 2
+    assert cache.bytes == 0 and ("big", 101) not in cache
+
+
+def test_a_hit_returns_the_same_value_without_loading():
+    cache = ByteLRUCache(100, size_of=len)
+    first, _ = cache.get_or_load(("a", 10), sized(("a", 10)))
+
+    value, cached = cache.get_or_load(("a", 10), lambda: 1 / 0)
+
+    assert value is first and cached
+
+
+def test_shared_images_are_not_owned_by_the_samples():
+    def record(size, objects=None):
+        return SimpleNamespace(image=SimpleNamespace(to_pil=lambda: Image.new("RGB", size)), objects=objects)
+
+    id_ds = [record((86, 54), [{"class": "horizontal_card", "photo_id": index % 2}]) for index in range(4)]
+    photo_id_ds = [record((30, 40)) for _ in range(2)]
+    background_ds = [record((64, 48)), record((2000, 2000))]
+    # Holds the photos and the small background, the large one never fits
+    cache = ByteLRUCache(3 * 64 * 48 * 3)
+
+    inputs = [load_sample_inputs(index, id_ds, photo_id_ds, background_ds, cache) for index in range(4)]
+
+    assert inputs[2].photo_image is inputs[0].photo_image
+    assert inputs[2].background_image is inputs[0].background_image
+    assert [len(item.owned) for item in inputs] == [1, 2, 1, 2]
+    assert inputs[1].background_image in inputs[1].owned
+    assert cache.stats()["hits"] == 3
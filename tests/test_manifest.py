@@ -0,0 +1,71 @@
+"""
+The run manifest (scripts/manifest.py) and what a resumed run still renders (run.py:pending_buckets).
+"""
+import json
+import os
+
+import run
+from scripts.manifest import ManifestWriter, bootstrap_manifest, missing_intervals, read_manifest
+
+BUCKETS = [{"name": "train", "size": 10}, {"name": "val", "start": 10, "size": 4}]
+
+
+def touch(root, directory, bucket_name, name):
+    path = os.path.join(root, directory, bucket_name, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "wb").close()
+
+
+def test_segments_of_every_worker_are_read_and_cut_lines_ignored(tmp_path):
+    root = str(tmp_path)
+    for worker_id, indices in (("0", [0, 1, 2]), ("1", [5, 6])):
+        manifest = ManifestWriter(root, worker_id)
+        for index in indices:
+            manifest.record("train", index)
+        manifest.close()
+
+    # A worker killed mid-write, and a sample whose label was never written
+    with open(os.path.join(root, "manifest", "worker-1.jsonl"), "a", encoding="utf-8") as f:
+        f.write(json.dumps({"bucket": "train", "index": 8, "image": True, "label": False}) + "\n")
+        f.write('{"bucket": "train", "ind')
+
+    assert read_manifest(root) == {"train": {0, 1, 2, 5, 6}}
+
+
+def test_missing_intervals_keep_the_bucket_offsets():
+    completed = {"train": {0, 1, 4, 9}, "val": {10, 13}}
+
+    assert missing_intervals(BUCKETS, completed) == [
+        {"name": "train", "start": 2, "size": 2},
+        {"name": "train", "start": 5, "size": 4},
+        {"name": "val", "start": 11, "size": 2},
+    ]
+
+
+def test_a_run_without_manifest_is_bootstrapped_from_its_files(tmp_path):
+    root = str(tmp_path)
+    for index in range(3):
+        touch(root, "images", "train", f"{index}.jpg")
+        touch(root, "labels", "train", f"{index}.txt")
+    # An image without its label is rendered again
+    touch(root, "images", "train", "3.jpg")
+    touch(root, "vis", "train", "0.jpg")
+
+    pending = run.pending_buckets(root, BUCKETS)
+
+    assert pending == [{"name": "train", "start": 3, "size": 7}, {"name": "val", "start": 10, "size": 4}]
+    assert os.listdir(os.path.join(root, "manifest")) == ["worker-bootstrap.jsonl"]
+
+
+def test_bootstrap_records_whether_a_visualisation_exists(tmp_path):
+    root = str(tmp_path)
+    for index in range(2):
+        touch(root, "images", "val", f"{index}.jpg")
+        touch(root, "labels", "val", f"{index}.txt")
+    touch(root, "vis", "val", "1.jpg")
+
+    bootstrap_manifest(root, ["val"])
+
+    with open(os.path.join(root, "manifest", "worker-bootstrap.jsonl"), "r", encoding="utf-8") as f:
+        assert [(record["index"], record["vis"]) for record in map(json.loads, f)] == [(0, False), (1, True)]
+
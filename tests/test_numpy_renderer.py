@@ -0,0 +1,89 @@
+"""
+The headless backend (scripts/numpy_renderer.py:NumpyRenderer) rendering the samples of a plan, drawn and fast.
+"""
+import json
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from orchestrator.plan import build_plan
+from scripts.annotations import AnnotationWriter
+from scripts.numpy_renderer import PLACEHOLDER_SIZE, NumpyRenderer
+from scripts.outputs import label_text
+from scripts.plan import DEFAULT_GEOMETRY, PlanReader
+from scripts.timing import NULL_TIMER
+from scripts.writer import InlineWriter
+from tests.conftest import CLASSES, DATASET_NAME
+
+SAMPLES = 6
+CLASS_NAMES = {class_id: name for name, class_id in CLASSES.items()}
+
+
+def make_plan(root):
+    card_classes = ["horizontal_card", "vertical_card", "horizontal_card_back"]
+    id_ds = [SimpleNamespace(objects=[{"class": card_classes[index % 3], "subtype": "stub"}])
+             for index in range(SAMPLES)]
+    build_plan(root, DATASET_NAME, [{"name": "train", "size": SAMPLES}], id_ds, CLASSES, DEFAULT_GEOMETRY)
+    return PlanReader(root)
+
+
+def render_plan(root, fast, planned_boxes):
+    plan = make_plan(root)
+    renderer = NumpyRenderer(fast=fast)
+    annotations = AnnotationWriter(root, "0")
+    job = SimpleNamespace(root=root, writer=InlineWriter(), classes=CLASSES, shards=None, annotations=annotations,
+                          vis_every=1, vis_fraction=1.0, max_card_overlap=0.2, labels=None)
+
+    for index in range(SAMPLES):
+        row = plan.row("train", index)
+        params = plan.params("train", index)
+        if not planned_boxes:
+            del params["box"]
+
+        inputs = SimpleNamespace(id_card_image=Image.new("RGB", (86, 54), (200, 30, 30)),
+                                 objects_info={"class": CLASS_NAMES[int(row["class_id"])]},
+                                 cards=[], owned=[], background_image=Image.new("RGB", (64, 64), (20, 90, 20)))
+        renderer.render(SimpleNamespace(bucket_name="train", index=index, timer=NULL_TIMER), inputs, params, job)
+
+    annotations.close()
+    return plan
+
+
+def read_label(root, index):
+    with open(os.path.join(root, "labels", "train", f"{index}.txt"), "r") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("fast", [False, True])
+def test_labels_are_the_planned_boxes(tmp_path, fast):
+    root = str(tmp_path)
+    plan = render_plan(root, fast, planned_boxes=True)
+
+    for index in range(SAMPLES):
+        row = plan.row("train", index)
+        box = {"class": CLASS_NAMES[int(row["class_id"])], "boundingBox": row["box"].tolist()}
+        assert read_label(root, index) == label_text([box], 800, 800, CLASSES, True)
+
+    with Image.open(os.path.join(root, "images", "train", "0.jpg")) as image:
+        assert image.size == ((PLACEHOLDER_SIZE,) * 2 if fast else (800, 800))
+    assert os.path.exists(os.path.join(root, "vis", "train", "0.jpg")) != fast
+
+
+@pytest.mark.parametrize("fast", [False, True])
+def test_projected_boxes_agree_with_the_plan(tmp_path, fast):
+    root = str(tmp_path)
+    plan = render_plan(root, fast, planned_boxes=False)
+
+    with open(os.path.join(root, "annotations", "worker-0.jsonl"), "r", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+
+    assert [record["index"] for record in records] == list(range(SAMPLES))
+    for record in records:
+        row = plan.row("train", record["index"])
+        (card,) = record["objects"]
+        assert card["class_id"] == row["class_id"]
+        np.testing.assert_allclose(card["bbox"], row["box"], atol=0.01)
+        assert record["params"]["seed"] == int(row["seed"])
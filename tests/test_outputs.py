@@ -0,0 +1,79 @@
+"""
+Writes of a rendered sample (scripts/outputs.py:submit_outputs) for the image forms a renderer can hand over.
+"""
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from scripts.outputs import LabelWriter, jpeg_bytes, label_text, submit_outputs
+from scripts.shards import ShardWriter, iter_shard
+from scripts.timing import NULL_TIMER
+from scripts.writer import InlineWriter
+
+CLASSES = {"horizontal_card": 0, "vertical_card": 1}
+BOXES = [{"class": "horizontal_card", "boundingBox": [10.0, 20.0, 50.0, 60.0]}]
+TWO_CARDS = BOXES + [{"class": "vertical_card", "boundingBox": [61.25, 3.5, 97.0, 77.125]}]
+
+
+def submit(root, image, visualize=False, bounding_box_data=BOXES, **kwargs):
+    return submit_outputs(InlineWriter(), NULL_TIMER, root, "train", 3, image, 100, 80, bounding_box_data, CLASSES,
+                          True, visualize, **kwargs)
+
+
+def test_an_encoded_image_is_written_as_it_is(tmp_path):
+    root = str(tmp_path)
+    data = jpeg_bytes(Image.new("RGB", (16, 16), (128, 128, 128)), 90)
+
+    submit(root, data, visualize=True)
+
+    with open(os.path.join(root, "images", "train", "3.jpg"), "rb") as f:
+        assert f.read() == data
+    with open(os.path.join(root, "labels", "train", "3.txt"), "r") as f:
+        assert f.read() == "0 0.300000 0.500000 0.400000 0.500000\n"
+    assert os.path.exists(os.path.join(root, "vis", "train", "3.jpg"))
+
+
+def test_pixels_are_encoded(tmp_path):
+    root = str(tmp_path)
+
+    submit(root, np.zeros((80, 100, 3), dtype=np.uint8))
+
+    with Image.open(os.path.join(root, "images", "train", "3.jpg")) as image:
+        assert image.size == (100, 80)
+    assert not os.path.exists(os.path.join(root, "vis", "train", "3.jpg"))
+
+
+@pytest.mark.parametrize("bounding_box_data", [BOXES, TWO_CARDS])
+def test_own_boxes_are_labelled_byte_for_byte_like_lambdawalker(bounding_box_data):
+    # A dataset mixes both: boxes measured in Blender use lambdawalker's description, planned ones our own
+    assert label_text(bounding_box_data, 100, 80, CLASSES, True) == label_text(bounding_box_data, 100, 80, CLASSES,
+                                                                                False)
+
+
+def test_every_write_path_gives_the_same_label(tmp_path):
+    image = jpeg_bytes(Image.new("RGB", (16, 16)), 90)
+
+    loose = str(tmp_path / "loose")
+    submit(loose, image, bounding_box_data=TWO_CARDS)
+
+    batched = str(tmp_path / "batched")
+    labels = LabelWriter(batch_size=8)
+    submit(batched, image, bounding_box_data=TWO_CARDS, labels=labels)
+    labels.close()
+
+    sharded = str(tmp_path / "sharded")
+    shards = ShardWriter(sharded, "0")
+    submit(sharded, image, bounding_box_data=TWO_CARDS, shards=shards)
+    shards.close()
+
+    label_path = os.path.join("labels", "train", "3.txt")
+    with open(os.path.join(loose, label_path), "rb") as f:
+        expected = f.read()
+    with open(os.path.join(batched, label_path), "rb") as f:
+        assert f.read() == expected
+
+    members = dict(iter_shard(os.path.join(sharded, "shards", "train", "0-00000.tar")))
+    assert members["3.txt"] == expected
+    assert expected == b"0 0.300000 0.500000 0.400000 0.500000\n1 0.791250 0.503906 0.357500 0.920312\n"
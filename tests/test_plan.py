@@ -0,0 +1,75 @@
+"""
+The plan stage (orchestrator/plan.py) against the per-sample code it vectorises, and how workers open a plan.
+"""
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from orchestrator.plan import build_plan, draw_scene_params_batch, sample_seeds, summarize_plan
+from scripts.job import open_plan
+from scripts.plan import DEFAULT_GEOMETRY, PARAM_FIELDS, PlanReader, geometry_matches, load_geometry
+from scripts.sample_params import draw_scene_params
+from scripts.seeding import sample_seed
+from tests.conftest import CLASSES, DATASET_NAME
+
+BUCKETS = [{"name": "train", "size": 40}, {"name": "val", "start": 40, "size": 10}]
+
+
+def id_ds(size=50):
+    return [SimpleNamespace(objects=[{"class": "vertical_card" if index % 3 == 0 else "horizontal_card",
+                                      "subtype": f"type{index % 2}"}]) for index in range(size)]
+
+
+def test_batched_seeds_and_parameters_match_the_per_sample_ones():
+    indices = np.arange(0, 5000, 7)
+    seeds = sample_seeds(DATASET_NAME, "train", indices)
+    vertical = indices % 2 == 0
+    batch = draw_scene_params_batch(seeds, vertical)
+
+    for row, index in enumerate(indices[:50]):
+        assert int(seeds[row]) == sample_seed(DATASET_NAME, "train", int(index))
+        single = draw_scene_params(int(seeds[row]), "vertical_card" if vertical[row] else "horizontal_card")
+        for field in PARAM_FIELDS:
+            np.testing.assert_allclose(batch[field][row], single[field], rtol=1e-12)
+
+
+def test_plan_rows_read_back_as_scene_parameters(tmp_path):
+    root = str(tmp_path)
+    meta = build_plan(root, DATASET_NAME, BUCKETS, id_ds(), CLASSES, DEFAULT_GEOMETRY)
+    reader = PlanReader(root)
+
+    params = reader.params("val", 42)
+    assert params["seed"] == sample_seed(DATASET_NAME, "val", 42)
+    assert params == {**draw_scene_params(params["seed"], "vertical_card"), "box": params["box"]}
+    assert reader.row("val", 42)["class_id"] == CLASSES["vertical_card"]
+    assert reader.row("train", 1)["subtype"] == "type1"
+
+    x0, y0, x1, y1 = params["box"]
+    assert 0 <= x0 < x1 <= 800 and 0 <= y0 < y1 <= 800
+
+    summary = summarize_plan(root, meta, CLASSES)
+    assert summary["train"]["samples"] == 40
+    assert sum(summary["val"]["classes"].values()) == 10
+
+
+def test_a_worker_with_another_scene_geometry_measures_its_own_boxes(tmp_path, capsys):
+    root = str(tmp_path)
+    build_plan(root, DATASET_NAME, BUCKETS, id_ds(), CLASSES, DEFAULT_GEOMETRY)
+
+    assert open_plan(root, DATASET_NAME, dict(DEFAULT_GEOMETRY, lens=50.000001))[1]
+
+    measured = dict(DEFAULT_GEOMETRY, lens=35.0)
+    _, planned_boxes = open_plan(root, DATASET_NAME, measured)
+    assert not planned_boxes
+    # The next plan run projects with the geometry the worker measured
+    assert load_geometry(root) == measured
+    assert not geometry_matches(measured, DEFAULT_GEOMETRY)
+
+
+def test_a_plan_of_another_dataset_is_refused(tmp_path):
+    root = str(tmp_path)
+    build_plan(root, "OtherDataset", BUCKETS, id_ds(), CLASSES, DEFAULT_GEOMETRY)
+
+    with pytest.raises(ValueError, match="OtherDataset"):
+        open_plan(root, DATASET_NAME, DEFAULT_GEOMETRY)
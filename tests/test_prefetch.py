@@ -0,0 +1,119 @@
+"""
+Samples loaded ahead of the render loop (scripts/prefetch.py:Prefetcher) as run_samples consumes them.
+"""
+import threading
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image
+
+from orchestrator.quarantine import Quarantine
+from scripts.prefetch import Prefetcher
+from scripts.protocol import parse_line
+from scripts.sample_inputs import load_sample_inputs
+from scripts.worker import progress_generator, run_samples
+
+
+def samples(size=20):
+    return progress_generator([{"name": "train", "size": size}])
+
+
+def record(size, objects=None):
+    image = Image.new("RGB", size)
+    return SimpleNamespace(image=SimpleNamespace(to_pil=image.copy), objects=objects)
+
+
+def load_failing_at(failing_index):
+    def load(sample):
+        if sample.index == failing_index:
+            raise OSError(f"unreadable record {sample.index}")
+        return sample.index * 10
+    return load
+
+
+def render_inputs(sample):
+    if sample.load_error is not None:
+        raise sample.load_error
+    return None
+
+
+def last_sample(output):
+    """The sample the orchestrator would blame for a crash now, from the worker's protocol lines."""
+    current = None
+    for line in output.splitlines():
+        message = parse_line(line)
+        if message is not None and message[0] == "SAMPLE":
+            current = message[1]
+    return current
+
+
+@pytest.mark.parametrize("depth", [1, 4])
+def test_a_load_error_is_blamed_on_its_own_sample(tmp_path, capsys, depth):
+    quarantine = Quarantine(str(tmp_path), max_failures=2)
+
+    # Two crashing launches of the same worker, as the orchestrator relaunches it
+    for _ in range(2):
+        with pytest.raises(OSError):
+            run_samples(Prefetcher(samples(10), load_failing_at(6), depth), render_inputs)
+
+        current = last_sample(capsys.readouterr().out)
+        assert current == {"bucket": "train", "index": 6}
+        quarantine.record_failure(current["bucket"], current["index"])
+
+    assert quarantine.only_spec() == "train:6"
+
+
+def test_samples_keep_their_order_and_loads_stay_at_most_depth_ahead():
+    depth = 3
+    consumed = [0]
+    ahead = []
+    lock = threading.Lock()
+
+    def load(sample):
+        with lock:
+            ahead.append(sample.index - consumed[0])
+        return sample.index * 10
+
+    prefetcher = Prefetcher(samples(), load, depth)
+    order = []
+    for sample in prefetcher:
+        assert sample.inputs == sample.index * 10 and sample.load_error is None
+        order.append(sample.index)
+        with lock:
+            consumed[0] = sample.index + 1
+
+    assert order == list(range(20))
+    # The queue holds depth loaded samples, one more is being loaded
+    assert max(ahead) <= depth + 1
+    stats = prefetcher.stats()
+    assert stats["hits"] + stats["misses"] == 20
+
+
+def test_an_error_of_the_sample_source_ends_the_iteration_after_the_samples_before_it():
+    def failing_source():
+        yield from samples(4)
+        raise ConnectionError("channel closed")
+
+    order = []
+    with pytest.raises(ConnectionError):
+        for sample in Prefetcher(failing_source(), lambda sample: None, 2):
+            order.append(sample.index)
+
+    assert order == [0, 1, 2, 3]
+
+
+def test_inputs_are_decoded_off_the_render_thread_and_vertical_cards_turned():
+    id_ds = [record((86, 54), [{"class": "vertical_card" if index % 2 else "horizontal_card", "photo_id": index}])
+             for index in range(4)]
+    photo_id_ds = [record((30, 40)) for _ in range(4)]
+    background_ds = [record((64, 48)) for _ in range(2)]
+
+    prefetcher = Prefetcher(samples(4), lambda sample: load_sample_inputs(sample.index, id_ds, photo_id_ds,
+                                                                          background_ds), 2)
+    inputs = [sample.inputs for sample in prefetcher]
+
+    assert [item.id_card_image.size for item in inputs] == [(86, 54), (54, 86)] * 2
+    assert [item.photo_image.size for item in inputs] == [(30, 40), (40, 30)] * 2
+    assert [item.background_key for item in inputs] == [("indoors", 0), ("indoors", 1)] * 2
+    # Nothing is cached, every image belongs to its sample
+    assert all(len(item.owned) == 3 for item in inputs)
@@ -0,0 +1,66 @@
+"""
+Crash retries and poison-sample quarantine (orchestrator/quarantine.py), also end to end with a failing stub worker.
+"""
+import os
+
+import run
+from orchestrator.quarantine import Quarantine, RetryPolicy, read_quarantine
+from scripts.manifest import ManifestWriter
+from tests.conftest import STUB_COMMAND, manifest_counts, output_root, stub_job
+
+BUCKETS = [{"name": "train", "size": 10}, {"name": "val", "start": 10, "size": 4}]
+ERROR = {"type": "RuntimeError", "message": "bad record", "traceback": "Traceback ..."}
+
+
+def test_retry_delays_double_up_to_the_maximum():
+    policy = RetryPolicy(base_delay=2.0, max_delay=20.0)
+
+    assert [policy.delay(crashes) for crashes in range(1, 7)] == [2.0, 4.0, 8.0, 16.0, 20.0, 20.0]
+
+
+def test_a_sample_is_quarantined_after_max_failures(tmp_path):
+    root = str(tmp_path)
+    quarantine = Quarantine(root, "agent-1", max_failures=2)
+
+    assert not quarantine.record_failure("train", 3, ERROR, -11)
+    assert not quarantine.record_failure("val", 12)
+    assert quarantine.record_failure("train", 3, ERROR, -11)
+
+    (entry,) = quarantine.entries
+    assert entry["failures"] == 2 and entry["returncode"] == -11
+    assert entry["error"] == "RuntimeError: bad record"
+    assert quarantine.only_spec() == "train:3"
+    assert read_quarantine(root) == {"train": {3}}
+
+
+def test_quarantined_samples_are_left_out_of_a_resumed_run(tmp_path):
+    root = str(tmp_path)
+    manifest = ManifestWriter(root, "0")
+    manifest.record("train", 0)
+    manifest.close()
+
+    quarantine = Quarantine(root, max_failures=1)
+    quarantine.record_failure("train", 1)
+    quarantine.record_failure("val", 13)
+
+    assert run.pending_buckets(root, BUCKETS) == [
+        {"name": "train", "start": 2, "size": 8},
+        {"name": "val", "start": 10, "size": 3},
+    ]
+
+
+def test_a_sample_crashing_every_launch_is_quarantined_and_the_rest_rendered(tmp_path, stub_env, monkeypatch):
+    monkeypatch.setenv("STUB_FAIL_AT", "6")
+    root = output_root(tmp_path)
+    quarantine = Quarantine(root, max_failures=2)
+
+    run.run_blender_with_progress(STUB_COMMAND, "none.blend", "none.py", [stub_job(tmp_path, BUCKETS)],
+                                  scheduler="queue", lease_size=4, log_dir=os.path.join(root, "logs"),
+                                  retry=RetryPolicy(base_delay=0.01), quarantine=quarantine)
+
+    assert quarantine.only_spec() == "train:6"
+    assert "Stub failure at sample 6" in quarantine.entries[0]["traceback"]
+
+    counts = manifest_counts(root)
+    assert ("train", 6) not in counts
+    assert len(counts) == 13 and set(counts.values()) == {1}
@@ -0,0 +1,61 @@
+"""
+When a worker is restarted (orchestrator/recycle.py): RSS ceiling, RSS growth per sample and the fixed fallbacks.
+"""
+from orchestrator.recycle import MB, RecyclePolicy
+
+
+def feed(tracker, rss_mb_of_sample, samples):
+    """Reports every sample's RSS as the MEMORY message would; returns the first restart reason and its sample."""
+    for count in range(1, samples + 1):
+        tracker.observe(count, {"rss": rss_mb_of_sample(count) * MB, "images": 3})
+        reason = tracker.restart_reason(count)
+        if reason is not None:
+            return count, reason
+    return None
+
+
+def test_a_worker_is_restarted_when_its_rss_crosses_the_ceiling():
+    tracker = RecyclePolicy(max_rss_mb=1000).tracker()
+
+    count, reason = feed(tracker, lambda count: 800 + 10 * count, 200)
+
+    assert count == 20
+    assert reason.startswith("rss 1000 MB")
+
+
+def test_a_leaking_worker_is_restarted_once_the_window_is_full():
+    policy = RecyclePolicy(max_growth_mb=1.0, window=20, warmup=5)
+
+    count, reason = feed(policy.tracker(), lambda count: 500 + 2.0 * count, 200)
+
+    assert count == 20
+    assert reason.startswith("leak 2.00 MB/sample")
+
+
+def test_a_flat_or_noisy_worker_is_kept_past_the_fixed_count():
+    policy = RecyclePolicy(restart_every=80, max_rss_mb=4000, max_growth_mb=1.0, window=20)
+
+    # RSS jumps up and down by 30 MB but does not grow
+    assert feed(policy.tracker(), lambda count: 900 + 30 * (count % 2), 500) is None
+
+
+def test_the_warm_up_samples_do_not_count_as_growth():
+    policy = RecyclePolicy(max_growth_mb=1.0, window=10, warmup=8)
+
+    # Caches fill during the first samples, then RSS stays put
+    assert feed(policy.tracker(), lambda count: 300 + 100 * min(count, 8), 100) is None
+
+
+def test_without_memory_limits_or_reports_the_fixed_count_applies():
+    assert feed(RecyclePolicy(restart_every=25).tracker(), lambda count: 100, 100)[0] == 25
+
+    tracker = RecyclePolicy(restart_every=30, max_rss_mb=1000).tracker()
+    for count in range(1, 31):
+        tracker.observe(count, {"rss": None})
+    assert tracker.restart_reason(30) == "fixed count (30 samples)"
+
+
+def test_the_sample_cap_applies_to_memory_based_recycling():
+    policy = RecyclePolicy(max_rss_mb=1000, max_samples=50)
+
+    assert feed(policy.tracker(), lambda count: 100, 100) == (50, "sample cap (50 samples)")
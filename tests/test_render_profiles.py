@@ -0,0 +1,103 @@
+"""
+Named render settings (scripts/render_profiles.py) and the profile benchmark of run.py, with stub workers.
+"""
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+
+import run
+from scripts.render_profiles import PROFILES, apply_render_profile, resolve_profile
+from tests.conftest import CLASSES, DATASET_NAME, STUB_COMMAND
+
+
+def fake_scene(engines):
+    engine_enum = SimpleNamespace(enum_items={engine: None for engine in engines})
+    render = SimpleNamespace(engine=None, resolution_percentage=100, image_settings=SimpleNamespace(quality=90),
+                             bl_rna=SimpleNamespace(properties={"engine": engine_enum}))
+    return SimpleNamespace(render=render, cycles=SimpleNamespace(), eevee=SimpleNamespace(taa_render_samples=64))
+
+
+def test_a_named_profile_is_a_copy():
+    profile = resolve_profile("train")
+    profile["samples"] = 1
+
+    assert resolve_profile("train")["samples"] == PROFILES["train"]["samples"] == 64
+    assert resolve_profile(None) is None
+
+
+def test_settings_override_their_base_profile():
+    profile = resolve_profile({"base": "hq", "samples": 128, "denoise": False})
+
+    assert profile == {**PROFILES["hq"], "samples": 128, "denoise": False}
+    assert resolve_profile({"samples": 8}) == {"samples": 8}
+
+
+@pytest.mark.parametrize("spec", ["ultra", {"base": "ultra", "samples": 8}])
+def test_an_unknown_profile_is_rejected(spec):
+    with pytest.raises(ValueError, match="Unknown render profile 'ultra'"):
+        resolve_profile(spec)
+
+
+def test_run_rejects_an_unknown_profile_before_reading_the_dataset(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    with pytest.raises(ValueError):
+        run.main(worker_options={"render_profile": "ultra"})
+
+
+@pytest.mark.parametrize("engines", [("BLENDER_EEVEE_NEXT", "CYCLES"), ("BLENDER_EEVEE", "CYCLES")])
+def test_eevee_is_picked_by_the_id_of_the_running_blender(engines):
+    scene = fake_scene(engines)
+
+    apply_render_profile(scene, resolve_profile("draft"))
+
+    assert scene.render.engine == engines[0]
+    assert scene.render.resolution_percentage == 50 and scene.render.image_settings.quality == 85
+    assert scene.eevee.taa_render_samples == 16
+    assert vars(scene.cycles) == {}
+
+
+def test_cycles_renders_on_the_cpu_with_the_profile_settings():
+    scene = fake_scene(("BLENDER_EEVEE", "CYCLES"))
+    scene.cycles.tile_size = 256
+
+    apply_render_profile(scene, resolve_profile("hq"))
+
+    assert scene.render.engine == "CYCLES"
+    assert vars(scene.cycles) == {"device": "CPU", "samples": 256, "use_adaptive_sampling": True,
+                                  "adaptive_threshold": 0.01, "use_denoising": True, "use_auto_tile": True,
+                                  "tile_size": 2048}
+
+
+def test_settings_a_profile_does_not_name_are_left_as_they_are():
+    scene = fake_scene(("BLENDER_EEVEE", "CYCLES"))
+    scene.render.engine = "CYCLES"
+
+    apply_render_profile(scene, {"samples": 32})
+
+    assert scene.render.resolution_percentage == 100 and scene.render.image_settings.quality == 90
+    assert vars(scene.cycles) == {"device": "CPU", "samples": 32}
+
+
+def test_the_benchmark_renders_the_same_samples_with_every_profile(tmp_path, stub_env, monkeypatch, capsys):
+    root = str(tmp_path)
+    # hq sleeps 16 times longer than this, draft 16 times shorter
+    monkeypatch.setenv("STUB_RENDER_SECONDS", "0.005")
+
+    run.benchmark_profiles(root, ["draft", "hq"], 4, STUB_COMMAND, DATASET_NAME, 4, CLASSES)
+
+    with open(os.path.join(root, "benchmark", "report.json"), "r", encoding="utf-8") as f:
+        report = json.load(f)
+
+    assert list(report) == ["draft", "hq"]
+    assert all(result["samples"] == 4 for result in report.values())
+    assert report["hq"]["settings"] == PROFILES["hq"]
+    # The stub renders longer and writes larger images with more pixels and samples
+    assert report["hq"]["seconds_per_sample"] > report["draft"]["seconds_per_sample"]
+    assert report["hq"]["image_kb_per_sample"] > report["draft"]["image_kb_per_sample"] > 0
+    for profile in report:
+        images = os.path.join(root, "benchmark", profile, "output", DATASET_NAME, "images", "train")
+        assert sorted(os.listdir(images)) == [f"{index}.jpg" for index in range(4)]
+    assert "Report written to" in capsys.readouterr().out
@@ -0,0 +1,62 @@
+"""
+CPU sets of co-located instances (orchestrator/resources.py) on made-up NUMA layouts.
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+from orchestrator import resources
+
+
+def with_nodes(monkeypatch, *nodes):
+    monkeypatch.setattr(resources, "numa_nodes", lambda: [list(node) for node in nodes])
+
+
+def node_of(cpu, nodes):
+    return next(number for number, node in enumerate(nodes) if cpu in node)
+
+
+def test_sets_fill_every_node_before_spanning(monkeypatch):
+    nodes = [range(0, 6), range(6, 12)]
+    with_nodes(monkeypatch, *nodes)
+
+    sets = resources.plan_cpu_sets(3, 4)
+
+    assert sets[:2] == [[0, 1, 2, 3], [6, 7, 8, 9]]
+    assert sorted(sets[2]) == [4, 5, 10, 11]
+
+
+@pytest.mark.parametrize("instances", [1, 2, 3, 4, 6, 8])
+def test_equal_shares_stay_on_one_node(monkeypatch, instances):
+    nodes = [range(0, 12), range(12, 24)]
+    with_nodes(monkeypatch, *nodes)
+
+    sets = resources.plan_cpu_sets(instances)
+
+    assert len(sets) == instances
+    assert len({cpu for cpu_set in sets for cpu in cpu_set}) == sum(len(cpu_set) for cpu_set in sets)
+    assert len({len(cpu_set) for cpu_set in sets}) == 1
+    # Sets dividing the nodes evenly never span two
+    if 12 % (24 // instances) == 0:
+        assert all(len({node_of(cpu, nodes) for cpu in cpu_set}) == 1 for cpu_set in sets)
+
+
+def test_more_instances_than_cpus_share_round_robin(monkeypatch):
+    with_nodes(monkeypatch, [0, 1], [2, 3])
+
+    assert resources.plan_cpu_sets(6) == [[0], [1], [2], [3], [0], [1]]
+
+
+@pytest.mark.skipif(not hasattr(os, "sched_setaffinity"), reason="no thread affinity on this platform")
+def test_a_process_spawned_pinned_inherits_the_cpus():
+    before = os.sched_getaffinity(0)
+    cpus = {min(before)}
+
+    with resources.spawn_pinned(cpus) as pinned:
+        output = subprocess.check_output([sys.executable, "-c", "import os; print(sorted(os.sched_getaffinity(0)))"])
+
+    assert pinned
+    assert output.decode().strip() == str(sorted(cpus))
+    assert os.sched_getaffinity(0) == before
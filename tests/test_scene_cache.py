@@ -0,0 +1,89 @@
+"""
+State the batched render path keeps across samples (scripts/scene_cache.py), with bpy replaced by a recorder.
+"""
+import importlib
+import sys
+from types import ModuleType, SimpleNamespace
+
+import pytest
+from PIL import Image
+
+
+class FakeImage:
+    def __init__(self, name, width, height):
+        self.name = name
+        self.size = [width, height]
+        self.use_fake_user = False
+        self.uploads = 0
+        self.pixels = SimpleNamespace(foreach_set=self._set)
+
+    def _set(self, pixels):
+        assert len(pixels) == self.size[0] * self.size[1] * 4
+        self.uploads += 1
+
+    def update(self):
+        pass
+
+    def scale(self, width, height):
+        self.size = [width, height]
+
+
+class FakeImages(list):
+    def new(self, name, width, height, alpha=False):
+        self.append(FakeImage(name, width, height))
+        return self[-1]
+
+
+@pytest.fixture
+def scene_cache(monkeypatch):
+    """scripts.scene_cache imported against a fake bpy, and the material lookups it made."""
+    bpy = ModuleType("bpy")
+    bpy.data = SimpleNamespace(images=FakeImages())
+    lookups = []
+
+    find_materials = ModuleType("lambdawalker.blender.find_materials")
+    find_materials.find_materials_by_regex = lambda pattern: lookups.append(pattern) or [f"material:{pattern}"]
+
+    monkeypatch.setitem(sys.modules, "bpy", bpy)
+    monkeypatch.setitem(sys.modules, "lambdawalker.blender.find_materials", find_materials)
+    monkeypatch.delitem(sys.modules, "scripts.scene_cache", raising=False)
+    module = importlib.import_module("scripts.scene_cache")
+    yield module, bpy.data.images, lookups
+    sys.modules.pop("scripts.scene_cache", None)
+
+
+def test_a_persistent_image_is_created_once_and_only_gets_new_pixels(scene_cache):
+    module, images, _ = scene_cache
+    persistent = module.SceneCache().image("background")
+    first, second = Image.new("RGB", (8, 4)), Image.new("RGB", (8, 4))
+
+    image = persistent.update(first)
+    assert persistent.update(first) is image
+    assert persistent.update(second) is image
+
+    assert len(images) == 1
+    assert image.name == "persistent_background" and image.use_fake_user
+    assert image.uploads == 2
+
+
+def test_a_persistent_image_is_resized_for_a_picture_of_another_size(scene_cache):
+    module, images, _ = scene_cache
+    persistent = module.PersistentImage("photo")
+
+    persistent.update(Image.new("RGB", (8, 4)))
+    image = persistent.update(Image.new("RGB", (3, 5)))
+
+    assert len(images) == 1
+    assert image.size == [3, 5]
+
+
+def test_materials_are_looked_up_once_per_pattern(scene_cache):
+    module, _, lookups = scene_cache
+    cache = module.SceneCache()
+
+    for _ in range(3):
+        assert cache.card_materials("mx") == ["material:mx.*", "material:df.*"]
+        cache.card_materials("us")
+        cache.materials("table.*")
+
+    assert sorted(lookups) == ["df.*", "mx.*", "table.*", "us.*"]
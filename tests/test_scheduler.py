@@ -0,0 +1,73 @@
+"""
+The lease scheduler of run.py driven end to end with the stub worker (stub_blender.py) in place of Blender.
+"""
+import os
+import shutil
+
+import run
+from orchestrator.events import EventLog
+from orchestrator.recycle import RecyclePolicy
+from tests.conftest import ROOT, STUB_COMMAND, manifest_counts, output_root, read_events, stub_job
+
+BUCKETS = [{"name": "train", "size": 50}, {"name": "val", "start": 10, "size": 7}, {"name": "test", "size": 3}]
+
+
+def expected_samples(buckets):
+    return {(bucket["name"], index) for bucket in buckets
+            for index in range(bucket.get("start", 0), bucket.get("start", 0) + bucket["size"])}
+
+
+def run_stub(wd, jobs, **kwargs):
+    return run.run_blender_with_progress(STUB_COMMAND, "none.blend", "none.py", jobs,
+                                         log_dir=os.path.join(output_root(wd), "logs"), **kwargs)
+
+
+def test_queue_scheduler_renders_every_lease_once(tmp_path, stub_env):
+    # All the work sits in the first job, the other instances only live off the shared queue
+    jobs = [stub_job(tmp_path, BUCKETS)] + [stub_job(tmp_path) for _ in range(2)]
+
+    run_stub(tmp_path, jobs, scheduler="queue", lease_size=4)
+
+    counts = manifest_counts(output_root(tmp_path))
+    assert set(counts) == expected_samples(BUCKETS)
+    assert set(counts.values()) == {1}
+
+
+def test_recycle_mid_run_loses_no_sample(tmp_path, stub_env):
+    root = output_root(tmp_path)
+    events = EventLog(os.path.join(root, "logs", "events.jsonl"))
+
+    try:
+        run_stub(tmp_path, [stub_job(tmp_path, BUCKETS), stub_job(tmp_path)], scheduler="queue", lease_size=3,
+                 recycle=RecyclePolicy(restart_every=7), events=events)
+    finally:
+        events.close()
+
+    restarts = [event for event in read_events(events.path) if event["event"] == "restart"]
+    assert restarts
+
+    counts = manifest_counts(root)
+    assert set(counts) == expected_samples(BUCKETS)
+    assert set(counts.values()) == {1}
+
+
+def test_resume_renders_nothing(tmp_path, stub_env, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    shutil.copy(os.path.join(ROOT, "classes.yaml"), tmp_path)
+    monkeypatch.setattr(run, "DiskDataset", lambda name: range(40))
+
+    run.main(instances=2, scheduler="queue", lease_size=5, blender_path=STUB_COMMAND,
+             worker_options={"annotations": False})
+
+    root = os.path.join(str(tmp_path), "output", "IdCardV0.8")
+    counts = manifest_counts(root)
+    assert set(counts) == expected_samples(run.yolo_splits(40))
+
+    launched = []
+    monkeypatch.setattr(run, "run_blender_with_progress", lambda *args, **kwargs: launched.append(kwargs))
+
+    run.main(instances=2, scheduler="queue", lease_size=5, blender_path=STUB_COMMAND,
+             worker_options={"annotations": False})
+
+    assert launched == []
+    assert manifest_counts(root) == counts
@@ -0,0 +1,69 @@
+"""
+Seeded sampling (scripts/seeding.py, scripts/sample_params.py): every scene drawn from (dataset, bucket, index).
+"""
+import json
+import math
+import os
+from types import SimpleNamespace
+
+import pytest
+
+import run
+import stub_blender
+from scripts.sample_params import card_base_rotation, draw_scene_params
+from scripts.seeding import add_salts, read_salts, sample_seed
+from tests.conftest import CLASSES, DATASET_NAME, output_root
+
+BUCKETS = [{"name": "train", "size": 6}, {"name": "val", "start": 6, "size": 3}]
+
+
+def read_params(root, segment):
+    with open(os.path.join(root, "params", f"worker-{segment}.jsonl"), "r", encoding="utf-8") as f:
+        return {(entry["bucket"], entry["index"]): entry for entry in map(json.loads, f)}
+
+
+def test_seeds_depend_on_the_sample_only():
+    seeds = {sample_seed(DATASET_NAME, bucket, index) for bucket in ("train", "val") for index in range(1000)}
+
+    assert len(seeds) == 2000
+    assert sample_seed(DATASET_NAME, "train", 7) == sample_seed(DATASET_NAME, "train", 7)
+    assert sample_seed(DATASET_NAME, "train", 7) != sample_seed("OtherDataset", "train", 7)
+    assert sample_seed(DATASET_NAME, "train", 7, salt=1) not in seeds
+
+
+@pytest.mark.parametrize("object_class", ["horizontal_card", "vertical_card"])
+def test_scene_parameters_are_a_function_of_the_seed(object_class):
+    seed = sample_seed(DATASET_NAME, "train", 3)
+    params = draw_scene_params(seed, object_class)
+
+    assert params == draw_scene_params(seed, object_class)
+    assert params != draw_scene_params(seed + 1, object_class)
+    assert params["seed"] == seed
+    assert 350.0 <= params["light_energy"] <= 800.0
+    assert abs(params["card_rotation"][2] - card_base_rotation(object_class)[2]) <= math.radians(1.5)
+
+
+def test_salts_count_up_per_sample(tmp_path):
+    root = str(tmp_path)
+
+    add_salts(root, [("train", 1), ("val", 7)])
+    added = add_salts(root, [("train", 1)])
+
+    assert added == {("train", 1): 2}
+    assert read_salts(root) == {("train", 1): 2, ("val", 7): 1}
+
+
+def test_a_dry_run_gives_the_parameters_of_a_seeded_render(tmp_path, stub_env):
+    wd = str(tmp_path)
+    root = output_root(wd)
+    os.makedirs(root)
+    add_salts(root, [("train", 2)])
+
+    stub_blender.main(wd, DATASET_NAME, BUCKETS, CLASSES, worker_id=0, seeded=True, annotations=False)
+    id_ds = [SimpleNamespace(objects=[{"class": "horizontal_card"}]) for _ in range(9)]
+    run.write_dry_run_params(root, DATASET_NAME, BUCKETS, id_ds)
+
+    rendered, planned = read_params(root, 0), read_params(root, "dry-run")
+    assert len(rendered) == 9
+    assert rendered == planned
+    assert rendered[("train", 2)]["seed"] == sample_seed(DATASET_NAME, "train", 2, salt=1)
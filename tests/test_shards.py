@@ -0,0 +1,85 @@
+"""
+Rolling tar shards (scripts/shards.py): index, restarts, crash-cut shards and expanding them to the YOLO layout.
+"""
+import os
+
+import run
+from scripts.shards import ShardWriter, expand_shards, iter_shard, read_shard_index
+from tests.conftest import STUB_COMMAND, manifest_counts, output_root, stub_job
+
+
+def members(index, size=1000):
+    return {".jpg": bytes([index % 256]) * size, ".txt": f"0 0.5 0.5 0.1 {index}\n".encode(), ".vis.jpg": b"v" * 10}
+
+
+def shard_names(root, bucket_name):
+    return sorted(os.listdir(os.path.join(root, "shards", bucket_name)))
+
+
+def test_shards_roll_over_at_their_size_and_are_indexed(tmp_path):
+    root = str(tmp_path)
+    writer = ShardWriter(root, "0", max_bytes=5000)
+    for index in range(10):
+        writer.add("train", index, members(index))
+    writer.add("val", 40, members(40))
+    writer.close()
+
+    entries = read_shard_index(root)
+    train = [entry for entry in entries if entry["bucket"] == "train"]
+    assert len(train) > 1
+    assert [key for entry in train for key in entry["keys"]] == list(range(10))
+    assert all(entry["bytes"] == os.path.getsize(os.path.join(root, "shards", entry["shard"])) for entry in entries)
+    assert shard_names(root, "train") == [f"0-{number:05d}.tar" for number in range(len(train))]
+
+
+def test_a_restarted_worker_starts_a_new_shard(tmp_path):
+    root = str(tmp_path)
+    for start in (0, 5):
+        writer = ShardWriter(root, "3")
+        for index in range(start, start + 5):
+            writer.add("train", index, members(index))
+        writer.close()
+
+    assert shard_names(root, "train") == ["3-00000.tar", "3-00001.tar"]
+    assert [entry["keys"] for entry in read_shard_index(root)] == [[0, 1, 2, 3, 4], [5, 6, 7, 8, 9]]
+
+
+def test_a_shard_cut_by_a_crash_reads_up_to_its_last_whole_sample(tmp_path):
+    root = str(tmp_path)
+    writer = ShardWriter(root, "0")
+    for index in range(4):
+        writer.add("train", index, members(index))
+    path = os.path.join(root, "shards", "train", "0-00000.tar")
+    # Killed while the fifth sample was written: its header is there, its data is not
+    size = os.path.getsize(path)
+    writer.add("train", 4, members(4))
+    with open(path, "r+b") as f:
+        f.truncate(size + 700)
+
+    names = [name for name, _ in iter_shard(path)]
+    assert names[-1] == "3.vis.jpg" and len(names) == 12
+
+    assert expand_shards(root) == 12
+    with open(os.path.join(root, "labels", "train", "3.txt"), "rb") as f:
+        assert f.read() == members(3)[".txt"]
+    assert sorted(os.listdir(os.path.join(root, "vis", "train"))) == ["0.jpg", "1.jpg", "2.jpg", "3.jpg"]
+
+
+def test_a_sharded_stub_run_expands_to_every_sample(tmp_path, stub_env, monkeypatch):
+    buckets = [{"name": "train", "size": 9}, {"name": "val", "start": 9, "size": 3}]
+    jobs = [dict(stub_job(tmp_path, buckets), shards=True, shard_size_mb=0), dict(stub_job(tmp_path), shards=True)]
+    root = output_root(tmp_path)
+
+    run.run_blender_with_progress(STUB_COMMAND, "none.blend", "none.py", jobs, scheduler="queue", lease_size=2,
+                                  log_dir=os.path.join(root, "logs"))
+    assert not os.path.exists(os.path.join(root, "images", "train", "0.jpg"))
+
+    # run.main works on the dataset of the current directory
+    monkeypatch.chdir(tmp_path)
+    os.replace(root, os.path.join(str(tmp_path), "output", "IdCardV0.8"))
+    run.main(expand_shards=True)
+
+    expanded = os.path.join(str(tmp_path), "output", "IdCardV0.8")
+    assert sorted(int(name[:-4]) for name in os.listdir(os.path.join(expanded, "labels", "train"))) == list(range(9))
+    assert len(os.listdir(os.path.join(expanded, "images", "val"))) == 3
+    assert sum(manifest_counts(expanded).values()) == 12
@@ -0,0 +1,69 @@
+"""
+Warm spare workers (orchestrator/spares.py:SparePool) taking over restarts, and the worker modules imported only
+when a job uses them.
+"""
+import os
+import subprocess
+import sys
+
+import run
+from orchestrator.events import EventLog
+from orchestrator.recycle import RecyclePolicy
+from orchestrator.spares import SparePool
+from tests.conftest import ROOT, STUB_COMMAND, manifest_counts, output_root, read_events, stub_job
+
+
+def test_a_restart_takes_the_oldest_spare_and_its_replacement_gets_the_freed_id():
+    launched, stopped = [], []
+    pool = SparePool(lambda worker_id: launched.append(worker_id) or f"spare-{worker_id}", stopped.append, [2, 3])
+
+    assert pool.take(0) == "spare-2"
+    assert pool.take(1) == "spare-3"
+    assert pool.take(2) == "spare-0"
+    assert launched == [2, 3, 0, 1, 2]
+    assert pool.taken == 3
+
+    pool.close()
+    assert stopped == ["spare-1", "spare-2"]
+
+
+def test_without_spares_a_restart_launches_its_own_worker():
+    pool = SparePool(lambda worker_id: f"spare-{worker_id}", None, [])
+
+    assert pool.take(0) is None
+    assert pool.taken == 0
+
+
+def test_recycled_instances_take_spares_without_losing_or_repeating_samples(tmp_path, stub_env):
+    buckets = [{"name": "train", "size": 24}, {"name": "val", "start": 24, "size": 6}]
+    jobs = [stub_job(tmp_path, buckets), stub_job(tmp_path)]
+    root = output_root(tmp_path)
+    events = EventLog(os.path.join(root, "logs", "events.jsonl"))
+
+    try:
+        run.run_blender_with_progress(STUB_COMMAND, "none.blend", "none.py", jobs, scheduler="queue", lease_size=3,
+                                      recycle=RecyclePolicy(restart_every=5), events=events,
+                                      log_dir=os.path.join(root, "logs"), spares=1)
+    finally:
+        events.close()
+
+    spares = [event for event in read_events(events.path) if event["event"] == "spare"]
+    assert spares
+    # Every process writes under its own id: the instances' ones and one more for the spare
+    assert {str(event["spare"]) for event in spares} <= {"0", "1", "2"}
+    assert set(os.listdir(os.path.join(root, "manifest"))) <= {f"worker-{worker_id}.jsonl" for worker_id in range(3)}
+
+    counts = manifest_counts(root)
+    assert len(counts) == 30
+    assert set(counts.values()) == {1}
+
+
+def test_modules_only_some_jobs_use_are_not_imported_with_the_job():
+    code = ("import sys, scripts.job, scripts.outputs; "
+            "print(sorted(name for name in sys.modules if name.startswith(('lambdawalker.yolo', 'scripts.'))))")
+    output = subprocess.check_output([sys.executable, "-c", code], cwd=ROOT).decode()
+
+    for module in ("lambdawalker.yolo", "scripts.shards", "scripts.plan", "scripts.projection",
+                   "scripts.render_buffer"):
+        assert f"'{module}" not in output
+    assert "'scripts.job'" in output
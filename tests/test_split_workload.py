@@ -0,0 +1,113 @@
+"""
+Properties of the static split (run.py:split_workload_with_offsets) over seeded random workloads.
+"""
+import random
+
+import pytest
+
+import run
+
+CASES = 300
+
+
+def random_items(rng):
+    items = []
+    for index in range(rng.randint(1, 5)):
+        item = {"name": f"bucket{index}", "size": rng.choice([0, rng.randint(1, 50), rng.randint(1, 10 ** 8)])}
+        if rng.random() < 0.5:
+            item["start"] = rng.randint(0, 10 ** 6)
+        items.append(item)
+    return items
+
+
+def assert_exact_cover(items, shares):
+    """The workers' intervals, in worker order, are the items laid end to end: no gap, overlap or reordering."""
+    item_index, offset = 0, 0
+
+    for share in shares:
+        for entry in share:
+            while items[item_index]["size"] == offset:
+                item_index, offset = item_index + 1, 0
+            item = items[item_index]
+
+            assert entry["size"] > 0
+            assert entry["name"] == item["name"]
+            assert entry.get("start", 0) == item.get("start", 0) + offset
+            assert offset + entry["size"] <= item["size"]
+            offset += entry["size"]
+
+    assert all(item["size"] == 0 for item in items[item_index + 1:])
+    assert offset == (items[item_index]["size"] if items else 0)
+
+
+def share_sizes(shares):
+    return [sum(entry["size"] for entry in share) for share in shares]
+
+
+@pytest.mark.parametrize("seed", range(CASES))
+def test_equal_weights_cover_every_sample_once_and_differ_by_at_most_one(seed):
+    rng = random.Random(seed)
+    items = random_items(rng)
+    n = rng.choice([1, 2, 3, rng.randint(1, 64), rng.randint(100, 500)])
+
+    shares = run.split_workload_with_offsets(items, n)
+
+    assert len(shares) == n
+    assert_exact_cover(items, shares)
+
+    sizes = share_sizes(shares)
+    assert sum(sizes) == sum(item["size"] for item in items)
+    assert max(sizes) - min(sizes) <= 1
+
+
+@pytest.mark.parametrize("seed", range(CASES))
+def test_weighted_shares_cover_every_sample_once_in_proportion(seed):
+    rng = random.Random(seed)
+    items = random_items(rng)
+    n = rng.choice([rng.randint(1, 16), rng.randint(100, 500)])
+    weights = [rng.choice([0, rng.randint(1, 10), rng.uniform(0.1, 5.0)]) for _ in range(n)]
+    weights[rng.randrange(n)] = rng.randint(1, 10)
+
+    shares = run.split_workload_with_offsets(items, n, weights)
+
+    assert len(shares) == n
+    assert_exact_cover(items, shares)
+
+    total = sum(item["size"] for item in items)
+    for size, weight in zip(share_sizes(shares), weights):
+        assert abs(size - total * weight / sum(weights)) <= 1
+        if weight == 0:
+            assert size == 0
+
+
+def test_more_workers_than_samples_leaves_some_empty():
+    shares = run.split_workload_with_offsets([{"name": "train", "size": 3}], 5)
+
+    assert sorted(share_sizes(shares)) == [0, 0, 1, 1, 1]
+
+
+@pytest.mark.parametrize("weights", [[1, 2], [1, 1, 1, 1]])
+def test_weight_count_must_match_workers(weights):
+    with pytest.raises(ValueError):
+        run.split_workload_with_offsets([{"name": "train", "size": 10}], 3, weights)
+
+
+@pytest.mark.parametrize("weights", [[0, 0, 0], [1, -1, 1], [-2, -1, -1]])
+def test_weights_must_be_non_negative_and_not_all_zero(weights):
+    with pytest.raises(ValueError):
+        run.split_workload_with_offsets([{"name": "train", "size": 10}], 3, weights)
+
+
+def test_auto_weights_without_events_are_equal_shares(tmp_path):
+    events_path = str(tmp_path / "events.jsonl")
+
+    assert run.parse_weights("auto", 4, events_path) is None
+
+    with open(events_path, "w", encoding="utf-8") as f:
+        f.write('{"event": "restart", "worker": 0}\n')
+    assert run.parse_weights("auto", 4, events_path) is None
+
+
+def test_explicit_weights_are_parsed():
+    assert run.parse_weights("1,2.5,0", 3, "unused.jsonl") == [1.0, 2.5, 0.0]
+    assert run.parse_weights(None, 3, "unused.jsonl") is None
@@ -0,0 +1,76 @@
+"""
+Per-stage timing: the worker's StageTimer (scripts/timing.py) and the orchestrator's StageReport
+(orchestrator/timing.py), also end to end with stub workers.
+"""
+import json
+import os
+import random
+
+import pytest
+
+import run
+from orchestrator.timing import LogHistogram, StageReport
+from scripts.timing import NULL_TIMER, StageTimer, new_timer
+from tests.conftest import STUB_COMMAND, output_root, stub_job
+
+
+def test_a_stage_run_twice_for_a_sample_is_summed():
+    timer = StageTimer()
+    timer.add("decode", 0.25)
+    timer.wrap("decode", lambda: None)()
+    with timer.stage("render"):
+        pass
+
+    report = timer.report()
+    assert list(report) == ["decode", "render"]
+    assert 0.25 <= report["decode"] < 0.3
+
+
+def test_timing_off_reports_nothing():
+    assert new_timer(False) is NULL_TIMER
+    with NULL_TIMER.stage("render"):
+        pass
+    assert NULL_TIMER.wrap("label_write", len) is len
+    assert NULL_TIMER.report() == {}
+
+
+@pytest.mark.parametrize("q", [50, 95])
+def test_histogram_percentiles_are_within_the_bin_width(q):
+    rng = random.Random(q)
+    values = sorted(rng.lognormvariate(-3.0, 1.0) for _ in range(20000))
+    histogram = LogHistogram()
+    for value in values:
+        histogram.add(value)
+
+    exact = values[int(q / 100.0 * len(values)) - 1]
+    assert abs(histogram.percentile(q) / exact - 1.0) < 0.07
+    assert histogram.summary()["count"] == 20000
+
+
+def test_the_report_keeps_pipeline_order_and_counts_per_worker():
+    report = StageReport()
+    report.add(0, {"total": 0.5, "render": 0.4, "dataset_read": 0.01, "custom": 0.02})
+    report.add(1, {"render": 0.3, "total": 0.35})
+
+    result = report.report()
+    assert list(result["stages"]) == ["dataset_read", "render", "total", "custom"]
+    assert result["stages"]["render"]["count"] == 2
+    assert result["per_worker"] == {"0": 1, "1": 1}
+
+
+def test_stub_workers_report_every_sample_and_stage(tmp_path, stub_env):
+    buckets = [{"name": "train", "size": 12}, {"name": "val", "size": 4}]
+    jobs = [dict(stub_job(tmp_path, buckets), timing=True, prefetch=2), dict(stub_job(tmp_path), timing=True)]
+
+    timings = run.run_blender_with_progress(STUB_COMMAND, "none.blend", "none.py", jobs, scheduler="queue",
+                                            lease_size=3, timing=True,
+                                            log_dir=os.path.join(output_root(tmp_path), "logs"))
+
+    path = os.path.join(output_root(tmp_path), "logs", "report.json")
+    timings.write(path)
+    with open(path, "r", encoding="utf-8") as f:
+        report = json.load(f)
+
+    assert report["samples"] == 16
+    assert {"dataset_read", "render", "image_write", "label_write", "total"} <= set(report["stages"])
+    assert report["stages"]["total"]["count"] == 16
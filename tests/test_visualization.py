@@ -0,0 +1,74 @@
+"""
+Visualisations drawn from the in-memory render (scripts/outputs.py, scripts/boxes.py) instead of a decoded file.
+"""
+import io
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from scripts.boxes import should_visualize, to_xyxy
+from scripts.outputs import encode_image_and_visualization, jpeg_bytes, save_image_and_visualization
+
+BOXES = [{"class": "horizontal_card", "boundingBox": [20, 10, 60, 40]}]
+
+
+def render():
+    pixels = np.zeros((50, 80, 3), dtype=np.uint8)
+    pixels[:, :, 1] = 200
+    return pixels
+
+
+def is_red(image, x, y):
+    # The background is green, JPEG blurs the colour of the 2 pixel outline
+    r, g, b = image.getpixel((x, y))
+    return r > g
+
+
+@pytest.mark.parametrize("box", [
+    [20, 10, 60, 40],
+    [60, 40, 20, 10],
+    ((20, 10), (60, 40)),
+    {"x_min": 20, "y_min": 10, "x_max": 60, "y_max": 40},
+    {"min": (20, 10), "max": (60, 40)},
+])
+def test_every_box_form_is_normalised(box):
+    assert to_xyxy(box) == (20.0, 10.0, 60.0, 40.0)
+
+
+def test_visualised_samples_follow_every_and_fraction():
+    assert [index for index in range(12) if should_visualize(index, vis_every=4)] == [0, 4, 8]
+
+    chosen = [index for index in range(20000) if should_visualize(index, vis_fraction=0.1)]
+    assert 1800 < len(chosen) < 2200
+    # A re-rendered sample gets the same answer
+    assert chosen == [index for index in range(20000) if should_visualize(index, vis_fraction=0.1)]
+
+
+def test_the_image_and_its_visualisation_come_from_one_buffer(tmp_path):
+    output_file, output_file_vis = str(tmp_path / "3.jpg"), str(tmp_path / "vis-3.jpg")
+
+    save_image_and_visualization(render(), output_file, output_file_vis, BOXES)
+
+    with Image.open(output_file) as image:
+        assert not is_red(image.convert("RGB"), 20, 25)
+    with Image.open(output_file_vis) as vis:
+        assert vis.size == (80, 50)
+        assert is_red(vis.convert("RGB"), 20, 25) and not is_red(vis.convert("RGB"), 40, 25)
+
+
+def test_without_visualisation_nothing_else_is_written(tmp_path):
+    save_image_and_visualization(render(), str(tmp_path / "3.jpg"), None, BOXES)
+
+    assert os.listdir(tmp_path) == ["3.jpg"]
+
+
+def test_shard_members_are_encoded_once_from_the_buffer():
+    image_bytes, vis_bytes = encode_image_and_visualization(render(), BOXES, True)
+
+    assert image_bytes == jpeg_bytes(Image.fromarray(render(), "RGB"), 90)
+    with Image.open(io.BytesIO(vis_bytes)) as vis:
+        assert is_red(vis.convert("RGB"), 59, 25)
+
+    assert encode_image_and_visualization(render(), BOXES, False)[1] is None
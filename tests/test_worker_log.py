@@ -0,0 +1,55 @@
+"""
+Size-based rotation of the worker logs (orchestrator/channel.py:WorkerLog) while the worker is running.
+"""
+import os
+import subprocess
+import sys
+
+from orchestrator.channel import WorkerLog, read_tail
+
+CHATTY_WORKER = "import sys\nfor i in range(20000):\n    print(f'line {i:05d} ' + 'x' * 40)\nprint('last line')\n"
+
+
+def test_a_running_worker_log_is_rotated_by_size(tmp_path):
+    path = str(tmp_path / "workers" / "worker-0.log")
+    log = WorkerLog(path, max_bytes=64 * 1024, backups=2)
+
+    process = subprocess.Popen([sys.executable, "-c", CHATTY_WORKER], stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT)
+    log.follow(process.stdout)
+    process.wait()
+    log.close()
+
+    names = sorted(os.listdir(tmp_path / "workers"))
+    assert names == ["worker-0.log", "worker-0.log.1", "worker-0.log.2"]
+    for name in names:
+        assert 0 < os.path.getsize(tmp_path / "workers" / name) <= 64 * 1024
+
+    assert read_tail(path)[-1] == "last line"
+
+
+def test_a_write_that_would_pass_the_limit_goes_to_a_new_file(tmp_path):
+    path = str(tmp_path / "workers" / "worker-2.log")
+    log = WorkerLog(path, max_bytes=100, backups=1)
+
+    log.write(b"a" * 60 + b"\n")
+    log.write(b"b" * 38 + b"\n")
+    log.write(b"crash\n")
+    log.close()
+
+    assert os.path.getsize(path + ".1") == 100
+    assert read_tail(path) == ["crash"]
+
+
+def test_an_oversized_log_is_rotated_when_opened(tmp_path):
+    path = str(tmp_path / "workers" / "worker-1.log")
+    os.makedirs(os.path.dirname(path))
+    with open(path, "wb") as f:
+        f.write(b"x" * 2048)
+
+    log = WorkerLog(path, max_bytes=1024)
+    log.write(b"new launch\n")
+    log.close()
+
+    assert os.path.getsize(path + ".1") == 2048
+    assert read_tail(path) == ["new launch"]
@@ -0,0 +1,78 @@
+"""
+The post-render writer (scripts/writer.py:AsyncWriter): order, back-pressure and errors of the tasks.
+"""
+import threading
+
+import pytest
+
+from scripts.worker import progress_generator, run_samples
+from scripts.writer import AsyncWriter
+
+
+def test_tasks_run_in_submission_order_off_the_calling_thread():
+    writer = AsyncWriter(max_pending=4)
+    done = []
+
+    for number in range(100):
+        writer.submit(lambda number: done.append((number, threading.current_thread().name)), number)
+    writer.close()
+
+    assert [number for number, _ in done] == list(range(100))
+    assert {name for _, name in done} == {"post-render-writer"}
+
+
+def test_submit_blocks_while_the_queue_is_full():
+    writer = AsyncWriter(max_pending=1)
+    release = threading.Event()
+
+    writer.submit(release.wait)
+    writer.submit(lambda: None)
+
+    blocked = threading.Thread(target=writer.submit, args=(lambda: None,))
+    blocked.start()
+    blocked.join(0.2)
+    assert blocked.is_alive()
+
+    release.set()
+    blocked.join(5)
+    assert not blocked.is_alive()
+    writer.close()
+
+
+def test_a_failed_task_is_raised_on_flush_and_later_tasks_are_skipped():
+    writer = AsyncWriter()
+    done = []
+
+    def fail():
+        raise OSError("disk full")
+
+    writer.submit(done.append, 1)
+    writer.submit(fail)
+    writer.submit(done.append, 2)
+
+    with pytest.raises(OSError, match="disk full"):
+        writer.flush()
+    writer.close()
+
+    assert done == [1]
+
+
+def test_a_sample_is_only_recorded_after_its_writes(capsys):
+    writer = AsyncWriter(max_pending=2)
+    events = []
+
+    class Manifest:
+        def record(self, bucket_name, index, **outputs):
+            events.append(("record", index))
+
+    def render_sample(sample):
+        writer.submit(events.append, ("label", sample.index))
+        return {"image": True, "label": True, "vis": False}
+
+    completed = run_samples(progress_generator([{"name": "train", "size": 5}]), render_sample, Manifest(), None,
+                            writer)
+    writer.close()
+
+    assert completed == 5
+    assert events == [(kind, index) for index in range(5) for kind in ("label", "record")]
+    assert capsys.readouterr().out.count("PROGRESS:") == 5